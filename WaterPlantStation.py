@@ -7,112 +7,258 @@
 #    - added implementation for irrigation from dashboard (using mqtt expiring message) and support for modification for station parameter (moisture_limit, pump_active_for...) (in previous commit)
 #    - added status led (ON during operations/measurement - OFF on deepsleep); onboard led
 #    - use an external secrets.py file to store wifi and mqtt credentials
-
+#    - added offline ring buffer (ringbuffer.py): readings are stored on flash every cycle and uploaded in a single
+#        MQTT session every UPLOAD_EVERY cycles, or immediately on alarm (low moisture / low battery)
+#    - added wake-cycle profiler (profiler.py): time per phase, free heap and retries are published on
+#        picoW/diagnostics every DIAGNOSTICS_EVERY cycles
+#    - added drift-aware NTP sync (timesync.py): NTP is queried only when the estimated RTC error exceeds
+#        TIME_ERROR_BUDGET seconds; if the server does not answer the RTC is used and readings are flagged as time_stale
+#    - local time uses timezone.py (exact DST transitions, configurable TIMEZONE) shared with myntptime.py
+#    - soil and battery are read with a fast ADC burst (sampling.py): median/trimmed mean in a few ms instead of ~1s
+#    - added uasyncio wake cycle (ASYNC_CYCLE): wifi association runs while sensors settle and are read,
+#        mqtt messages are drained by a polling task with a deadline; blocking cycle kept as fallback
+#    - added adaptive measurement interval (scheduler.py): next sleep depends on the drying rate of the soil
+#        (predicted time to MOISTURE_LIMIT) and on the battery level, bounded by MIN_INTERVAL/MAX_INTERVAL;
+#        the moisture history is kept (and written to flash, once in end_cycle) only while ADAPTIVE_INTERVAL is on
+#    - settings are kept by settingsstore.py: typed schema with ranges (invalid MQTT values are rejected),
+#        CRC protected record written atomically (temp file + rename) and only once per cycle if something changed;
+#        settings.txt is migrated on first boot
+#    - logfile.txt replaced by logger.py: records are buffered in RAM and written once per cycle into size-capped
+#        rotating segments; the log tail is published on picoW/logs when requested with the send_logs command
+#    - pump driven by pump.py (uasyncio task + machine.Timer safety stop): pulse/soak irrigation that stops when
+#        MOISTURE_TARGET is reached, hard limit PUMP_MAX_ON_S; in the async cycle the backlog is uploaded while
+#        the pump runs; the actual run time is published as irrigation_run_ms
+#    - optional compact binary payload (payload.py, 30 bytes instead of ~300 of JSON) on picoW/sensor/bin,
+#        selected by PAYLOAD_FORMAT (0 json, 1 binary, 2 both); decoder for the server in tools/decode_payload.py
+#    - change-only publishing (deadband.py, DEADBAND_MODE): readings within the DEADBAND_* bands of the last
+#        published one are not buffered (1: no upload at all for them, 2: a small heartbeat is published instead),
+#        a full reading is forced every FULL_EVERY cycles; irrigation and alarms are always published
+#    - commands moved to picoW/<MQTT_CLIENT>/cmd/<command> with a single wildcard subscription; on_message uses
+#        the COMMANDS dispatch table (values validated, "false" is false), any setting can be changed with
+#        cmd/set/<SETTING>; both cycles drain incoming messages until COMMAND_WAIT_MS instead of a single poll
+#    - custom deepsleep()/delay() replaced by power.py (SLEEP_MODE idle/lightsleep/deepsleep): fixes the float
+#        range() and the milliseconds passed as seconds, sleep length corrected for the measured crystal drift,
+#        unused GPIOs parked as inputs while the station pins (PIN_MAP) are left alone (no relay glitch on wake)
+#    - wifi handled by wifi.py: the BSSID/channel of the AP and the DHCP lease are cached on flash (no scan and no
+#        DHCP on later wakes, WIFI_LEASE_S) or STATIC_IP is used; WIFI_TIMEOUT_MS/WIFI_RETRIES bound the connect and
+#        a missing network means the station goes back to sleep with the readings buffered instead of rebooting
+#    - multi-zone irrigation (zones.py, ZONE_COUNT): up to 4 soil sensors (ADC1 directly or through an analog mux)
+#        with their own power pin, relay, limit and pump time (ZONE<n>_* settings, cmd/zone/<n>/<field> commands);
+#        all zones are read after one shared warm-up, the pumps run one at a time within PUMP_BUDGET_S per wake and
+#        every reading carries all the zones ("zones" in the json, payload version 2)
+#    - optional continuous monitoring on the second core (monitor.py, MONITOR_MODE): between wake cycles core 1
+#        samples soil and battery every MONITOR_PERIOD_MS (sensor powered only for the sample) while core 0 idles at
+#        low clock; a dry soil, low battery or pump fault (no moisture rise while pumping) ends the wait at once and
+#        the radio is used only by the wake cycle that follows
+#    - faster boot: network, umqtt.simple, ntptime, json and payload.py are imported only by the cycles that go
+#        online or need them; the modules can be shipped precompiled (tools/build_mpy.py, main.py calls run());
+#        the fixed delays after the clock change, the MQTT connect/disconnect and at the end of the cycle are
+#        CLOCK_SETTLE_MS/MQTT_SETTLE_MS/END_SETTLE_MS minimums (time spent on other work counts); the time from
+#        reset to the first cycle and to the first publish is profiled ("boot", "first_publish" in diagnostics)
+#    - fewer allocations per cycle: readings and heartbeats are written by jsonwriter.py into one reusable buffer
+#        (no dict/json.dumps), console output only with VERBOSE; gc.collect() before the TLS handshake and at the
+#        end of the cycle; lowest free heap of the cycle (and ever) and peak allocation are in the diagnostics
+#    - battery handled by battery.py: per-device calibration (BATTERY_DIVIDER/BATTERY_OFFSET_MV instead of
+#        VOLTAGE_DROP_FACTOR), read at the start of the cycle with the radio off and compensated for the load sag,
+#        state of charge from a 18650 curve (filtered "battery_soc" of the heartbeat and alarms, the decisions use
+#        it too; "battery_soc_raw" in the readings is the SoC of each reading's own voltage), discharge rate and
+#        runtime left in the diagnostics; low battery policies: no irrigation below PUMP_MIN_SOC, longer
+#        intervals as the SoC drops, one last gasp alarm on picoW/alarm below LAST_GASP_SOC
+#    - summary publishing (windowstats.py, STATS_WINDOW_S): every wake adds its reading to windowed statistics
+#        (count, min, max, mean, standard deviation, kept on flash) instead of buffering it; one summary per window
+#        is published on picoW/summary, so the station can sample often with a radio session per window only;
+#        a window that spans STATS_WINDOW_S goes out with the next upload and opens a session of its own only
+#        once it holds UPLOAD_EVERY samples (a wake interval as long as the window does not open a session per
+#        sample); irrigations and alarms are still buffered and published as readings
+#    - DHT22 read through dhtsensor.py: read at the earliest valid moment after power-up (DHT_WARMUP_MS, the fixed
+#        1 s settle was too short and timed out), retried with backoff (DHT_RETRIES), range checked; when every
+#        attempt fails the last good value is used and the reading is flagged climate_stale instead of rebooting;
+#        reads, failures, fallbacks and read latency are in the diagnostics ("dht")
+
+import machine
 from machine import Pin, ADC, reset
 from time import sleep
 import secrets
-import network
 import sys
+import gc
 import utime
-import json
 import dht
-import ntptime
-import os
-import uio
-
-#third-part library mqtt
-from umqtt.simple  import MQTTClient
-
-VOLTAGE_DROP_FACTOR = 2.2
-
-SETTINGS_FILE = "settings.txt"
-SETTINGS_SAVED = True
-SETTINGS = {
-    "MOISTURE_LIMIT": 15,
-    "ACTIVE_PUMP_FOR": 5,
-    "MISURATION_INTERVAL": 3600,
-    "LAST_IRRIGATION": 0
+import dhtsensor
+import ringbuffer
+import profiler
+import timesync
+import timezone
+import sampling
+import scheduler
+import settingsstore
+import logger
+import pump
+import deadband
+import windowstats
+import power
+import battery
+import wifi
+import zones
+import monitor
+import uasyncio as asyncio
+
+SOIL_RAW_DRY = 39500    # soil sensor adc value at 0% and 100% moisture
+SOIL_RAW_WET = 14000
+
+# (name, type, default, min, max): see settingsstore.py, values received via MQTT are checked against the range
+SETTINGS_SCHEMA = [
+    ("MOISTURE_LIMIT", "i", 15, 0, 100),
+    ("ACTIVE_PUMP_FOR", "i", 5, 1, 120),
+    ("MISURATION_INTERVAL", "i", 3600, 60, 86400),
+    ("LAST_IRRIGATION", "i", 0, 0, None),     # epoch of the last irrigation (0 -> never)
+    ("LAST_PUMP_RUN_MS", "i", 0, 0, None),    # actual pump on time of the last irrigation
+    ("PUMP_PULSES", "i", 1, 1, 10),            # ACTIVE_PUMP_FOR is split in this many pulses
+    ("PUMP_SOAK_S", "i", 20, 0, 600),          # pause between pulses (water reaches the sensor)
+    ("MOISTURE_TARGET", "i", 40, 0, 100),      # stop irrigating at this moisture (0 -> always run ACTIVE_PUMP_FOR)
+    ("PUMP_MAX_ON_S", "i", 30, 1, 300),        # hard limit of the pump on time per irrigation
+    ("UPLOAD_EVERY", "i", 4, 1, 48),           # upload backlog every N cycles (1 -> every cycle)
+    ("BATTERY_LOW_LEVEL", "f", 3.3, 2.5, 4.2), # below this voltage upload immediately (alarm)
+    ("BATTERY_DIVIDER", "f", 2.2, 1.0, 6.0),   # calibration: battery voltage / ADC pin voltage (see batterystatus.py)
+    ("BATTERY_OFFSET_MV", "i", 0, -500, 500),  # calibration: added to the measured battery voltage
+    ("BATTERY_RESISTANCE_MOHM", "i", 150, 0, 2000),  # cell + holder + wiring resistance (load sag compensation)
+    ("PUMP_MIN_SOC", "i", 10, 0, 100),         # below this state of charge (%) irrigation is skipped
+    ("LAST_GASP_SOC", "i", 5, 0, 50),          # below this state of charge one alarm is published on picoW/alarm
+    ("DIAGNOSTICS_EVERY", "i", 24, 1, 1000),   # publish profiler stats every N cycles
+    ("TIME_ERROR_BUDGET", "i", 2, 0, 3600),    # seconds of estimated RTC error before a new NTP sync
+    ("TIMEZONE", "s", "CET", tuple(timezone.ZONES), None),
+    ("SOIL_SAMPLES", "i", 16, 1, 64),          # ADC burst size for soil moisture (median is used)
+    ("BATTERY_SAMPLES", "i", 16, 1, 64),       # ADC burst size for battery (trimmed mean is used)
+    ("ADC_SPACING_US", "i", 100, 0, 10000),    # pause between two samples of a burst
+    ("SENSOR_SETTLE_MS", "i", 1000, 0, 10000), # soil sensors power-up time before reading them
+    ("DHT_WARMUP_MS", "i", 2000, 0, 10000),    # DHT22 power-up time before the first read (datasheet: 2 s)
+    ("DHT_RETRIES", "i", 2, 0, 5),             # DHT22 reads after a failed one (backoff from 2 s), then the last good value
+    ("CLOCK_SETTLE_MS", "i", 100, 0, 1000),    # after the clock change at boot (settings/buffers load meanwhile)
+    ("MQTT_SETTLE_MS", "i", 1000, 0, 5000),    # after the MQTT connect (blocking cycle) and the MQTT disconnect
+    ("END_SETTLE_MS", "i", 1000, 0, 5000),     # at the end of the cycle, from the start of end_cycle()
+    ("VERBOSE", "?", False, None, None),       # console output of the normal cycle (errors are always printed)
+    ("ASYNC_CYCLE", "?", True, None, None),    # overlap network bring-up and sensing (False -> blocking cycle)
+    ("WIFI_TIMEOUT_MS", "i", 15000, 1000, 60000),  # give up wifi (all attempts) after this time and go back to sleep
+    ("WIFI_RETRIES", "i", 2, 0, 5),            # wifi attempts after the first one (exponential backoff)
+    ("STATIC_IP", "s", "", None, None),        # "ip,netmask,gateway,dns" to skip DHCP ("" -> DHCP)
+    ("WIFI_LEASE_S", "i", 43200, 0, 604800),   # reuse the cached DHCP lease for this long (0 -> always DHCP)
+    ("COMMAND_WAIT_MS", "i", 500, 0, 10000),   # async cycle: poll for mqtt messages (retained commands) for this time
+    ("ADAPTIVE_INTERVAL", "?", True, None, None),  # choose the sleep length from moisture trend and battery (False -> MISURATION_INTERVAL)
+    ("MIN_INTERVAL", "i", 900, 60, 86400),     # adaptive interval bounds (seconds)
+    ("MAX_INTERVAL", "i", 14400, 60, 86400),
+    ("PAYLOAD_FORMAT", "i", 0, 0, 2),          # readings as 0: json on picoW/sensor, 1: binary on picoW/sensor/bin, 2: both
+    ("DEADBAND_MODE", "i", 0, 0, 2),           # unchanged readings: 0 published, 1 skipped, 2 skipped + heartbeat on picoW/heartbeat
+    ("DEADBAND_TEMP", "f", 0.5, 0, 10),        # a reading is unchanged if every value is within these bands
+    ("DEADBAND_HUM", "f", 3.0, 0, 50),
+    ("DEADBAND_MOISTURE", "f", 2.0, 0, 50),
+    ("DEADBAND_BATTERY", "f", 0.05, 0, 1),
+    ("FULL_EVERY", "i", 12, 1, 1000),          # publish a full reading after this many unchanged cycles
+    ("STATS_WINDOW_S", "i", 0, 0, 604800),     # summary mode: readings aggregated over windows of this length, published on picoW/summary (0 -> off)
+    ("SLEEP_MODE", "s", "idle", power.BACKENDS, None),  # sleep between cycles, see power.py
+    ("MONITOR_MODE", "?", False, None, None),  # core 1 samples soil/battery between cycles (idle wait instead of SLEEP_MODE)
+    ("MONITOR_PERIOD_MS", "i", 1000, 100, 60000),  # monitor sampling period
+    ("PUMP_FAULT_S", "i", 4, 0, 600),          # monitor: pump fault if moisture does not rise after this pump time (0 -> off)
+    ("PUMP_FAULT_RISE", "f", 1.0, 0.1, 50),    # monitor: minimum moisture rise (%) of a working pump
+] + zones.schema()  # ZONE_COUNT, PUMP_BUDGET_S and the ZONE<n>_* table of the zones 2..n
+SETTINGS = settingsstore.values
+
+# GPIOs used by the station: kept as they are during sleep, every other GPIO is parked (see power.py)
+PIN_MAP = {
+    "waterPump": 0,         # relay data pin
+    "tempsensor_power": 2,
+    "tempsensor": 3,        # DHT22 data pin
+    "waterPump_power": 4,
+    "soil_power": 22,
+    "soil": 26,             # ADC0
+    "battery": 28,          # ADC2
 }
-IRRIGATE_NOW = False
-
+MONITOR_EVENTS = 0   # events of the monitor (core 1) that ended the last wait
+IRRIGATE_ZONES = 0   # zones to irrigate now (bit n-1 -> zone n), set with the irrigate_now commands
+PUBLISHED = 0   # messages published since boot
+SEND_LOGS = 0     # lines of log requested via mqtt (published on picoW/logs)
+
+# console output of the normal cycle: the message is formatted only with VERBOSE on
+def trace(fmt, *args):
+    if SETTINGS["VERBOSE"]:
+        print(fmt % args if args else fmt)
+
+# static ip config from STATIC_IP (None -> DHCP or the cached lease)
+def static_ip():
+    if not SETTINGS["STATIC_IP"]:
+        return None
+    try:
+        return wifi.parse_ifconfig(SETTINGS["STATIC_IP"])
+    except ValueError as e:
+        logger.warning("STATIC_IP ignored: " + str(e))
+        return None
+
+# after a connect attempt: retries for the profiler, NTP sync if needed; returns connected
+def wifi_connected(connected):
+    for _ in range(wifi.report()["attempts"] - 1):
+        profiler.retry("wifi")
+    profiler.stop("connectWifi")
+    if not connected:
+        print("Failed to connect to wifi")
+        logger.warning("wifi not reachable after %d attempts" % wifi.report()["attempts"])
+        return False
+    trace("Connected! (%d ms)", wifi.association_ms())
+    trace("My IP Address: %s", wifi.address())
+    if timesync.sync_needed(SETTINGS["TIME_ERROR_BUDGET"]):
+        set_time()
+    return True
+
+# connect with the cached AP/lease (wifi.py) within WIFI_TIMEOUT_MS; returns False if the network is down
 def connectWifi():
-    station = network.WLAN(network.STA_IF)
-    station.active(True)
-
-    if not station.isconnected():
-        print("Connecting...")
-        station.connect(secrets.SSID, secrets.PASSWORD)
-
-        while not station.isconnected():
-            print(".", end="")
-            sleep(1)
+    profiler.start("connectWifi")
+    trace("Connecting...")
+    return wifi_connected(wifi.connect(secrets.SSID, secrets.PASSWORD, SETTINGS["WIFI_TIMEOUT_MS"],
+                                       SETTINGS["WIFI_RETRIES"], static_ip(), SETTINGS["WIFI_LEASE_S"]))
 
-    if station.isconnected():
-        print("Connected!")
-        print("My IP Address:", station.ifconfig()[0])
+# sets time on the pico via ntp server; set RTC with the current time from NTP (UTC)
+# if the server does not answer the RTC is kept and the time is flagged as stale (no reboot)
+def set_time():
+    profiler.start("set_time")
+    if timesync.sync():
+        trace("Time set from NTP server (UTC), drift estimate: %d ppm", timesync.drift_ppm())
     else:
-        print("Failed to connect to wifi")
-        raise RuntimeError('Failed to connect to wifi')
+        profiler.retry("ntp")
+        print("Failed to set time from NTP server, using RTC")
+        logger.warning("ntp sync failed, using RTC")
+    profiler.stop("set_time")
 
-    sleep(1)
-    set_time()
+    trace("%s", get_iso_time())
 
-# sets time on the pico via ntp server and manages automatic summer time changes; set RTC with the current time from NTP
-def set_time():
-    ntptime.host = 'pool.ntp.org'
+# local time for the configured timezone (DST transitions are precomputed once per year in timezone.py)
+def get_localtime(now=None):
+    return timezone.localtime(now)
 
-    try:
-        ntptime.settime()  # Sets UTC
-        print("Time set from NTP server (UTC).")
-    except Exception as e:
-        print("Failed to set time from NTP server:", e)
-        raise RuntimeError('Failed to set time from NTP server')
-
-    print(get_iso_time())
-
-def get_localtime():
-    # Get UTC time
-    now = utime.time()
-    utc = utime.localtime(now)
-
-    # Base offset for CET
-    offset = 1 * 3600  # UTC+1
-
-    # DST rule: last Sunday of March until last Sunday of October
-    year, month, mday, hour, minute, second, weekday, yearday = utc
-
-    # DST active if:
-    # - after last Sunday of March
-    # - before last Sunday of October
-    # Simplified check:
-    if (month > 3 and month < 10) or \
-            (month == 3 and mday - weekday >= 25) or \
-            (month == 10 and mday - weekday < 25):
-        offset += 3600  # Add 1h for summer time (CEST)
-
-    # Apply offset
-    cet = utime.localtime(now + offset)
-    return cet
-
-def get_iso_time():
-    """Return local time as ISO string YYYY-MM-DDTHH:MM:SS."""
-    t = get_localtime()
+def get_iso_time(now=None):
+    """Return local time (now or given UTC epoch) as ISO string YYYY-MM-DDTHH:MM:SS."""
+    t = get_localtime(now)
     return "%04d-%02d-%02dT%02d:%02d:%02d" % t[:6]
 
+# settle delays are minimums: wait until ms have passed since started (ticks_ms), work done meanwhile counts
+def settle_since(started, ms):
+    remaining = ms - utime.ticks_diff(utime.ticks_ms(), started)
+    if remaining > 0:
+        utime.sleep_ms(remaining)
+
+
 
 def disconnectWifi():
     try:
-        station = network.WLAN(network.STA_IF)
-        if station.isconnected():
-            station.disconnect()
-        station.active(False)
+        wifi.disconnect()
     except:
         print("Error disconnecting wifi")
         raise RuntimeError("Error disconnecting wifi")
 
 
-def connectMQTT():
+# settle: wait MQTT_SETTLE_MS from the start of the connect (blocking cycle)
+def connectMQTT(settle=True):
+    from umqtt.simple import MQTTClient
     client = -1
+    profiler.start("connectMQTT")
+    started = utime.ticks_ms()
+    gc.collect()    # the TLS context needs large blocks: free the garbage of the cycle first
     try:
         client = MQTTClient(client_id=secrets.MQTT_CLIENT, server=secrets.MQTT_SERVER, port=8883,
                             user=secrets.MQTT_USERNAME, password=secrets.MQTT_PASSWORD, keepalive=4000, ssl=True,
@@ -121,286 +267,726 @@ def connectMQTT():
 
         client.set_callback(on_message)
         client.connect()
-        sleep(1)
+        if settle:
+            settle_since(started, SETTINGS["MQTT_SETTLE_MS"])
+        profiler.stop("connectMQTT")
     except:
         print("Error connecting client")
         raise RuntimeError("Error connecting to mqtt client")
     return client
 
 def disconnect(client):
+    started = utime.ticks_ms()
     try:
         client.disconnect()
-        sleep(1)
+        settle_since(started, SETTINGS["MQTT_SETTLE_MS"])
     except:
         print("Error disconnecting client")
         raise RuntimeError("Error disconnecting from mqtt client")
 
 def publish(client,topic, payload):
+    global PUBLISHED
     try:
-        print("topic: %s , value: %s" %(topic, payload,))
+        if SETTINGS["VERBOSE"]:
+            print("topic: %s , value: %s" % (topic, bytes(payload)))
+        profiler.start("publish")
         client.publish(topic, payload,qos=0,retain=True)
-        print("publish Done \n")
-        
-        writelogs('logfile.txt', 'published')
+        profiler.stop("publish")
+        profiler.since_boot("first_publish")
+        PUBLISHED += 1
+        trace("publish Done \n")
+        if SETTINGS["VERBOSE"]:
+            logger.info("published " + topic)   # a new string per message: only when debugging
     except:
         
         print("Error publishing to broker")
         raise RuntimeError("Error publishing to broker")   
     
 def subscribe(client,topic):
-    print("topic: " + topic)
+    trace("topic: %s", topic)
+    profiler.start("subscribe")
     client.subscribe(topic)
-    print("subscription Done")
+    profiler.stop("subscribe")
+    trace("subscription Done")
+
+# commands are published on picoW/<MQTT_CLIENT>/cmd/<command> (one wildcard subscription per session)
+COMMAND_PREFIX = b"picoW/" + secrets.MQTT_CLIENT.encode() + b"/cmd/"
+SETTING_PREFIX = b"set/"    # cmd/set/<SETTING> changes any setting of SETTINGS_SCHEMA
+ZONE_PREFIX = b"zone/"      # cmd/zone/<n>/<limit|pump_s|mux|power|relay|irrigate_now> for a single zone
+
+def command_irrigate_now(value):
+    global IRRIGATE_ZONES
+    IRRIGATE_ZONES = (1 << SETTINGS["ZONE_COUNT"]) - 1 if settingsstore.parse_bool(value) else 0
+
+def command_zone(command, value):
+    global IRRIGATE_ZONES
+    try:
+        number, field = command.split("/")
+        number = int(number)
+    except ValueError:
+        raise ValueError("bad zone command " + command)
+    if not 1 <= number <= SETTINGS["ZONE_COUNT"]:
+        raise ValueError("unknown zone %d" % number)
+    if field == "irrigate_now":
+        bit = 1 << (number - 1)
+        IRRIGATE_ZONES = IRRIGATE_ZONES | bit if settingsstore.parse_bool(value) else IRRIGATE_ZONES & ~bit
+    else:
+        settingsstore.set(zones.setting(number, field), value)
+
+def command_send_logs(value):
+    global SEND_LOGS
+    SEND_LOGS = int(value) if value else 20
+
+# command -> handler(value); handlers raise ValueError for invalid values
+COMMANDS = {
+    b"moisture_limit": lambda value: settingsstore.set("MOISTURE_LIMIT", value),
+    b"active_pump_for": lambda value: settingsstore.set("ACTIVE_PUMP_FOR", value),
+    b"misuration_interval": lambda value: settingsstore.set("MISURATION_INTERVAL", value),
+    b"irrigate_now": command_irrigate_now,
+    b"send_logs": command_send_logs,
+}
 
 #callback used when mqtt recieves a message
 def on_message(topic, msg):
-    global SETTINGS, SETTINGS_SAVED, IRRIGATE_NOW
-
-    print("message recieved on topic: ", topic)
-    print("message: " + msg.decode())
-
-    decoded_msg = msg.decode()
-
-    if topic == b'new_moisture_limit':
-        if SETTINGS["MOISTURE_LIMIT"] != int(decoded_msg):
-            SETTINGS["MOISTURE_LIMIT"] = int(decoded_msg)
-            SETTINGS_SAVED = False
-    elif topic == b'new_active_pump_for':
-        if SETTINGS["ACTIVE_PUMP_FOR"] != int(decoded_msg):
-            SETTINGS["ACTIVE_PUMP_FOR"] = int(decoded_msg)
-            SETTINGS_SAVED = False
-    elif topic == b'new_misuration_interval':
-        if SETTINGS["MISURATION_INTERVAL"] != int(decoded_msg):
-            SETTINGS["MISURATION_INTERVAL"] = int(decoded_msg)
-            SETTINGS_SAVED = False
-    elif topic == b'irrigate_now':
-        IRRIGATE_NOW = bool(decoded_msg)
-
-# make json format data for mqtt publishing
-def makeData(temp, hum, soil_moisture, time_of_misuration, battery_level):
-    data = {
-        "temperature": temp,
-        "humidity": hum,
-        "soil_moisture": round(soil_moisture, 1),
-        "soil_moisture_limit": SETTINGS["MOISTURE_LIMIT"],
-        "irrigation_time": SETTINGS["LAST_IRRIGATION"],
-        "timeOfmisuration": time_of_misuration,
-        "misuration_interval": SETTINGS["MISURATION_INTERVAL"],
-        "activate_pump_for": SETTINGS["ACTIVE_PUMP_FOR"],
-        "battery_level": battery_level
-    }
-    return data
+    trace("message recieved on topic: %s", topic)
+    trace("message: %s", msg)
 
-def activatePump(waterPump):
-    waterPump.value(1)
-    sleep(SETTINGS["ACTIVE_PUMP_FOR"])
-    waterPump.value(0)
+    if not topic.startswith(COMMAND_PREFIX):
+        return
+    command = topic[len(COMMAND_PREFIX):]
+    value = msg.decode()
+    try:
+        if command.startswith(SETTING_PREFIX):
+            name = command[len(SETTING_PREFIX):].decode()
+            if name not in SETTINGS:
+                raise ValueError("unknown setting " + name)
+            if settingsstore.set(name, value) and name == "TIMEZONE":
+                timezone.set_zone(SETTINGS["TIMEZONE"])     # local times of this session already use it
+        elif command.startswith(ZONE_PREFIX):
+            command_zone(command[len(ZONE_PREFIX):].decode(), value)
+        elif command in COMMANDS:
+            COMMANDS[command](value)
+        else:
+            raise ValueError("unknown command " + command.decode())
+    except ValueError as e:
+        print("invalid command ignored: ", e)
+        logger.warning("invalid command ignored: " + str(e))
+
+# make json format data for mqtt publishing, written into the jsonwriter buffer (no dict, no json.dumps)
+# zone_moistures/flags: moisture of the zones 2..n by number (None: zone not used, see zones.slots()) and
+# ringbuffer flags of the reading (multi-zone station)
+# returns a memoryview valid until the next message is written
+def makeData(temp, hum, soil_moisture, time_of_misuration, battery_level, time_stale=False, next_interval=0,
+             zone_moistures=(), flags=0):
+    import jsonwriter as jw
+    jw.begin()
+    jw.key("temperature"); jw.fixed(temp, 1)
+    jw.key("humidity"); jw.fixed(hum, 1)
+    jw.key("soil_moisture"); jw.fixed(soil_moisture, 1)
+    jw.key("soil_moisture_limit"); jw.integer(SETTINGS["MOISTURE_LIMIT"])
+    jw.key("irrigation_time")
+    if SETTINGS["LAST_IRRIGATION"]:
+        jw.timestamp(get_localtime(SETTINGS["LAST_IRRIGATION"]))
+    else:
+        jw.integer(0)
+    jw.key("irrigation_run_ms"); jw.integer(SETTINGS["LAST_PUMP_RUN_MS"])
+    jw.key("timeOfmisuration"); jw.timestamp(get_localtime(time_of_misuration))
+    jw.key("misuration_interval"); jw.integer(SETTINGS["MISURATION_INTERVAL"])
+    jw.key("activate_pump_for"); jw.integer(SETTINGS["ACTIVE_PUMP_FOR"])
+    jw.key("battery_level"); jw.fixed(battery_level, 3)
+    jw.key("battery_soc_raw"); jw.fixed(battery.soc(battery_level), 0)     # of this reading, not filtered
+    jw.key("time_stale"); jw.boolean(time_stale)
+    jw.key("climate_stale"); jw.boolean(flags & ringbuffer.FLAG_CLIMATE_STALE)
+    jw.key("next_interval"); jw.integer(next_interval)
+    if zone_moistures:
+        jw.key("zones")
+        jw.open_array()
+        for i in range(len(zone_moistures)):
+            if zone_moistures[i] is None:
+                continue
+            number = i + 2
+            jw.open_object()
+            jw.key("zone"); jw.integer(number)
+            jw.key("soil_moisture"); jw.fixed(zone_moistures[i], 1)
+            jw.key("soil_moisture_limit"); jw.integer(SETTINGS[zones.setting(number, "limit")])
+            jw.key("irrigated"); jw.boolean(flags & ringbuffer.zone_flag(number))
+            jw.close_object()
+        jw.close_array()
+    return jw.end()
+
+# replay buffered readings oldest first (with their original time of misuration), then empty the buffer
+# if a publish fails the buffer is kept and replayed again on next upload
+def flush_backlog(client):
+    fmt = SETTINGS["PAYLOAD_FORMAT"]
+    if fmt != 0:
+        import payload
+    for epoch, temp, hum, moisture, battery_level, flags, interval, zone_moistures in ringbuffer.records():
+        if fmt != 1:
+            data = makeData(temp, hum, moisture, epoch, battery_level, flags & ringbuffer.FLAG_TIME_STALE, interval,
+                            zone_moistures, flags)
+            publish(client, "picoW/sensor", data)
+        if fmt != 0:
+            zone_limits = [(m, SETTINGS[zones.setting(n, "limit")] if m is not None else 0)
+                           for n, m in enumerate(zone_moistures, 2)]
+            data = payload.encode(epoch, temp, hum, moisture, battery_level, flags, interval,
+                                  SETTINGS["MOISTURE_LIMIT"], SETTINGS["LAST_IRRIGATION"], SETTINGS["LAST_PUMP_RUN_MS"],
+                                  SETTINGS["MISURATION_INTERVAL"], SETTINGS["ACTIVE_PUMP_FOR"], zone_limits)
+            publish(client, "picoW/sensor/bin", data)
+    ringbuffer.clear()
+
+# profiler stats go on their own topic (not retained) every DIAGNOSTICS_EVERY cycles
+# (at once after a pump fault seen by the monitor)
+def publish_diagnostics(client):
+    if profiler.report_due(SETTINGS["DIAGNOSTICS_EVERY"]) or MONITOR_EVENTS & monitor.EVENT_PUMP_FAULT:
+        import json
+        trace("publishing diagnostics")
+        report = profiler.report()
+        report["sleep"] = power.report()
+        report["wifi"] = wifi.report()
+        report["battery"] = battery.report()
+        report["dht"] = dhtsensor.report()
+        if SETTINGS["MONITOR_MODE"]:
+            report["monitor"] = monitor_report()
+        client.publish("picoW/diagnostics", json.dumps(report), qos=0)
+
+# log tail requested with the send_logs command (not retained)
+def publish_logs(client):
+    global SEND_LOGS
+    if SEND_LOGS > 0:
+        trace("publishing log tail")
+        client.publish("picoW/logs", "\n".join(logger.tail(SEND_LOGS)), qos=0)
+        SEND_LOGS = 0
+
+# heartbeat instead of an unchanged reading (DEADBAND_MODE 2): the dashboard still sees the station alive
+def publish_heartbeat(client, battery_level):
+    if SETTINGS["DEADBAND_MODE"] == 2 and deadband.skipped():
+        import jsonwriter as jw
+        jw.begin()
+        jw.key("timeOfmisuration"); jw.timestamp(get_localtime())
+        jw.key("battery_level"); jw.fixed(battery_level, 3)
+        jw.key("battery_soc"); jw.fixed(battery.level(), 0)
+        jw.key("unchanged_for"); jw.integer(deadband.skipped())
+        publish(client, "picoW/heartbeat", jw.end())
+
+# summary of the window once it spans STATS_WINDOW_S, with any upload (a session of its own only when it also
+# holds UPLOAD_EVERY samples, see upload_due); an upload before that (alarm) leaves it growing
+SUMMARY_DECIMALS = (1, 1, 1, 3)     # per windowstats.METRICS
+
+def publish_summary(client):
+    if not SETTINGS["STATS_WINDOW_S"] or not windowstats.due(SETTINGS["STATS_WINDOW_S"], utime.time()):
+        return
+    import jsonwriter as jw
+    jw.begin()
+    jw.key("window_start"); jw.timestamp(get_localtime(windowstats.start()))
+    jw.key("window_end"); jw.timestamp(get_localtime(windowstats.end()))
+    jw.key("samples"); jw.integer(windowstats.count())
+    for i in range(len(windowstats.METRICS)):
+        low, high, mean, std = windowstats.stats(i)
+        decimals = SUMMARY_DECIMALS[i]
+        jw.key(windowstats.METRICS[i])
+        jw.open_object()
+        jw.key("min"); jw.fixed(low, decimals)
+        jw.key("max"); jw.fixed(high, decimals)
+        jw.key("mean"); jw.fixed(mean, decimals)
+        jw.key("std"); jw.fixed(std, decimals + 1)
+        jw.close_object()
+    jw.key("time_stale"); jw.boolean(timesync.is_stale())
+    publish(client, "picoW/summary", jw.end())
+    windowstats.reset()
+
+# one alarm when the battery is almost empty (state of charge below LAST_GASP_SOC), armed again by a charge
+def publish_last_gasp(client, battery_level):
+    if battery.last_gasp_due(SETTINGS["LAST_GASP_SOC"]):
+        import jsonwriter as jw
+        jw.begin()
+        jw.key("alarm"); jw.string("battery")
+        jw.key("timeOfmisuration"); jw.timestamp(get_localtime())
+        jw.key("battery_level"); jw.fixed(battery_level, 3)
+        jw.key("battery_soc"); jw.fixed(battery.level(), 0)
+        publish(client, "picoW/alarm", jw.end())
+        battery.gasp_sent()
+        logger.warning("last gasp: battery at %d%%" % battery.level())
+
+# upload is due (known before reading sensors) if the backlog is full enough or if the clock must be synced
+# (with heartbeats every cycle counts, otherwise only the buffered readings); in summary mode when the window ends
+# and holds UPLOAD_EVERY samples (this cycle's included) or the buffered irrigations make a batch
+def upload_due():
+    if not timesync.clock_valid():
+        return True
+    if SETTINGS["STATS_WINDOW_S"]:
+        return (windowstats.due(SETTINGS["STATS_WINDOW_S"], utime.time(), SETTINGS["UPLOAD_EVERY"] - 1)
+                or ringbuffer.pending() + 1 >= SETTINGS["UPLOAD_EVERY"])
+    if SETTINGS["DEADBAND_MODE"] == 2:
+        return deadband.since_upload() + 1 >= SETTINGS["UPLOAD_EVERY"]
+    return ringbuffer.pending() + 1 >= SETTINGS["UPLOAD_EVERY"]
+
+# moistures: one value per zone (zone 1 first)
+def alarm(moistures, battery_level):
+    return (zones.below_limit(moistures) or battery_level < SETTINGS["BATTERY_LOW_LEVEL"]
+            or MONITOR_EVENTS & monitor.EVENT_PUMP_FAULT)
+
+# upload now if there is an alarm or if the upload is due
+def upload_needed(moistures, battery_level):
+    return alarm(moistures, battery_level) or upload_due() or battery.last_gasp_due(SETTINGS["LAST_GASP_SOC"])
+
+# deadband filter: keep the reading if it changed, after irrigation, on alarm or when a full reading is due
+# (summary mode: only after irrigation or on alarm, the others are in the window statistics)
+def keep_reading(moistures, temp, hum, battery_level, irrigated):
+    if SETTINGS["STATS_WINDOW_S"]:
+        return irrigated or alarm(moistures, battery_level)
+    if SETTINGS["DEADBAND_MODE"] == 0:
+        return True
+    bands = (SETTINGS["DEADBAND_TEMP"], SETTINGS["DEADBAND_HUM"], SETTINGS["DEADBAND_MOISTURE"],
+             SETTINGS["DEADBAND_BATTERY"])
+    if (irrigated or alarm(moistures, battery_level)
+            or deadband.changed(temp, hum, moistures[0], battery_level, bands, zones.slots(moistures))
+            or deadband.full_due(SETTINGS["FULL_EVERY"])):
+        deadband.keep(temp, hum, moistures[0], battery_level, zones.slots(moistures))
+        return True
+    deadband.skip()
+    return False
+
+# no irrigation below PUMP_MIN_SOC: the pump current would brown out an almost empty cell
+def irrigation_needed(moistures):
+    if not zones.irrigation_order(moistures, IRRIGATE_ZONES):
+        return False
+    if battery.level() < SETTINGS["PUMP_MIN_SOC"]:
+        trace("battery at %d%%: irrigation skipped", battery.level())
+        logger.warning("irrigation skipped: battery at %d%%" % battery.level())
+        return False
+    return True
+
+# pulse/soak irrigation of one zone with moisture feedback (see pump.py); returns the actual pump on time in ms
+async def activatePump(zone, max_on_ms):
+    profiler.start("pump")
+    target = SETTINGS["MOISTURE_TARGET"] or None
+    run_ms = await pump.irrigate(zone["relay"], lambda: zones.read(zone, read_soil)[0],
+                                 zones.pump_ms(zone), SETTINGS["PUMP_PULSES"],
+                                 SETTINGS["PUMP_SOAK_S"] * 1000, target, max_on_ms)
+    profiler.stop("pump")
+    trace("zone %d: pump on for %d ms", zone["number"], run_ms)
+    return run_ms
+
+# the zones that need water run one after the other (one pump at a time, see zones.irrigation_order()) until
+# PUMP_BUDGET_S of pump time is used; the others wait for the next wake. Returns the run time per zone (-1: not run)
+async def irrigate_zones(moistures):
+    global IRRIGATE_ZONES
+    run_ms = [-1] * len(moistures)
+    budget_ms = SETTINGS["PUMP_BUDGET_S"] * 1000
+    for i in zones.irrigation_order(moistures, IRRIGATE_ZONES):
+        zone = zones.zones()[i]
+        if budget_ms <= 0:
+            trace("pump budget used, zone %d waits for the next wake", zone["number"])
+            logger.info("pump budget used, zone %d deferred" % zone["number"])
+            continue
+        run_ms[i] = await activatePump(zone, min(SETTINGS["PUMP_MAX_ON_S"] * 1000, budget_ms))
+        budget_ms -= run_ms[i]
+        IRRIGATE_ZONES &= ~(1 << (zone["number"] - 1))
+    return run_ms
 
 # map value -> from raw adc value to percentage
 def mapValue(x, fromMin, fromMax, toMin, toMax):
     return (x - fromMin) * (toMax - toMin) // (fromMax - fromMin) + toMin
 
-def check_battery(battery):
-    level = battery.read_u16() * (3.3 / 65535) * VOLTAGE_DROP_FACTOR
-    return level
-
-def medium_battery_level(battery):
-    records = []
-    total = 0
-    for i in range(10):
-        level = check_battery(battery)
-        records.append(level)
-        sleep(0.1)
-    for value in records:
-        total += value
-    return total / len(records)
-
-def wakeup():
-    for i in range(28):
-        if i not in [0, 3, 14, 15, 25, 26]:  # Alcuni GPIO sono usati, come il LED integrato
-            gpio = Pin(i, Pin.OUT)
-
-    sleep(0.5)
-
-    clock_speed = 125000000
-    machine.freq(clock_speed)
-
-    sleep(0.5)
-
-def gosleep():
-    for i in range(28):
-        if i not in [25, 14, 15, 0]:  # Alcuni GPIO sono usati, come il LED integrato
-            gpio = Pin(i, Pin.IN)
-
-    sleep(0.5)
-
-    clock_speed = 48000000
-    machine.freq(clock_speed)
-
-    sleep(0.5)
-
-def delay(seconds):
-    seconds = seconds / 60
-    for _ in range(seconds):
-        sleep(60)
-
-#custom deepsleep implementation
+def calibrate_battery():
+    battery.calibrate(SETTINGS["BATTERY_DIVIDER"], SETTINGS["BATTERY_OFFSET_MV"], SETTINGS["BATTERY_RESISTANCE_MOHM"])
+
+# battery rest voltage from the trimmed mean of a fast ADC burst (calibrated, the sag of the present load added back)
+def medium_battery_level(battery_adc):
+    with monitor.adc_lock:
+        median, mean, spread = sampling.read(battery_adc, SETTINGS["BATTERY_SAMPLES"], SETTINGS["ADC_SPACING_US"])
+    calibrate_battery()
+    load_ma = battery.AWAKE_MA + (battery.RADIO_MA if wifi.radio_on() else 0)
+    return battery.rest_voltage(battery.voltage(mean), load_ma)
+
+# read at the start of the cycle, before the radio and the sensors are switched on; updates the state of charge
+def read_battery(hw):
+    profiler.start("battery")
+    battery_level = medium_battery_level(hw["battery"])
+    profiler.stop("battery")
+    battery.update(utime.time() if timesync.clock_valid() else 0, battery_level)
+    trace("battery_level: %.2fV (%d%%)", battery_level, battery.level())
+    return battery_level
+
+# soil moisture (%) from the median of a fast ADC burst; returns (moisture, raw adc, spread)
+def read_soil(soil):
+    with monitor.adc_lock:  # the ADC is shared with the monitor on core 1
+        median, mean, spread = sampling.read(soil, SETTINGS["SOIL_SAMPLES"], SETTINGS["ADC_SPACING_US"])
+    return soil_moisture(median), median, spread
+
+def soil_moisture(raw):
+    return mapValue(raw, SOIL_RAW_DRY, SOIL_RAW_WET, 0, 100)
+
+def soil_raw(moisture):
+    return SOIL_RAW_DRY + moisture * (SOIL_RAW_WET - SOIL_RAW_DRY) / 100
+
+# monitor thresholds from the settings (raw ADC values, core 1 does not use floats)
+def start_monitor():
+    monitor.start(SETTINGS["MONITOR_PERIOD_MS"], int(soil_raw(SETTINGS["MOISTURE_LIMIT"])),
+                  battery.raw(SETTINGS["BATTERY_LOW_LEVEL"]),
+                  SETTINGS["PUMP_FAULT_S"] * 1000,
+                  int(SETTINGS["PUMP_FAULT_RISE"] * (SOIL_RAW_DRY - SOIL_RAW_WET) / 100))
+
+def monitor_report():
+    report = monitor.report()
+    driest, wettest = report.pop("soil_max_raw"), report.pop("soil_min_raw")
+    if report["samples"]:
+        report["moisture_min"], report["moisture_max"] = soil_moisture(driest), soil_moisture(wettest)
+    return report
+
+# wait for the next wake cycle: core 1 samples soil and battery meanwhile and ends the wait on an event
+# (zone 1 seen drier than MOISTURE_LIMIT by core 1 is irrigated even if the wake cycle reads it at the limit)
+def monitor_wait(seconds):
+    global MONITOR_EVENTS, IRRIGATE_ZONES
+    start_monitor()
+    trace("monitoring for %d seconds (core 1)", seconds)
+    power.wait(seconds * 1000, monitor.events, SETTINGS["MONITOR_PERIOD_MS"])
+    MONITOR_EVENTS = monitor.take_events()
+    if MONITOR_EVENTS & monitor.EVENT_DRY:
+        IRRIGATE_ZONES |= 1
+    if MONITOR_EVENTS:
+        trace("monitor event: %d", MONITOR_EVENTS)
+        logger.info("monitor event %d" % MONITOR_EVENTS)
+    if MONITOR_EVENTS & monitor.EVENT_PUMP_FAULT:
+        logger.error("pump fault: no moisture rise after %d s of pump time" % SETTINGS["PUMP_FAULT_S"])
+
+# sleep until the next wake cycle with the SLEEP_MODE backend (power.py), or wait with the monitor (MONITOR_MODE)
 def deepsleep(seconds):
-
-    print("all down before sleep!")
-    gosleep()
-    sleep(0.1)
-    
-    print("going to sleep!")
-
-    delay(seconds)
-
-    print("waking up!")
-    wakeup()
-    sleep(0.1)
-
-def wakeupsensors(tempsensor_power, soil_power, waterPump_power):
-    tempsensor_power.value(1)
-    soil_power.value(1)
+    global MONITOR_EVENTS
+    if SETTINGS["MONITOR_MODE"] and monitor.available():
+        monitor_wait(seconds)
+        return
+    monitor.stop()
+    MONITOR_EVENTS = 0  # no monitor during this sleep: events of an earlier wait are over
+    power.set_backend(SETTINGS["SLEEP_MODE"])
+    trace("going to sleep! (%s)", power.backend())
+    error_ms = power.sleep(seconds * 1000)
+    trace("waking up! (%d ms late)", error_ms)
+
+# soil_power is switched through the monitor: core 1 may be powering the sensor for a sample
+# the DHT22 is switched through dhtsensor.py (its warm-up starts at power-up)
+def wakeupsensors(climate, soil_power, waterPump_power):
+    dhtsensor.power(climate, 1)
+    monitor.sensor_power(1)
     waterPump_power.value(1)
+    zones.power(1)
 
-def gosleepsensors(tempsensor_power, soil_power, waterPump_power):
-    tempsensor_power.value(0)
-    soil_power.value(0)
+def gosleepsensors(climate, soil_power, waterPump_power):
+    dhtsensor.power(climate, 0)
+    monitor.sensor_power(0)
     waterPump_power.value(0)
+    zones.power(0)
         
-def writelogs(filename, message):
-    try:
-        file = open(filename, 'a')
-        file.write(message + '\n')
-        file.close()
-    except:
-        print("Error writing file")
-        raise RuntimeError('Error writing file')
-
-def get_settings():
-    """Load settings from file, create defaults if missing/invalid."""
-    global SETTINGS_FILE, SETTINGS
-    try:
-        # If file does not exist or is empty, write defaults
-        if not SETTINGS_FILE in os.listdir() or os.stat(SETTINGS_FILE)[6] == 0:
-            save_settings()
-            return
-
-        with open(SETTINGS_FILE, "r") as f:
-            SETTINGS = json.load(f)
-        return
-
-    except Exception as e:
-        raise RuntimeError("⚠️ Error loading settings:", e)
-
-def save_settings():
-    """Save settings dictionary to file in JSON format."""
-    global SETTINGS_FILE, SETTINGS, SETTINGS_SAVED
-    try:
-        with open(SETTINGS_FILE, "w") as f:
-            json.dump(SETTINGS, f)
-            SETTINGS_SAVED = True
-    except Exception as e:
-        raise RuntimeError("⚠️ Error saving settings:", e)
-
-def main():
-    global SETTINGS, SETTINGS_SAVED, IRRIGATE_NOW
-
+# setup clock, settings and pins; returns the pins used by the wake cycle
+def init_hardware():
     #   reset clock speed to 125MHz
     clock_speed = 125000000
     machine.freq(clock_speed)
-    
-    sleep(0.1)
+    clock_changed = utime.ticks_ms()
+
+    settingsstore.load(SETTINGS_SCHEMA)
+    timezone.set_zone(SETTINGS["TIMEZONE"])
+    ringbuffer.open_buffer()
+    profiler.load()
+    timesync.load()
+    scheduler.load()
+    deadband.load()
+    windowstats.load()
+    wifi.load()
+    battery.load()
+    calibrate_battery()
+    settle_since(clock_changed, SETTINGS["CLOCK_SETTLE_MS"])
+
+    hw = {
+        #   Power supply pin
+        "tempsensor_power": Pin(PIN_MAP["tempsensor_power"], Pin.OUT),
+        "soil_power": Pin(PIN_MAP["soil_power"], Pin.OUT),
+        "waterPump_power": Pin(PIN_MAP["waterPump_power"], Pin.OUT),
+
+        #   Data pin
+        "waterPump": Pin(PIN_MAP["waterPump"], Pin.OUT), #relay data pin
+        "tempsensor": dht.DHT22(Pin(PIN_MAP["tempsensor"], Pin.IN)), #digital read value pin
+        "soil": ADC(Pin(PIN_MAP["soil"])), #analog value pin
+        "battery": ADC(Pin(PIN_MAP["battery"])),
+
+        #   LED pin
+        "status_led": Pin('LED', Pin.OUT)
+    }
 
-    get_settings()
-    
-    #   Power supply pin
-    tempsensor_power = Pin(2, Pin.OUT)
-    soil_power = Pin(22, Pin.OUT)
-    waterPump_power = Pin(4, Pin.OUT)
-    
-    #   Data pin
-    waterPump = Pin(0, Pin.OUT) #relay data pin
-    tempsensor = dht.DHT22(Pin(3, Pin.IN)) #digital read value pin
-    soil = ADC(Pin(26)) #analog value pin
-    battery = ADC(Pin(28))
-    
-    #   LED pin
-    status_led = Pin('LED', Pin.OUT)
+    hw["climate"] = dhtsensor.sensor(hw["tempsensor"], hw["tempsensor_power"], "dht22")
+    hw["waterPump"].value(0)
+    monitor.setup(hw["soil"], hw["battery"], hw["soil_power"], hw["waterPump"])
+    setup_zones(hw)
+    return hw
+
+# zone table from the settings (rebuilt only when a ZONE_COUNT/pin setting changed); every pin of the station
+# and of the zones is kept as it is during sleep
+def setup_zones(hw):
+    for problem in zones.setup(SETTINGS, hw["soil"], hw["waterPump"], PIN_MAP.values()):
+        print(problem)
+        logger.warning(problem)
+    power.set_pins(list(PIN_MAP.values()) + zones.pins())
+
+# read the soil sensor of every zone; returns the moistures (zone 1 first)
+def read_zones():
+    moistures = []
+    for zone in zones.zones():
+        moisture, soil_raw, soil_spread = zones.read(zone, read_soil)
+        trace("zone %d moisture: %.2f%% (adc: %d +/-%d)", zone["number"], moisture, soil_raw, soil_spread)
+        moistures.append(moisture)
+    return moistures
+
+# the DHT22 did not answer: the last good value is used (the reading is flagged climate_stale by store_reading())
+def trace_climate(temp, hum, stale):
+    if stale:
+        trace("DHT22 not answering, last good value used: %.1fC %.1f%%", temp, hum)
+        logger.warning("DHT22 read failed, last good value used")
+
+# read the soil sensor of every zone and the DHT22 (when it is warm); returns (moistures, temp, hum)
+def measure(hw):
+    profiler.start("sensors")
+    moistures = read_zones()
+    temp, hum, stale = dhtsensor.read(hw["climate"], SETTINGS["DHT_RETRIES"], SETTINGS["DHT_WARMUP_MS"])
+    trace_climate(temp, hum, stale)
+    profiler.stop("sensors")
+    return moistures, temp, hum
+
+# a single SUBSCRIBE (one round trip) for every command of this station
+def subscribe_commands(client):
+    subscribe(client, COMMAND_PREFIX + b"#")
+
+# poll mqtt messages until COMMAND_WAIT_MS is over: retained commands may arrive after the SUBACK
+def drain_commands_blocking(client):
+    started = utime.ticks_ms()
+    while utime.ticks_diff(utime.ticks_ms(), started) < SETTINGS["COMMAND_WAIT_MS"]:
+        client.check_msg()
+        sleep(0.02)
+
+# buffer the reading of every zone (run_ms: pump on time per zone, -1 if not irrigated) and switch the sensors off
+# LAST_IRRIGATION/LAST_PUMP_RUN_MS and the adaptive interval follow zone 1
+def store_reading(hw, moistures, temp, hum, battery_level, run_ms):
+    time_of_misuration = utime.time()
+    if SETTINGS["VERBOSE"]:
+        print("time_of_misuration:", get_iso_time(time_of_misuration))
+
+    flags = ringbuffer.FLAG_TIME_STALE if timesync.is_stale() else 0
+    if dhtsensor.stale(hw["climate"]):
+        flags |= ringbuffer.FLAG_CLIMATE_STALE
+    if run_ms[0] >= 0:
+        settingsstore.set("LAST_IRRIGATION", time_of_misuration)
+        settingsstore.set("LAST_PUMP_RUN_MS", run_ms[0])
+        flags |= ringbuffer.FLAG_IRRIGATED
+        trace("irrigation_time: %s", get_iso_time(time_of_misuration))
+    for zone, zone_run_ms, moisture in zip(zones.zones(), run_ms, moistures):
+        if zone_run_ms >= 0:
+            if zone["number"] > 1:
+                flags |= ringbuffer.zone_flag(zone["number"])
+            logger.info("zone %d irrigated for %d ms, moisture %.1f%%" % (zone["number"], zone_run_ms, moisture))
+
+    if SETTINGS["ADAPTIVE_INTERVAL"]:
+        scheduler.add_reading(time_of_misuration, moistures[0], flags & ringbuffer.FLAG_IRRIGATED)
+    if SETTINGS["STATS_WINDOW_S"]:
+        windowstats.add(time_of_misuration, (temp, hum, moistures[0], battery_level))
+    interval = choose_interval()
+    trace("next interval: %d", interval)
+
+    if keep_reading(moistures, temp, hum, battery_level, max(run_ms) >= 0):
+        ringbuffer.append(time_of_misuration, temp, hum, moistures[0], battery_level, flags, interval,
+                          zones.slots(moistures))
+    elif SETTINGS["STATS_WINDOW_S"]:
+        trace("reading added to the window statistics (%d samples)", windowstats.count())
+    else:
+        trace("reading unchanged, not buffered (%d cycles)", deadband.skipped())
+    trace("readings in buffer: %d", ringbuffer.pending())
+
+    gosleepsensors(hw["climate"], hw["soil_power"], hw["waterPump_power"])
+
+# upload the backlog (or a heartbeat), diagnostics and requested logs, then disconnect
+# (a session that published nothing, e.g. only the clock sync, does not count as an upload for the deadband)
+def upload(client, battery_level):
+    published = PUBLISHED
+    publish_last_gasp(client, battery_level)
+    flush_backlog(client)
+    publish_summary(client)
+    publish_heartbeat(client, battery_level)
+    if PUBLISHED > published:
+        deadband.uploaded()
+    publish_diagnostics(client)
+    publish_logs(client)
+    disconnect(client)
+    disconnectWifi()
+
+# irrigate if needed, buffer the reading and (if online) upload the backlog and disconnect
+def complete_cycle(hw, client, moistures, temp, hum, battery_level):
+    run_ms = asyncio.run(irrigate_zones(moistures)) if irrigation_needed(moistures) else [-1] * len(moistures)
+    store_reading(hw, moistures, temp, hum, battery_level, run_ms)
+    if client is not None:
+        upload(client, battery_level)
+
+# sleep length after this cycle (seconds): adaptive (stretched as the battery state of charge drops) or fixed
+# MISURATION_INTERVAL
+def choose_interval():
+    if not SETTINGS["ADAPTIVE_INTERVAL"]:
+        return int(SETTINGS["MISURATION_INTERVAL"])
+    return scheduler.next_interval(SETTINGS["MOISTURE_LIMIT"], battery.level(), int(SETTINGS["MISURATION_INTERVAL"]),
+                                   SETTINGS["MIN_INTERVAL"], SETTINGS["MAX_INTERVAL"],
+                                   battery.soc(SETTINGS["BATTERY_LOW_LEVEL"]))
+
+def next_sleep_interval():
+    if SETTINGS["ADAPTIVE_INTERVAL"] and scheduler.interval():
+        return scheduler.interval()
+    return int(SETTINGS["MISURATION_INTERVAL"])
+
+# one wake cycle: measure, irrigate, buffer the reading and upload the backlog when needed
+def cycle(hw):
+    if SETTINGS["ASYNC_CYCLE"]:
+        asyncio.run(cycle_async(hw))
+        return
 
-    waterPump.value(0)
+    profiler.begin_cycle()
+    hw["status_led"].value(1) #status led on
+    setup_zones(hw)
+    battery_level = read_battery(hw)
+    wakeupsensors(hw["climate"], hw["soil_power"], hw["waterPump_power"])
+    settle_since(utime.ticks_ms(), SETTINGS["SENSOR_SETTLE_MS"])
 
-    while(1):
-        try:
-            status_led.value(1) #status led on
-            wakeupsensors(tempsensor_power, soil_power, waterPump_power)
-            sleep(1)
+    moistures, temp, hum = measure(hw)
 
-            connectWifi()
+    client = None
+    if upload_needed(moistures, battery_level):
+        if connectWifi():
             client = connectMQTT()
+            subscribe_commands(client)
+
+            drain_commands_blocking(client)
+            trace("soil limit %d", SETTINGS["MOISTURE_LIMIT"])
+            trace("irrigate now: %d", IRRIGATE_ZONES)
+        else:
+            disconnectWifi()  # network down: the reading stays in the buffer, retried on the next wake
+
+    complete_cycle(hw, client, moistures, temp, hum, battery_level)
+
+# wifi association without blocking: other tasks run while the radio connects (bounded by WIFI_TIMEOUT_MS)
+async def connectWifi_async():
+    profiler.start("connectWifi")
+    trace("Connecting...")
+    return wifi_connected(await wifi.connect_async(secrets.SSID, secrets.PASSWORD, SETTINGS["WIFI_TIMEOUT_MS"],
+                                                   SETTINGS["WIFI_RETRIES"], static_ip(), SETTINGS["WIFI_LEASE_S"]))
+
+# None if the network is down (the readings stay in the buffer)
+async def go_online_async():
+    if not await connectWifi_async():
+        disconnectWifi()
+        return None
+    client = connectMQTT(False)
+    subscribe_commands(client)
+    return client
 
-            subscribe(client, "new_moisture_limit")
-            subscribe(client, "new_active_pump_for")
-            subscribe(client, "new_misuration_interval")
-            subscribe(client, "irrigate_now")
-
-            client.check_msg()
-            print("soil limit ", SETTINGS["MOISTURE_LIMIT"])
-            print("irrigate now: ", SETTINGS["IRRIGATE_NOW"])
-
-            moisture = soil.read_u16()
-            moisture = mapValue(moisture, 39500, 14000, 0, 100)
-            print("moisture: " + "%.2f" % moisture + "% (adc: " + str(soil.read_u16()) + ")")
-
-            tempsensor.measure()
-            temp = tempsensor.temperature()
-            hum = tempsensor.humidity()
-
-            battery_level = medium_battery_level(battery)
-            print("battery_level: " + "%.2f" % battery_level + "V")
-
-            time_of_misuration = get_iso_time()  # converte tuple di localtime un una stringa in formato ISO (due cifre per hh,mm,ss es. 2sec -> 02sec)
-            print("time_of_misuration:", time_of_misuration)
-
-            if moisture < SETTINGS["MOISTURE_LIMIT"] or IRRIGATE_NOW:
-                activatePump(waterPump)
-                SETTINGS["LAST_IRRIGATION"] = time_of_misuration
-                SETTINGS["IRRIGATE_NOW"] = False
-                SETTINGS["SETTINGS_SAVED"] = False
-                print("irrigation_time:", SETTINGS["LAST_IRRIGATION"])
+# same as drain_commands_blocking(), other tasks run between the polls
+async def drain_commands(client):
+    started = utime.ticks_ms()
+    while utime.ticks_diff(utime.ticks_ms(), started) < SETTINGS["COMMAND_WAIT_MS"]:
+        client.check_msg()
+        await asyncio.sleep_ms(20)
+
+# the rest of the DHT22 warm-up after the soil reads is awaited (wifi association runs meanwhile)
+async def measure_async(hw):
+    await asyncio.sleep_ms(SETTINGS["SENSOR_SETTLE_MS"])
+    profiler.start("sensors")
+    moistures = read_zones()
+    temp, hum, stale = await dhtsensor.read_async(hw["climate"], SETTINGS["DHT_RETRIES"], SETTINGS["DHT_WARMUP_MS"])
+    trace_climate(temp, hum, stale)
+    profiler.stop("sensors")
+    return moistures, temp, hum
+
+# same cycle as cycle(), but wifi association (when the upload is already due) overlaps sensor settling and reads
+async def cycle_async(hw):
+    profiler.begin_cycle()
+    hw["status_led"].value(1) #status led on
+    setup_zones(hw)
+    battery_level = read_battery(hw)
+    wakeupsensors(hw["climate"], hw["soil_power"], hw["waterPump_power"])
+
+    online = asyncio.create_task(go_online_async()) if upload_due() else None
+    moistures, temp, hum = await measure_async(hw)
+
+    client = None
+    if online is not None:
+        client = await online
+    elif upload_needed(moistures, battery_level):
+        client = await go_online_async()
+
+    if client is not None:
+        await asyncio.create_task(drain_commands(client))
+        trace("soil limit %d", SETTINGS["MOISTURE_LIMIT"])
+        trace("irrigate now: %d", IRRIGATE_ZONES)
+
+    # the pump runs as a task: readings already in the buffer are uploaded meanwhile
+    irrigation = asyncio.create_task(irrigate_zones(moistures)) if irrigation_needed(moistures) else None
+    if client is not None and irrigation is not None:
+        await asyncio.sleep_ms(0)  # let the pump start first
+        flush_backlog(client)
+    run_ms = await irrigation if irrigation is not None else [-1] * len(moistures)
+
+    store_reading(hw, moistures, temp, hum, battery_level, run_ms)
+    if client is not None:
+        upload(client, battery_level)
+
+# store changed settings and the log, close the cycle profile before going to sleep
+def end_cycle(hw):
+    started = utime.ticks_ms()
+    settingsstore.commit()  # writes only if a setting changed
+    deadband.save()
+    windowstats.save()
+    scheduler.save()
+    dhtsensor.save()
+    battery.save()
+    logger.flush()
+    gc.collect()    # next cycle starts with a clean heap (the time counts towards END_SETTLE_MS)
+    settle_since(started, SETTINGS["END_SETTLE_MS"])
+    profiler.end_cycle(SETTINGS["SLEEP_MODE"] == "deepsleep")   # deep sleep resets: RAM statistics are lost
+    hw["status_led"].value(0) #status led off
+
+# wake cycle with the station error handling: on any error log it, save settings and reboot
+def wake_cycle(hw):
+    try:
+        cycle(hw)
+    except KeyboardInterrupt:
+        sys.exit(0)
+    except Exception as e:
+        pump.stop()
+        print("Generic error in try block: ", e)
+        logger.error("Error: " + str(e))
+        logger.flush()
+        disconnectWifi()
+        settingsstore.commit()
+        profiler.save()     # statistics of the cycles since the last write are only in RAM
+        sleep(5)
+        reset()
 
-            data = json.dumps(makeData(temp, hum, moisture, time_of_misuration, battery_level))
-            publish(client, "picoW/sensor", data)
+    end_cycle(hw)
 
-            gosleepsensors(tempsensor_power, soil_power, waterPump_power)
-            disconnect(client)
-            disconnectWifi()
-
-        except KeyboardInterrupt:
-            sys.exit(0)
-        except Exception as e:
-            disconnectWifi()
-            print("Generic error in try block: ", e)
-            writelogs('logfile.txt', 'Error: ' + str(e))
-            save_settings()
-            sleep(5)
-            reset()
-        
-        if not SETTINGS_SAVED:
-            save_settings()
-        sleep(1)
-        status_led.value(0) #status led off
-        print("Going to deep sleep for 1 hour...")
-        interval_ms = int(SETTINGS["MISURATION_INTERVAL"]) * 1000
-        deepsleep(interval_ms)
-        print("Woke up from deep sleep!")
+def main():
+    hw = init_hardware()
 
-if __name__ == "__main__":
+    while(1):
+        wake_cycle(hw)
+        interval = next_sleep_interval()
+        trace("Going to deep sleep for %d seconds...", interval)
+        deepsleep(interval)
+        trace("Woke up from deep sleep!")
+
+# entry point (also called by the main.py of a precompiled build, see tools/build_mpy.py)
+def run():
     try:
         main()
     except OSError as e:
         print("Error: " + str(e))
-        save_settings()
+        logger.error("Error: " + str(e))
+        logger.flush()
+        settingsstore.commit()
         disconnectWifi()
-        reset()
\ No newline at end of file
+        reset()
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
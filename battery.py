@@ -0,0 +1,167 @@
+# Battery state of charge (SoC) and runtime estimate for the 18650 Li-ion cell of the station
+# - per-device calibration: voltage divider ratio and offset (one multimeter reading, see batterystatus.py)
+# - load sag compensation: the cell voltage drops by load current x internal resistance (cell, holder, wiring);
+#   the voltage is best sampled with the radio off, the remaining load (awake CPU, radio if on) is added back
+# - SoC from a rest (open circuit) voltage curve of a 18650 cell, linear interpolation between the points
+# - the SoC is filtered (EWMA) and the discharge rate (%/hour) is measured between readings at least
+#   RATE_MIN_HOURS apart, so the runtime left can be predicted; a SoC jump up (charge/battery swap) restarts it
+# - last gasp: one alarm when the SoC falls below a threshold, armed again after a charge
+# State is kept on flash (battery.bin) across deep sleep; it is written when the rate measurement, the rate or
+# the last gasp changes, the filtered SoC only once it moved by SAVE_LEVEL (not on every reading).
+#
+# record: anchor epoch (I), anchor SoC x10 (h), filtered SoC x10 (h, -1 none), rate %/h x1000 (i, -1 none),
+#         last gasp sent (B)
+#
+# usage:
+#   battery.load()
+#   battery.calibrate(2.2, offset_mv=0, resistance_mohm=150)
+#   volts = battery.rest_voltage(battery.voltage(raw), battery.AWAKE_MA)
+#   soc = battery.update(epoch, volts)      # epoch 0: clock not valid, SoC filtered only
+#   battery.runtime_h()                     # None until the rate is known
+#   battery.save()                          # once per cycle (writes only on a significant change)
+
+import struct
+
+BATTERY_FILE = "battery.bin"
+RECORD_FORMAT = "<IhhiB"
+
+ADC_REF_V = 3.3
+AWAKE_MA = 25           # RP2040 at 125MHz + board, sensors off
+RADIO_MA = 50           # CYW43 associated (average, bursts of TX are higher)
+
+# rest voltage (mV) -> SoC (%) of a 18650 cell at room temperature, ascending
+CURVE = ((3000, 0), (3300, 2), (3450, 5), (3600, 10), (3680, 15), (3720, 20), (3750, 25), (3770, 30),
+         (3790, 35), (3800, 40), (3820, 45), (3840, 50), (3860, 55), (3880, 60), (3910, 65), (3950, 70),
+         (3980, 75), (4020, 80), (4060, 85), (4100, 90), (4150, 95), (4200, 100))
+
+FILTER = 0.25           # EWMA weight of a new SoC reading (ADC noise is a few % of SoC on the flat part)
+RATE_MIN_HOURS = 6      # shorter spans are dominated by noise
+RATE_WEIGHT = 0.5       # EWMA weight of a new rate measurement
+CHARGE_JUMP = 5         # SoC rise (%) taken as a charge or a battery swap
+SAVE_LEVEL = 1          # filtered SoC change (%) worth a flash write
+
+_divider = 2.2
+_offset_mv = 0
+_resistance_mohm = 150
+
+_level = None           # filtered SoC (%)
+_anchor_time = 0        # start of the current rate measurement (epoch, 0: none)
+_anchor_level = 0.0
+_rate = None            # %/hour, positive while discharging
+_gasp_sent = False
+_saved_level = None     # filtered SoC on flash
+_dirty = False
+
+def calibrate(divider, offset_mv=0, resistance_mohm=150):
+    """Per-device calibration: battery volts = pin volts * divider + offset; cell + wiring resistance."""
+    global _divider, _offset_mv, _resistance_mohm
+    _divider, _offset_mv, _resistance_mohm = divider, offset_mv, resistance_mohm
+
+def divider_for(raw, measured_volts, offset_mv=0):
+    """Divider ratio that maps a raw reading to the voltage measured with a multimeter."""
+    return (measured_volts - offset_mv / 1000) / (raw * ADC_REF_V / 65535)
+
+def voltage(raw):
+    """Battery voltage from a raw read_u16() value."""
+    return raw * ADC_REF_V / 65535 * _divider + _offset_mv / 1000
+
+def raw(volts):
+    """Raw read_u16() value of a battery voltage (e.g. thresholds for monitor.py)."""
+    return int((volts - _offset_mv / 1000) / _divider * 65535 / ADC_REF_V)
+
+def rest_voltage(volts, load_ma):
+    """Voltage without the sag of load_ma through the cell and wiring resistance."""
+    return volts + load_ma * _resistance_mohm / 1000000
+
+def soc(volts):
+    """State of charge (%) of a rest voltage."""
+    mv = volts * 1000
+    if mv <= CURVE[0][0]:
+        return 0.0
+    for i in range(1, len(CURVE)):
+        high_mv, high_soc = CURVE[i]
+        if mv <= high_mv:
+            low_mv, low_soc = CURVE[i - 1]
+            return low_soc + (high_soc - low_soc) * (mv - low_mv) / (high_mv - low_mv)
+    return 100.0
+
+def load():
+    global _level, _anchor_time, _anchor_level, _rate, _gasp_sent, _saved_level, _dirty
+    _level, _anchor_time, _anchor_level, _rate, _gasp_sent, _dirty = None, 0, 0.0, None, False, False
+    _saved_level = None
+    try:
+        with open(BATTERY_FILE, "rb") as f:
+            anchor_time, anchor_level, level, rate, gasp_sent = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+    _anchor_time, _anchor_level = anchor_time, anchor_level / 10
+    _level = level / 10 if level >= 0 else None
+    _rate = rate / 1000 if rate >= 0 else None
+    _gasp_sent = bool(gasp_sent)
+    _saved_level = _level
+
+def save():
+    global _saved_level, _dirty
+    if not _dirty:
+        return
+    with open(BATTERY_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, _anchor_time, round(_anchor_level * 10),
+                            round(_level * 10) if _level is not None else -1,
+                            round(_rate * 1000) if _rate is not None else -1, _gasp_sent))
+    _saved_level = _level
+    _dirty = False
+
+def update(epoch, volts):
+    """Add a rest voltage reading (epoch 0 if the clock is not valid); returns the filtered SoC."""
+    global _level, _anchor_time, _anchor_level, _rate, _gasp_sent, _dirty
+    reading = soc(volts)
+    if _level is None or reading - _level > CHARGE_JUMP:
+        # first reading or charged: the rate measurement starts again (the last rate is kept)
+        _level = reading
+        _anchor_time, _anchor_level = epoch, reading
+        _gasp_sent, _dirty = False, True
+        return _level
+    _level += (reading - _level) * FILTER
+    if _saved_level is None or abs(_level - _saved_level) >= SAVE_LEVEL:
+        _dirty = True
+    if not epoch:
+        return _level
+    if not _anchor_time or epoch < _anchor_time:
+        _anchor_time, _anchor_level, _dirty = epoch, _level, True
+    elif epoch - _anchor_time >= RATE_MIN_HOURS * 3600:
+        rate = (_anchor_level - _level) * 3600 / (epoch - _anchor_time)
+        if rate >= 0:
+            _rate = rate if _rate is None else _rate + (rate - _rate) * RATE_WEIGHT
+        _anchor_time, _anchor_level, _dirty = epoch, _level, True
+    return _level
+
+def level():
+    """Filtered SoC (%), 100 before the first reading."""
+    return _level if _level is not None else 100.0
+
+def rate():
+    """Discharge rate (%/hour), None until measured."""
+    return _rate
+
+def runtime_h():
+    """Hours left until the battery is empty at the measured rate, None if not known."""
+    if _level is None or not _rate:
+        return None
+    return _level / _rate
+
+def last_gasp_due(threshold):
+    """True once when the SoC is below threshold (armed again by a charge)."""
+    return _level is not None and _level < threshold and not _gasp_sent
+
+def gasp_sent():
+    global _gasp_sent, _dirty
+    _gasp_sent, _dirty = True, True
+
+def report():
+    runtime = runtime_h()
+    return {
+        "soc": round(level(), 1),
+        "rate_pct_h": round(_rate, 3) if _rate is not None else None,
+        "runtime_h": round(runtime) if runtime is not None else None,
+        "divider": _divider,
+    }
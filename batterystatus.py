@@ -3,30 +3,38 @@
 # sfrutto due resistenze in serie R1 e R2 tale che rapporto R2/R1+R2 sia circa 0.6666... -> tale rapporto consente di ridurre la tensione di ingresso 
 # ad un massimo di 2.8V: infatti la tensione su R2 è data da: Vr2 = [R2/(R1+R2)] * Vb dove Vb è la tensione della batteria
 
+# lettura con burst ADC veloce (sampling.py): 20 campioni in pochi ms, media troncata invece di 20 x sleep(0.5)
+# conversione e stato di carica con battery.py (stessa calibrazione e curva 18650 della stazione)
+# calibrazione per dispositivo: misurare la batteria con un multimetro e scrivere il valore in MEASURED_V,
+# lo script stampa il BATTERY_DIVIDER da impostare sulla stazione (picoW/<MQTT_CLIENT>/cmd/set/BATTERY_DIVIDER)
+
 from machine import Pin, ADC
-from time import sleep
+import sampling
+import battery
+
+BATTERY_DIVIDER = 1.50  # 1 / (R2/(R1+R2)) del partitore di questo circuito (la stazione usa il setting BATTERY_DIVIDER)
+MEASURED_V = 0          # tensione misurata con il multimetro (0 -> nessuna calibrazione)
 
-VOLTAGE_DROP_FACTOR = 1.50
+SAMPLES = 20
+SPACING_US = 200
 
-def check_battery(battery):
-    level = battery.read_u16() * (3.3 / 65535) * VOLTAGE_DROP_FACTOR
+def check_battery(raw):
+    level = battery.voltage(raw)
     print(level)
     return level
 
-def medium_battery_level(battery):
-    records = []
-    total = 0
-    for i in range(20):
-        level = check_battery(battery)
-        records.append(level)
-        sleep(0.5)
-    for value in records:
-        total += value
-    return total / len(records)
+def medium_battery_level(adc):
+    median, mean, spread = sampling.read(adc, SAMPLES, SPACING_US)
+    print("adc median: %d, trimmed mean: %d, spread: %d" % (median, mean, spread))
+    if MEASURED_V:
+        print("BATTERY_DIVIDER calibrato: %.4f" % battery.divider_for(mean, MEASURED_V))
+    return check_battery(mean)
 
 def main():
-    battery = ADC(Pin(28))
-    battery_level = medium_battery_level(battery)
+    battery.calibrate(BATTERY_DIVIDER)
+    adc = ADC(Pin(28))
+    battery_level = medium_battery_level(adc)
     print("battery_level: ", battery_level)
-    
+    print("state of charge: %.0f%%" % battery.soc(battery.rest_voltage(battery_level, battery.AWAKE_MA)))
+
 main()
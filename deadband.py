@@ -0,0 +1,103 @@
+# Change-only publishing for the watering station (deadband filter kept on flash across deep sleep)
+# A reading is kept (buffered and published) only if one of temperature, humidity, moisture or battery moved
+# out of its deadband from the last kept reading; a full reading is forced after 'full_every' skipped cycles.
+# In stable conditions most wakes buffer nothing, so the upload (WiFi + MQTT session) is needed much less often.
+#
+# record: valid (B), last kept temp x10 (h), hum x10 (h), moisture x10 (h), battery mV (H),
+#         cycles since the last kept reading (H), cycles since the last upload (H),
+#         moisture x10 of the zones 2..4 by number (3h, -32768 if not used)
+#
+# usage:
+#   deadband.load()
+#   if deadband.changed(temp, hum, moisture, battery_level, bands, zones) or deadband.full_due(12):
+#       deadband.keep(temp, hum, moisture, battery_level, zones)
+#   else:
+#       deadband.skip()
+#   deadband.uploaded()     # after an upload session
+#   deadband.save()         # once per cycle (writes only if something changed)
+
+import struct
+
+DEADBAND_FILE = "deadband.bin"
+RECORD_FORMAT = "<BhhhHHH3h"
+ZONE_SLOTS = 3
+NO_READING = -32768
+
+_last = None        # (temp, hum, moisture, battery_level) of the last kept reading
+_last_zones = ()    # moisture of the zones 2..4 (by number, None: not used) in the last kept reading
+_skipped = 0
+_since_upload = 0
+_dirty = False
+
+def load():
+    global _last, _last_zones, _skipped, _since_upload, _dirty
+    _last, _last_zones, _skipped, _since_upload, _dirty = None, (), 0, 0, False
+    try:
+        with open(DEADBAND_FILE, "rb") as f:
+            record = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+    valid, temp, hum, moisture, battery, _skipped, _since_upload = record[:7]
+    if valid:
+        _last = (temp / 10, hum / 10, moisture / 10, battery / 1000)
+        _last_zones = tuple(None if m == NO_READING else m / 10 for m in record[7:])
+
+def save():
+    global _dirty
+    if not _dirty:
+        return
+    temp, hum, moisture, battery = _last if _last is not None else (0, 0, 0, 0)
+    zones = [NO_READING if m is None else round(m * 10) for m in _slots(_last_zones)]
+    with open(DEADBAND_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, _last is not None, round(temp * 10), round(hum * 10),
+                            round(moisture * 10), round(battery * 1000), min(_skipped, 65535),
+                            min(_since_upload, 65535), *zones))
+    _dirty = False
+
+def _slots(zones):
+    # zones 2..4 by number, padded with None (not used)
+    zones = tuple(zones[:ZONE_SLOTS])
+    return zones + (None,) * (ZONE_SLOTS - len(zones))
+
+def changed(temp, hum, moisture, battery_level, bands, zones=()):
+    """True if a value is out of its band (bands: temp, hum, moisture, battery; the zones 2..4, by number with
+    None if not used, use the moisture band) or nothing was kept yet (or the zones in use changed)."""
+    if _last is None:
+        return True
+    for value, last, band in zip((temp, hum, moisture, battery_level), _last, bands):
+        if abs(value - last) > band:
+            return True
+    for value, last in zip(_slots(zones), _slots(_last_zones)):
+        if (value is None) != (last is None) or value is not None and abs(value - last) > bands[2]:
+            return True
+    return False
+
+def full_due(full_every):
+    return _skipped + 1 >= full_every
+
+def keep(temp, hum, moisture, battery_level, zones=()):
+    """The reading is published: it becomes the new reference."""
+    global _last, _last_zones, _skipped, _since_upload, _dirty
+    _last = (temp, hum, moisture, battery_level)
+    _last_zones = _slots(zones)
+    _skipped = 0
+    _since_upload += 1
+    _dirty = True
+
+def skip():
+    global _skipped, _since_upload, _dirty
+    _skipped += 1
+    _since_upload += 1
+    _dirty = True
+
+def uploaded():
+    global _since_upload, _dirty
+    _since_upload = 0
+    _dirty = True
+
+def skipped():
+    """Cycles since the last kept reading (0 if the reading of this cycle was kept)."""
+    return _skipped
+
+def since_upload():
+    return _since_upload
@@ -33,14 +33,18 @@
 # BONUS: 
 # Si potrebbe aggiungere un hard-reset del microcontrollore alla fine del deepsleep tramite funzione machine.reset()
 
+# NB: la stazione (WaterPlantStation.py) usa power.py, che offre anche machine.lightsleep() e la correzione del drift
+
 from machine import Pin, freq
 from time import sleep
 
+# seconds (int) in chunks of 60s + remainder: range() needs an int, a float would fail on MicroPython
 def delay(seconds):
-    seconds = seconds / 60
-    for _ in range(seconds):
+    minutes, rest = divmod(int(seconds), 60)
+    for _ in range(minutes):
         sleep(60)
         print("sleeping!")
+    sleep(rest)
 
 def gosleep():
     clock_speed = 48000000
@@ -50,13 +54,11 @@ def gosleep():
         if i not in [25, 14, 15]:  # Alcuni GPIO sono usati, come il LED integrato
             gpio = Pin(i, Pin.IN, Pin.PULL_DOWN)
 
+# only the clock is restored: turning every GPIO into an output would glitch loads like a relay,
+# the application configures its own pins again
 def wakeup():
     clock_speed = 125000000
     freq(clock_speed)
-
-    for i in range(28):
-        if i not in [25, 14, 15]:  # Alcuni GPIO sono usati, come il LED integrato
-            gpio = Pin(i, Pin.OUT, Pin.PULL_DOWN)
             
     print("all up after sleep!")
 
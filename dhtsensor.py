@@ -0,0 +1,176 @@
+# DHT22 (AM2302) temperature/humidity driver layer with warm-up aware reads, retries and read statistics
+# The DHT22 does not answer for ~2 s after power-up and needs at least 2 s between two reads: a read that comes
+# too early times out (OSError ETIMEDOUT). Each sensor remembers when it was powered and when it was last read,
+# and is read at the earliest valid moment (read_async(): other tasks run while it warms up).
+# A failed read (timeout, checksum error of the dht module, value out of range) is retried after a backoff
+# that doubles from the minimum interval up to BACKOFF_MAX_MS; when every attempt fails the last good value is
+# returned flagged as stale (kept on flash across deep sleep), so a sensor glitch is not a failed wake cycle.
+# The last good value is written to flash only when it moved by SAVE_TEMP/SAVE_HUM or the saved one is older
+# than SAVE_AGE_S, not on every read: a fallback is at most that far off.
+# Reads, failures by kind, retries, fallbacks and the read latency (from the read request to a valid value,
+# warm-up wait included) are counted per sensor since boot for the diagnostics.
+#
+# record (last good value): valid (B), temperature x10 (h), humidity x10 (h), epoch (I)
+#
+# usage:
+#   sensor = dhtsensor.sensor(dht.DHT22(Pin(3, Pin.IN)), Pin(2, Pin.OUT), "dht22")   # loads the last good value
+#   dhtsensor.power(sensor, 1)
+#   ...                                                 # soil sensors, wifi
+#   temp, hum, stale = dhtsensor.read(sensor)           # or: await dhtsensor.read_async(sensor)
+#   dhtsensor.power(sensor, 0)
+#   dhtsensor.report()                                  # {"dht22": {"reads": ..., "timeouts": ..., ...}}
+#   dhtsensor.save()                                    # once per cycle (writes only on a significant change)
+
+import struct
+import utime
+import uasyncio as asyncio
+
+RECORD_FORMAT = "<BhhI"
+
+WARMUP_MS = 2000        # power-up to the first valid read
+INTERVAL_MS = 2000      # minimum time between two reads (failed ones included)
+BACKOFF_MAX_MS = 8000
+RETRIES = 2
+TICK_MS = 1             # a ticks_ms() difference can be up to 1 ms longer than the real time
+
+SAVE_TEMP = 1           # change of the last good value worth a flash write (C, %RH: about the sensor accuracy)
+SAVE_HUM = 5
+SAVE_AGE_S = 6 * 3600   # the saved value (and its epoch, the age of a fallback) is refreshed at least this often
+
+TEMP_RANGE = (-40, 80)  # DHT22 datasheet
+HUM_RANGE = (0, 100)
+
+_sensors = []
+
+def sensor(dht_sensor, power_pin=None, name="dht22"):
+    """Driver state of a dht.DHT22 (power_pin None: always powered); the last good value is loaded from flash."""
+    s = {
+        "dht": dht_sensor, "power": power_pin, "name": name, "file": name + ".bin",
+        "powered_at": utime.ticks_ms() if power_pin is None else None, "read_at": None,
+        "last_good": None, "saved": None, "stale": False, "dirty": False,
+        "reads": 0, "timeouts": 0, "checksum_errors": 0, "range_errors": 0, "retries": 0, "fallbacks": 0,
+        "latency_ms_total": 0, "latency_ms_max": 0,
+    }
+    _load(s)
+    _sensors.append(s)
+    return s
+
+def _load(s):
+    try:
+        with open(s["file"], "rb") as f:
+            valid, temp, hum, epoch = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+    if valid:
+        s["last_good"] = s["saved"] = (temp / 10, hum / 10, epoch)
+
+def save():
+    for s in _sensors:
+        if s["dirty"]:
+            temp, hum, epoch = s["last_good"]
+            with open(s["file"], "wb") as f:
+                f.write(struct.pack(RECORD_FORMAT, 1, round(temp * 10), round(hum * 10), epoch))
+            s["saved"] = s["last_good"]
+            s["dirty"] = False
+
+def power(s, on):
+    """Switch the sensor supply; the warm-up starts when it is switched on."""
+    if s["power"] is None:
+        return
+    if on and s["powered_at"] is None:
+        s["powered_at"] = utime.ticks_ms()
+        s["read_at"] = None
+    elif not on:
+        s["powered_at"] = None
+    s["power"].value(1 if on else 0)
+
+def wait_ms(s, warmup_ms=WARMUP_MS, attempt=0):
+    """Time left until the sensor can be read (attempt > 0: backoff after attempt failed reads)."""
+    if s["powered_at"] is None:
+        raise OSError("%s not powered" % s["name"])
+    now = utime.ticks_ms()
+    wait = warmup_ms - utime.ticks_diff(now, s["powered_at"])
+    if s["read_at"] is not None:
+        gap = min(INTERVAL_MS << max(0, attempt - 1), BACKOFF_MAX_MS) if attempt else INTERVAL_MS
+        wait = max(wait, gap - utime.ticks_diff(now, s["read_at"]))
+    return max(0, wait + TICK_MS)
+
+def _attempt(s):
+    # one read of the sensor; True if it returned a valid value
+    dht_sensor = s["dht"]
+    try:
+        dht_sensor.measure()
+        temp, hum = dht_sensor.temperature(), dht_sensor.humidity()
+    except OSError:
+        s["timeouts"] += 1
+        return False
+    except Exception:   # the dht module raises a plain Exception on a checksum error
+        s["checksum_errors"] += 1
+        return False
+    finally:
+        s["read_at"] = utime.ticks_ms()
+    if not (TEMP_RANGE[0] <= temp <= TEMP_RANGE[1] and HUM_RANGE[0] <= hum <= HUM_RANGE[1]):
+        s["range_errors"] += 1
+        return False
+    s["last_good"] = (temp, hum, utime.time())
+    saved = s["saved"]
+    if (saved is None or abs(temp - saved[0]) >= SAVE_TEMP or abs(hum - saved[1]) >= SAVE_HUM
+            or abs(s["last_good"][2] - saved[2]) >= SAVE_AGE_S):
+        s["dirty"] = True
+    return True
+
+def _result(s, ok, started):
+    # (temperature, humidity, stale) after the attempts of one read
+    s["stale"] = not ok
+    if ok:
+        latency = utime.ticks_diff(utime.ticks_ms(), started)
+        s["reads"] += 1
+        s["latency_ms_total"] += latency
+        s["latency_ms_max"] = max(s["latency_ms_max"], latency)
+    else:
+        s["fallbacks"] += 1
+        if s["last_good"] is None:
+            raise OSError("%s: no valid reading" % s["name"])
+    temp, hum, epoch = s["last_good"]
+    return temp, hum, s["stale"]
+
+def read(s, retries=RETRIES, warmup_ms=WARMUP_MS):
+    """(temperature, humidity, stale): waits for the warm-up, retries; stale -> last good value.
+    Raises OSError if every attempt failed and there is no good value yet."""
+    started = utime.ticks_ms()
+    for attempt in range(retries + 1):
+        if attempt:
+            s["retries"] += 1
+        utime.sleep_ms(wait_ms(s, warmup_ms, attempt))
+        if _attempt(s):
+            return _result(s, True, started)
+    return _result(s, False, started)
+
+async def read_async(s, retries=RETRIES, warmup_ms=WARMUP_MS):
+    """Same as read(), other tasks run during the warm-up and the backoff."""
+    started = utime.ticks_ms()
+    for attempt in range(retries + 1):
+        if attempt:
+            s["retries"] += 1
+        await asyncio.sleep_ms(wait_ms(s, warmup_ms, attempt))
+        if _attempt(s):
+            return _result(s, True, started)
+    return _result(s, False, started)
+
+def stale(s):
+    """True if the last read returned the last good value instead of a new one."""
+    return s["stale"]
+
+def report():
+    """Read statistics since boot per sensor name."""
+    result = {}
+    for s in _sensors:
+        last_good = s["last_good"]
+        result[s["name"]] = {
+            "reads": s["reads"], "timeouts": s["timeouts"], "checksum_errors": s["checksum_errors"],
+            "range_errors": s["range_errors"], "retries": s["retries"], "fallbacks": s["fallbacks"],
+            "latency_ms_mean": s["latency_ms_total"] // s["reads"] if s["reads"] else None,
+            "latency_ms_max": s["latency_ms_max"],
+            "last_good_age_s": utime.time() - last_good[2] if last_good else None,
+        }
+    return result
@@ -0,0 +1,99 @@
+# Second core stand-in (_thread) for the host simulator
+# start_new_thread() runs the function on a real thread, in lock step with the virtual clock: only one of the
+# two cores runs at a time. Core 1 runs until it sleeps (utime.sleep*), then core 0 continues; when the virtual
+# clock reaches the end of that sleep, core 1 runs again. Code on core 1 takes no virtual time.
+# A lock held by core 0 makes core 1 spin (virtual time passes) until it is released, as on the board;
+# a lock held by core 1 while it sleeps would block core 0 for good: acquiring it raises.
+#
+# CPython has a built-in _thread module: sim.install() puts this one in sys.modules instead.
+
+import threading
+import vclock
+
+SPIN_US = 50
+
+_core1 = None
+
+class _Core:
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self.run = threading.Semaphore(0)
+        self.paused = threading.Semaphore(0)
+        self.thread = threading.Thread(target=self._main, daemon=True)
+        self.stopped = False
+
+    def _main(self):
+        self.run.acquire()
+        try:
+            self.function(*self.args)
+        except Exception as e:
+            print("core 1 stopped: %r" % (e,))
+        finally:
+            vclock.set_core1(None, None)
+            self.paused.release()
+
+    def _resume(self):
+        # called on core 0 (virtual clock event): let core 1 run until it sleeps again
+        if self.stopped:
+            return
+        self.run.release()
+        self.paused.acquire()
+
+    def sleep_us(self, us):
+        # called on core 1
+        vclock.call_at(vclock.now_us() + max(1, int(us)), self._resume)
+        self.paused.release()
+        self.run.acquire()
+
+def start_new_thread(function, args, kwargs=None):
+    global _core1
+    if _core1 is not None and _core1.thread.is_alive():
+        raise OSError(16)  # EBUSY: core 1 in use
+    _core1 = _Core(function, args)
+    _core1.thread.start()
+    vclock.set_core1(_core1.thread.ident, _core1.sleep_us)
+    _core1._resume()
+
+def get_ident():
+    return threading.get_ident()
+
+class LockType:
+    def __init__(self):
+        self._owner = None
+
+    def acquire(self, waitflag=1, timeout=-1):
+        if self._owner is not None and not waitflag:
+            return False
+        while self._owner is not None:
+            if _core1 is None or threading.get_ident() != _core1.thread.ident or self._owner == get_ident():
+                raise RuntimeError("lock already held: this core would block forever")
+            _core1.sleep_us(SPIN_US)    # core 0 holds it (e.g. spacing sleeps of an ADC burst)
+        self._owner = threading.get_ident()
+        return True
+
+    def release(self):
+        if self._owner is None:
+            raise RuntimeError("release unlocked lock")
+        self._owner = None
+
+    def locked(self):
+        return self._owner is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+def allocate_lock():
+    return LockType()
+
+def reset_state():
+    """Board reset: core 1 stops (its thread stays blocked and is never resumed)."""
+    global _core1
+    if _core1 is not None:
+        _core1.stopped = True
+    _core1 = None
+    vclock.set_core1(None, None)
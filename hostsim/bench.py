@@ -0,0 +1,299 @@
+# Benchmark for WaterPlantStation wake cycles on the host simulator
+# Runs thousands of simulated wake cycles (no real time is spent sleeping) against a simple plant model
+# and reports awake time per phase, bytes sent over MQTT/TLS, heap usage, boot latency (reset to first wake cycle
+# and to first publish, module compile time included, see sim.py) and a modelled energy budget.
+#
+# usage:
+#   python hostsim/bench.py --cycles 5000
+#   python hostsim/bench.py --json results.json
+#   python hostsim/bench.py --baseline results.json --tolerance 0.1    (exit code 1 on regression)
+#   python hostsim/bench.py --set ASYNC_CYCLE=false --set UPLOAD_EVERY=1  (override station settings)
+#   python hostsim/bench.py --mpy             (modules loaded from .mpy instead of compiled from source)
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+import sim
+sim.install()
+
+import vclock
+import energy
+import heap
+import machine
+import broker
+import dht
+import ntptime
+
+# hardware of the station (see WaterPlantStation.init_hardware)
+RELAY_PIN = 0
+TEMPSENSOR_POWER_PIN = 2
+PUMP_POWER_PIN = 4
+SOIL_POWER_PIN = 22
+SOIL_ADC_PIN = 26
+BATTERY_ADC_PIN = 28
+VOLTAGE_DIVIDER = 2.2
+RECHARGE_BELOW = 0.33       # charge left: the battery is swapped before the station sees it as low
+
+# compared against --baseline
+CHECKED = ("awake_ms_mean", "bytes_sent_per_cycle", "energy_mah_per_day", "boot_to_publish_ms")
+
+class Plant:
+    """Soil that dries out over time and gets wetter while the pump runs."""
+
+    DRYING_PER_HOUR = 0.9       # moisture % lost per hour
+    PUMP_PER_SECOND = 4.0       # moisture % gained per second of pumping
+
+    def __init__(self, moisture=45.0):
+        self.moisture = moisture
+        self.updated_us = vclock.now_us()
+        self.pumping = False
+
+    def update(self):
+        elapsed_us = vclock.now_us() - self.updated_us
+        self.moisture -= self.DRYING_PER_HOUR * elapsed_us / 3600000000
+        if self.pumping:
+            self.moisture += self.PUMP_PER_SECOND * elapsed_us / 1000000
+        self.moisture = min(100.0, max(0.0, self.moisture))
+        self.updated_us = vclock.now_us()
+
+    def soil_raw(self):
+        self.update()
+        if not machine.level(SOIL_POWER_PIN):
+            return 0
+        raw = 39500 + self.moisture * (14000 - 39500) / 100
+        return raw + random.gauss(0, 120)
+
+    def relay(self, on):
+        powered = machine.level(PUMP_POWER_PIN)
+        energy.set_load("pump", energy.PUMP_MA if on and powered else 0)
+        self.update()
+        self.pumping = bool(on)
+
+def battery_raw():
+    return energy.battery_voltage() / VOLTAGE_DIVIDER / 3.3 * 65535 + random.gauss(0, 40)
+
+def temperature():
+    day = (vclock.true_time() % 86400) / 86400
+    return 19 + 6 * math.sin(2 * math.pi * (day - 0.25)) + random.gauss(0, 0.2)
+
+def humidity():
+    return 55 - 10 * math.sin(2 * math.pi * ((vclock.true_time() % 86400) / 86400 - 0.25))
+
+def sensors_power(_):
+    on = machine.level(TEMPSENSOR_POWER_PIN) or machine.level(SOIL_POWER_PIN)
+    energy.set_load("sensors", energy.SENSORS_MA if on else 0)
+
+def setup_scenario(plant, dht_failure_rate, ntp_failure_rate, rtc_drift_ppm):
+    machine.adc_source(SOIL_ADC_PIN, plant.soil_raw)
+    machine.adc_source(BATTERY_ADC_PIN, battery_raw)
+    machine.watch_pin(RELAY_PIN, plant.relay)
+    machine.watch_pin(TEMPSENSOR_POWER_PIN, sensors_power)
+    machine.watch_pin(SOIL_POWER_PIN, sensors_power)
+    machine.watch_pin(TEMPSENSOR_POWER_PIN, dht.power)
+    dht.TEMPERATURE = temperature
+    dht.HUMIDITY = humidity
+    dht.FAILURE_RATE = dht_failure_rate
+    ntptime.FAILURE_RATE = ntp_failure_rate
+    vclock.RTC_DRIFT_PPM = rtc_drift_ppm
+
+def boot(overrides):
+    sim.reboot()
+    import WaterPlantStation
+    hw = WaterPlantStation.init_hardware()
+    WaterPlantStation.SETTINGS.update(overrides)
+    return WaterPlantStation, hw
+
+def parse_setting(text):
+    key, _, value = text.partition("=")
+    return key, json.loads(value)
+
+def sleep_between_cycles(station, seconds):
+    """Sleep with the station's SLEEP_MODE backend; True if the board reset on wake (deepsleep)."""
+    try:
+        station.deepsleep(seconds)
+    except machine.SimReset:
+        return True
+    return False
+
+def mean(values):
+    return round(sum(values) / len(values), 1) if values else 0
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def run(cycles, seed=1, dht_failure_rate=0.0, ntp_failure_rate=0.0, rtc_drift_ppm=20, overrides={}, verbose=False):
+    random.seed(seed)
+    sim.reset()
+    plant = Plant()
+    setup_scenario(plant, dht_failure_rate, ntp_failure_rate, rtc_drift_ppm)
+
+    awake = []
+    phases = {}
+    heap_peaks = []
+    heap_min_free = []
+    resets = 0
+    recharges = 0
+    sessions = 0
+    idle_sessions = 0   # connected but published nothing (e.g. only the first clock sync)
+    awake_mah = 0.0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        out = sys.stdout if verbose else io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out):
+                station, hw = boot(overrides)
+                for _ in range(cycles):
+                    start_us = vclock.now_us()
+                    start_mah = energy.used_mah()
+                    connects = broker.stats["connects"]
+                    published = broker.stats["publish_in"]
+                    heap.start_cycle()
+                    tracemalloc.reset_peak()
+                    traced = tracemalloc.get_traced_memory()[0]
+
+                    try:
+                        station.wake_cycle(hw)
+                    except machine.SimReset:
+                        resets += 1
+                        station, hw = boot(overrides)
+
+                    awake.append((vclock.now_us() - start_us) / 1000)
+                    awake_mah += energy.used_mah() - start_mah
+                    if broker.stats["publish_in"] > published:
+                        sessions += broker.stats["connects"] - connects
+                    else:
+                        idle_sessions += broker.stats["connects"] - connects
+                    heap_peaks.append(tracemalloc.get_traced_memory()[1] - traced)
+                    heap_min_free.append(heap.min_free())
+                    for phase, ms in station.profiler.last_cycle().items():
+                        phases.setdefault(phase, []).append(ms)
+
+                    if not verbose:
+                        out.seek(0)
+                        out.truncate()
+                    if sleep_between_cycles(station, station.next_sleep_interval()):
+                        station, hw = boot(overrides)
+                    if energy.charge_left() < RECHARGE_BELOW:
+                        energy.recharge()
+                        recharges += 1
+        finally:
+            os.chdir(cwd)
+
+    days = vclock.now_us() / 86400000000
+    used = energy.used_mah()
+    return {
+        "cycles": cycles,
+        "simulated_days": round(days, 2),
+        "resets": resets,
+        "battery_recharges": recharges,
+        "upload_sessions": sessions,
+        "idle_sessions": idle_sessions,
+        "awake_ms_mean": round(sum(awake) / len(awake), 1),
+        "awake_ms_p95": percentile(awake, 0.95),
+        "awake_ms_max": max(awake),
+        "boot_ms": mean(phases.get("boot", [])),
+        "boot_to_publish_ms": mean(phases["first_publish"]) if "first_publish" in phases else None,
+        "phases_ms": {
+            phase: {"runs": len(v), "mean": round(sum(v) / len(v), 1), "p95": percentile(v, 0.95), "max": max(v)}
+            for phase, v in phases.items()
+        },
+        "bytes_sent": broker.stats["bytes_in"],
+        "bytes_received": broker.stats["bytes_out"],
+        "bytes_sent_per_cycle": round(broker.stats["bytes_in"] / cycles, 1),
+        "heap_peak_bytes_mean": round(sum(heap_peaks) / len(heap_peaks)),
+        "heap_peak_bytes_max": max(heap_peaks),
+        "heap_min_free_bytes": min(heap_min_free),
+        "energy_mah_total": round(used, 2),
+        "energy_mah_awake": round(awake_mah, 2),
+        "energy_mah_per_day": round(used / days, 3),
+        "energy_by_load_mah": {name: round(v, 2) for name, v in energy.used_by_load_mah().items()},
+        "battery_life_days": round(energy.BATTERY_CAPACITY_MAH / (used / days), 1),
+        "ntp_requests": ntptime.requests,
+        "rtc_error_s": vclock.rtc_time() - vclock.true_time(),
+        "final_moisture": round(plant.moisture, 1),
+    }
+
+def print_report(r):
+    print("cycles: %d (%.1f simulated days), upload sessions: %d (+%d without publish), resets: %d, "
+          "battery recharges: %d" % (r["cycles"], r["simulated_days"], r["upload_sessions"], r["idle_sessions"],
+                                     r["resets"], r["battery_recharges"]))
+    print("awake per cycle: mean %.1f ms, p95 %.1f ms, max %.1f ms"
+          % (r["awake_ms_mean"], r["awake_ms_p95"], r["awake_ms_max"]))
+    if r["boot_to_publish_ms"] is None:
+        print("boot: %.1f ms to the first wake cycle, nothing published in the first wake" % r["boot_ms"])
+    else:
+        print("boot: %.1f ms to the first wake cycle, %.1f ms to the first publish"
+              % (r["boot_ms"], r["boot_to_publish_ms"]))
+    print()
+    print("%-14s %7s %10s %10s %10s" % ("phase", "runs", "mean ms", "p95 ms", "max ms"))
+    for phase, s in sorted(r["phases_ms"].items(), key=lambda item: -item[1]["mean"] * item[1]["runs"]):
+        print("%-14s %7d %10.1f %10d %10d" % (phase, s["runs"], s["mean"], s["p95"], s["max"]))
+    print()
+    print("bytes sent: %d (%.1f per cycle), received: %d"
+          % (r["bytes_sent"], r["bytes_sent_per_cycle"], r["bytes_received"]))
+    print("heap: peak allocations per cycle mean %d B, max %d B (CPython), min free %d B (model)"
+          % (r["heap_peak_bytes_mean"], r["heap_peak_bytes_max"], r["heap_min_free_bytes"]))
+    print("energy: %.2f mAh total, %.2f mAh awake, %.3f mAh/day -> %.1f days on %d mAh"
+          % (r["energy_mah_total"], r["energy_mah_awake"], r["energy_mah_per_day"],
+             r["battery_life_days"], energy.BATTERY_CAPACITY_MAH))
+    print("ntp requests: %d, RTC error at the end: %d s" % (r["ntp_requests"], r["rtc_error_s"]))
+    print("energy by load (mAh): " + ", ".join("%s %.2f" % item for item in sorted(r["energy_by_load_mah"].items())))
+
+def check_baseline(r, baseline, tolerance):
+    """Return the list of metrics that got worse than baseline * (1 + tolerance)."""
+    regressions = []
+    for key in CHECKED:
+        if baseline.get(key) is not None and r[key] is not None and r[key] > baseline[key] * (1 + tolerance):
+            regressions.append("%s: %s -> %s" % (key, baseline[key], r[key]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated wake cycles benchmark for WaterPlantStation")
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dht-failure-rate", type=float, default=0.0)
+    parser.add_argument("--ntp-failure-rate", type=float, default=0.0)
+    parser.add_argument("--rtc-drift-ppm", type=float, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare with results previously written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--set", action="append", default=[], type=parse_setting, metavar="KEY=JSON",
+                        help="override a station setting, e.g. --set UPLOAD_EVERY=1")
+    parser.add_argument("--verbose", action="store_true", help="show station output")
+    parser.add_argument("--mpy", action="store_true", help="model modules precompiled with tools/build_mpy.py")
+    args = parser.parse_args()
+    sim.PRECOMPILED = args.mpy
+    if args.verbose:
+        args.set.append(("VERBOSE", True))
+
+    r = run(args.cycles, args.seed, args.dht_failure_rate, args.ntp_failure_rate, args.rtc_drift_ppm,
+            dict(args.set), args.verbose)
+    print_report(r)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = check_baseline(r, json.load(f), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nno regressions against %s" % args.baseline)
+
+if __name__ == "__main__":
+    main()
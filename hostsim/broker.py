@@ -0,0 +1,53 @@
+# In-process MQTT broker used by the umqtt.simple stand-in
+# Keeps retained messages, routes publications to subscribed clients (+ and # wildcards)
+# and counts the bytes exchanged with the station.
+
+retained = {}       # topic (bytes) -> payload (bytes)
+_subscriptions = [] # (filter bytes, client)
+published = {}      # topic (bytes) -> last payload published by the station
+
+stats = {}
+
+def reset():
+    retained.clear()
+    del _subscriptions[:]
+    stats.clear()
+    stats.update({"bytes_in": 0, "bytes_out": 0, "publish_in": 0, "publish_out": 0, "connects": 0, "subscribes": 0})
+    published.clear()
+
+def matches(topic_filter, topic):
+    f = topic_filter.split(b"/")
+    t = topic.split(b"/")
+    for i, level in enumerate(f):
+        if level == b"#":
+            return True
+        if i >= len(t) or (level != b"+" and level != t[i]):
+            return False
+    return len(f) == len(t)
+
+def subscribe(client, topic_filter):
+    stats["subscribes"] += 1
+    _subscriptions.append((topic_filter, client))
+    for topic, payload in retained.items():
+        if matches(topic_filter, topic):
+            client._deliver(topic, payload)
+
+def unsubscribe_all(client):
+    _subscriptions[:] = [s for s in _subscriptions if s[1] is not client]
+
+def publish(topic, payload, retain=False, sender=None):
+    """Publish a message (from the station or from the scenario/dashboard)."""
+    if sender is not None:
+        stats["publish_in"] += 1
+        published[topic] = payload
+    if retain:
+        if payload:
+            retained[topic] = payload
+        else:
+            retained.pop(topic, None)
+    for topic_filter, client in _subscriptions:
+        if client is not sender and matches(topic_filter, topic):
+            stats["publish_out"] += 1
+            client._deliver(topic, payload)
+
+reset()
@@ -0,0 +1,81 @@
+# CPython stand-in for MicroPython 'dht'
+# Values come from the scenario (TEMPERATURE/HUMIDITY callables); FAILURE_RATE simulates read timeouts,
+# CHECKSUM_FAILURE_RATE corrupted frames (plain Exception, like the MicroPython driver).
+# Like a DHT22, the sensor does not answer (timeout) for WARMUP_MS after power-up (power(1), watched supply
+# pin of the scenario) and within INTERVAL_MS of the previous read.
+
+import random
+import vclock
+
+MEASURE_MS = 5
+TIMEOUT_MS = 100
+FAILURE_RATE = 0.0
+CHECKSUM_FAILURE_RATE = 0.0
+WARMUP_MS = 2000
+INTERVAL_MS = 2000
+
+TEMPERATURE = lambda: 21.5
+HUMIDITY = lambda: 48.0
+
+measures = 0
+failures = 0
+early_reads = 0
+
+_powered_at = 0     # virtual ms of the power-up (None: off); powered from the start if no supply pin is watched
+_read_at = None
+
+def reset_state():
+    global measures, failures, early_reads, _powered_at, _read_at
+    measures, failures, early_reads = 0, 0, 0
+    _powered_at, _read_at = 0, None
+
+def power(on):
+    global _powered_at, _read_at
+    if on:
+        _powered_at, _read_at = vclock.now_us() // 1000, None
+    else:
+        _powered_at = None
+
+def _early(now):
+    if _powered_at is None or now - _powered_at < WARMUP_MS:
+        return True
+    return _read_at is not None and now - _read_at < INTERVAL_MS
+
+class DHTBase:
+    def __init__(self, pin):
+        self.pin = pin
+        self._t = 0
+        self._h = 0
+
+    def measure(self):
+        global measures, failures, early_reads, _read_at
+        measures += 1
+        now = vclock.now_us() // 1000
+        early = _early(now)
+        _read_at = now
+        if early or random.random() < FAILURE_RATE:
+            failures += 1
+            early_reads += early
+            vclock.sleep_ms(TIMEOUT_MS)
+            raise OSError(110)  # ETIMEDOUT
+        if random.random() < CHECKSUM_FAILURE_RATE:
+            failures += 1
+            vclock.sleep_ms(MEASURE_MS)
+            raise Exception("checksum error")
+        vclock.sleep_ms(MEASURE_MS)
+        self._t = round(TEMPERATURE(), 1)
+        self._h = round(HUMIDITY(), 1)
+
+class DHT11(DHTBase):
+    def temperature(self):
+        return int(self._t)
+
+    def humidity(self):
+        return int(self._h)
+
+class DHT22(DHTBase):
+    def temperature(self):
+        return self._t
+
+    def humidity(self):
+        return self._h
@@ -0,0 +1,83 @@
+# Energy model for the simulated station
+# Every stand-in declares its current draw with set_load(name, mA); the virtual clock integrates
+# the total current over time. The battery voltage is derived from the charge used so far (open circuit
+# voltage curve of a 18650 cell) minus the sag of the present load through the internal resistance.
+
+import vclock
+
+BATTERY_CAPACITY_MAH = 2500     # 18650 cell
+INTERNAL_RESISTANCE_OHM = 0.12  # cell + holder + wiring
+# (charge left, open circuit voltage), ascending
+OCV_CURVE = ((0.0, 3.0), (0.03, 3.35), (0.08, 3.55), (0.15, 3.67), (0.25, 3.74), (0.35, 3.78), (0.5, 3.83),
+             (0.6, 3.87), (0.7, 3.94), (0.8, 4.01), (0.9, 4.09), (1.0, 4.2))
+
+# typical currents (mA) used by the stand-ins
+CPU_BASE_MA = 1.5
+CPU_MA_PER_MHZ = 0.18           # RP2040 core + flash at 3.3V
+WIFI_ACTIVE_MA = 45             # CYW43 associated, power save off
+WIFI_TX_MA = 180                # extra while transmitting
+SENSORS_MA = 2.5                # DHT22 + capacitive soil sensor
+PUMP_MA = 220                   # 5V pump through the relay
+LIGHTSLEEP_MA = 1.3             # board in machine.lightsleep(), radio off
+
+_loads = {}
+_used_mas = 0.0                 # milli-ampere-seconds
+_since_charge_mas = 0.0
+_by_load = {}
+
+def reset():
+    global _used_mas, _since_charge_mas
+    _loads.clear()
+    _by_load.clear()
+    _used_mas = 0.0
+    _since_charge_mas = 0.0
+
+def recharge():
+    """Battery swapped/charged: voltage back to full, total counters are kept."""
+    global _since_charge_mas
+    _since_charge_mas = 0.0
+
+def set_load(name, ma):
+    if ma:
+        _loads[name] = ma
+    else:
+        _loads.pop(name, None)
+
+def load(name):
+    return _loads.get(name, 0)
+
+def current_ma():
+    return sum(_loads.values())
+
+def _integrate(elapsed_us):
+    global _used_mas, _since_charge_mas
+    seconds = elapsed_us / 1000000
+    for name, ma in _loads.items():
+        _by_load[name] = _by_load.get(name, 0.0) + ma * seconds
+        _used_mas += ma * seconds
+        _since_charge_mas += ma * seconds
+
+def used_mah():
+    return _used_mas / 3600
+
+def used_by_load_mah():
+    return {name: mas / 3600 for name, mas in _by_load.items()}
+
+def charge_left():
+    """Fraction of the capacity left since the last recharge."""
+    return max(0.0, 1 - _since_charge_mas / 3600 / BATTERY_CAPACITY_MAH)
+
+def open_circuit_voltage():
+    charge = charge_left()
+    for i in range(1, len(OCV_CURVE)):
+        high_charge, high_v = OCV_CURVE[i]
+        if charge <= high_charge:
+            low_charge, low_v = OCV_CURVE[i - 1]
+            return low_v + (high_v - low_v) * (charge - low_charge) / (high_charge - low_charge)
+    return OCV_CURVE[-1][1]
+
+def battery_voltage():
+    """Terminal voltage under the present load."""
+    return open_circuit_voltage() - current_ma() / 1000 * INTERNAL_RESISTANCE_OHM
+
+vclock.add_listener(_integrate)
@@ -0,0 +1,57 @@
+# Heap model behind gc.mem_free()/gc.mem_alloc() in the simulator
+# Python allocations are traced with tracemalloc (scaled down: CPython objects are several times bigger
+# than MicroPython ones), stand-ins reserve fixed blocks for big buffers like the TLS context.
+# Figures are meant to spot regressions between runs, not to predict the exact free heap on a Pico W.
+
+import tracemalloc
+import vclock
+
+HEAP_BYTES = 180 * 1024
+CPYTHON_SCALE = 4
+COLLECT_US = 3000   # gc.collect(): mark and sweep of the whole heap at 125MHz
+
+_reserved = {}
+_base = 0
+_min_free = HEAP_BYTES
+
+def reset():
+    global _base
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _reserved.clear()
+    _base = tracemalloc.get_traced_memory()[0]
+    reset_min()
+
+def reserve(name, size):
+    _reserved[name] = size
+    mem_free()
+
+def release(name):
+    _reserved.pop(name, None)
+
+def mem_alloc():
+    traced = max(0, tracemalloc.get_traced_memory()[0] - _base) // CPYTHON_SCALE
+    return traced + sum(_reserved.values())
+
+def mem_free():
+    global _min_free
+    free = max(0, HEAP_BYTES - mem_alloc())
+    _min_free = min(_min_free, free)
+    return free
+
+def collect():
+    """gc.collect() stand-in: CPython frees the objects itself, only the time of a collection is modelled."""
+    vclock.advance_us(COLLECT_US)
+
+def min_free():
+    return _min_free
+
+def reset_min():
+    global _min_free
+    _min_free = HEAP_BYTES
+
+def start_cycle():
+    """Measure from here: objects kept by the harness between cycles are not counted."""
+    global _base
+    _base = tracemalloc.get_traced_memory()[0]
+    reset_min()
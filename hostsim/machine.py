@@ -0,0 +1,266 @@
+# CPython stand-in for MicroPython 'machine' (RP2040 subset)
+# Pin levels are stored in a table, ADC values come from sources registered by the scenario
+# (adc_source(pin, fn)), pin changes can be watched (watch_pin(pin, fn)) to model loads like the pump.
+# reset() raises SimReset, which the harness catches to simulate a reboot.
+# Timer callbacks fire on the virtual clock (during any sleep or simulated delay).
+# I2C transfers go to devices registered by the scenario (i2c_device(address, on_write)) and cost bus time.
+# mem32 models the SIO GPIO registers (GPIO_IN, GPIO_OUT, GPIO_OUT_SET/CLR/XOR) on top of the same pin table.
+
+import vclock
+import energy
+
+class SimReset(BaseException):
+    """Raised by reset()/deepsleep(): the harness restarts the station."""
+
+_freq = 125000000
+_levels = {}
+_modes = {}
+_watchers = {}
+_adc_sources = {}
+_i2c_devices = {}
+
+def reset_state():
+    global _freq
+    _freq = 125000000
+    _levels.clear()
+    _modes.clear()
+    energy.set_load("cpu", _cpu_ma(_freq))
+
+def _cpu_ma(hz):
+    return energy.CPU_BASE_MA + energy.CPU_MA_PER_MHZ * hz / 1000000
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+    energy.set_load("cpu", _cpu_ma(hz))
+    vclock.advance_us(50)  # PLL relock
+
+def cpu_scale():
+    """How much slower than 125MHz CPU bound work runs at the current clock."""
+    return 125000000 / _freq
+
+def reset():
+    raise SimReset()
+
+def soft_reset():
+    raise SimReset()
+
+def deepsleep(ms=None):
+    if ms:
+        lightsleep(ms)
+    raise SimReset()
+
+def lightsleep(ms=None):
+    saved = energy.load("cpu")
+    energy.set_load("cpu", energy.LIGHTSLEEP_MA)
+    vclock.sleep_ms(ms or 0)
+    energy.set_load("cpu", saved)
+
+def idle():
+    vclock.advance_us(100)
+
+def unique_id():
+    return b"\xe6\x61\x38\x52\x13\x2a\x4b\x2c"
+
+def watch_pin(pin_id, callback):
+    """callback(value) when the output level of pin_id changes."""
+    _watchers.setdefault(pin_id, []).append(callback)
+
+def adc_source(pin_id, callback):
+    """callback() -> raw 16 bit value returned by ADC(pin_id).read_u16()."""
+    _adc_sources[pin_id] = callback
+
+def i2c_device(address, on_write, on_read=None):
+    """on_write(bytes) for every writeto(address, ...), on_read(n) -> bytes for readfrom()."""
+    _i2c_devices[address] = (on_write, on_read)
+
+def level(pin_id):
+    return _levels.get(pin_id, 0)
+
+def _set_level(pin_id, v):
+    v = 1 if v else 0
+    if _levels.get(pin_id, 0) != v:
+        _levels[pin_id] = v
+        for callback in _watchers.get(pin_id, ()):
+            callback(v)
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            _modes[self.id] = mode
+            if mode == Pin.IN:
+                self._set(0)
+        if value is not None:
+            self._set(value)
+
+    def _set(self, v):
+        _set_level(self.id, v)
+
+    def value(self, v=None):
+        if v is None:
+            return _levels.get(self.id, 0)
+        self._set(v)
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+    def high(self):
+        self._set(1)
+
+    def low(self):
+        self._set(0)
+
+    def toggle(self):
+        self._set(not self.value())
+
+    def irq(self, handler=None, trigger=None):
+        return None
+
+    def __repr__(self):
+        return "Pin(%s)" % (self.id,)
+
+class ADC:
+    CORE_TEMP = 4
+
+    def __init__(self, pin):
+        self.id = pin.id if isinstance(pin, Pin) else pin
+
+    def read_u16(self):
+        vclock.advance_us(2)  # 500ksps ADC
+        source = _adc_sources.get(self.id)
+        value = int(source()) if source else 0
+        return min(65535, max(0, value))
+
+class I2C:
+    TRANSACTION_US = 20     # start/stop and driver overhead
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        self.id = id
+        self.freq = freq
+        self.transactions = 0
+        self.bytes = 0
+
+    def _transfer(self, address, size):
+        if address not in _i2c_devices:
+            raise OSError(19)  # ENODEV: no ACK
+        self.transactions += 1
+        self.bytes += size
+        # 9 clocks per byte (+ address byte)
+        vclock.advance_us(self.TRANSACTION_US + 9 * (size + 1) * 1000000 / self.freq)
+
+    def scan(self):
+        return sorted(_i2c_devices)
+
+    def writeto(self, address, buf, stop=True):
+        data = bytes(buf)
+        self._transfer(address, len(data))
+        _i2c_devices[address][0](data)
+        return len(data)
+
+    def readfrom(self, address, nbytes, stop=True):
+        self._transfer(address, nbytes)
+        on_read = _i2c_devices[address][1]
+        return bytes(on_read(nbytes)) if on_read else bytes(nbytes)
+
+SIO_BASE = 0xd0000000
+GPIO_IN = SIO_BASE + 0x004
+GPIO_OUT = SIO_BASE + 0x010
+GPIO_OUT_SET = SIO_BASE + 0x014
+GPIO_OUT_CLR = SIO_BASE + 0x018
+GPIO_OUT_XOR = SIO_BASE + 0x01c
+
+class _Mem32:
+    """machine.mem32 limited to the SIO GPIO registers; writes counts register writes (bus cost)."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def _bits(self):
+        return sum(1 << i for i, v in _levels.items() if isinstance(i, int) and v)
+
+    def __getitem__(self, address):
+        if address in (GPIO_IN, GPIO_OUT):
+            return self._bits()
+        raise NotImplementedError("mem32[0x%08x]" % address)
+
+    def __setitem__(self, address, value):
+        self.writes += 1
+        if address == GPIO_OUT_SET:
+            new = self._bits() | value
+        elif address == GPIO_OUT_CLR:
+            new = self._bits() & ~value
+        elif address == GPIO_OUT_XOR:
+            new = self._bits() ^ value
+        elif address == GPIO_OUT:
+            new = value
+        else:
+            raise NotImplementedError("mem32[0x%08x]" % address)
+        for i in range(30):
+            if (value >> i) & 1 or address == GPIO_OUT:
+                _set_level(i, (new >> i) & 1)
+
+mem32 = _Mem32()
+
+class RTC:
+    def datetime(self, t=None):
+        if t is None:
+            y, mo, d, h, mi, s, wd, yd = vclock.localtime()
+            return (y, mo, d, wd, h, mi, s, 0)
+        y, mo, d, wd, h, mi, s = t[:7]
+        vclock.set_rtc(vclock.mktime((y, mo, d, h, mi, s, 0, 0)))
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, mode=PERIODIC, period=-1, freq=-1, callback=None):
+        self._event = None
+        if callback is not None:
+            self.init(mode=mode, period=period, freq=freq, callback=callback)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None):
+        self.deinit()
+        if freq > 0:
+            period = 1000 / freq
+        self._mode = mode
+        self._period_us = max(1, int(period * 1000))
+        self._callback = callback
+        self._schedule()
+
+    def _schedule(self):
+        self._event = vclock.call_at(vclock.now_us() + self._period_us, self._fire)
+
+    def _fire(self):
+        self._event = None
+        if self._mode == Timer.PERIODIC:
+            self._schedule()
+        if self._callback is not None:
+            self._callback(self)
+
+    def deinit(self):
+        if self._event is not None:
+            vclock.cancel(self._event)
+            self._event = None
+
+reset_state()
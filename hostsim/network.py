@@ -0,0 +1,102 @@
+# CPython stand-in for MicroPython 'network' (WLAN station only)
+# Association takes ASSOC_MS of virtual time (full scan + DHCP); isconnected() turns True once it is over.
+# AP_AVAILABLE can be switched off by the scenario to simulate a missing access point.
+
+import vclock
+import energy
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+ASSOC_MS = 2400         # scan + authentication + DHCP
+ASSOC_FAST_MS = 700     # known bssid/channel, no scan
+DHCP_MS = 600
+AP_AVAILABLE = True
+AP_BSSID = b"\x10\x20\x30\x40\x50\x60"
+AP_CHANNEL = 6
+
+_interfaces = {}
+
+def reset_state():
+    _interfaces.clear()
+
+class WLAN:
+    def __new__(cls, interface_id=STA_IF):
+        wlan = _interfaces.get(interface_id)
+        if wlan is None:
+            wlan = object.__new__(cls)
+            wlan._init(interface_id)
+            _interfaces[interface_id] = wlan
+        return wlan
+
+    def _init(self, interface_id):
+        self.interface_id = interface_id
+        self._active = False
+        self._connected_at = None
+        self._static = None
+        self._config = {"mac": b"\x28\xcd\xc1\x00\x00\x01", "pm": 0xa11142}
+        self.connects = 0
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        energy.set_load("wifi", energy.WIFI_ACTIVE_MA if self._active else 0)
+        if not self._active:
+            self._connected_at = None
+        vclock.sleep_ms(30 if self._active else 5)
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        if not self._active:
+            raise OSError("wifi not active")
+        self.connects += 1
+        if not AP_AVAILABLE:
+            self._connected_at = None
+            return
+        delay = ASSOC_FAST_MS if bssid == AP_BSSID else ASSOC_MS
+        if self._static is not None:
+            delay -= DHCP_MS
+        self._connected_at = vclock.now_us() + delay * 1000
+
+    def disconnect(self):
+        self._connected_at = None
+
+    def isconnected(self):
+        return self._active and self._connected_at is not None and vclock.now_us() >= self._connected_at
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -61
+        if not self._active:
+            return STAT_IDLE
+        if self.isconnected():
+            return STAT_GOT_IP
+        if not AP_AVAILABLE:
+            return STAT_NO_AP_FOUND
+        return STAT_CONNECTING
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._static or ("192.168.1.42", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+        self._static = None if config == "dhcp" else tuple(config)
+
+    def config(self, *args, **kwargs):
+        if args:
+            key = args[0]
+            if key == "channel" and self.isconnected():
+                return AP_CHANNEL
+            return self._config.get(key)
+        self._config.update(kwargs)
+
+    def scan(self):
+        vclock.sleep_ms(1800)
+        if not AP_AVAILABLE:
+            return []
+        return [(b"SimAP", AP_BSSID, AP_CHANNEL, -61, 3, False)]
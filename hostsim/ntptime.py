@@ -0,0 +1,35 @@
+# CPython stand-in for MicroPython 'ntptime'
+# settime() costs a DNS lookup plus a UDP round trip of virtual time and sets the RTC to the real time.
+# FAILURE_RATE simulates a slow/unreachable pool (OSError after 'timeout' seconds).
+
+import random
+import vclock
+import network
+
+host = "pool.ntp.org"
+timeout = 1
+
+DNS_MS = 35
+RTT_MS = 45
+FAILURE_RATE = 0.0
+
+requests = 0
+
+def reset_state():
+    global requests
+    requests = 0
+
+def time():
+    global requests
+    requests += 1
+    if not network.WLAN(network.STA_IF).isconnected():
+        raise OSError(-2)  # no route
+    vclock.sleep_ms(DNS_MS)
+    if random.random() < FAILURE_RATE:
+        vclock.sleep(timeout)
+        raise OSError(110)  # ETIMEDOUT
+    vclock.sleep_ms(RTT_MS)
+    return vclock.true_time()
+
+def settime():
+    vclock.set_rtc(time())
@@ -0,0 +1,65 @@
+# Check of the run time reported by pump.py on the host simulator
+# A pulse with a free event loop must report its planned length; with the loop blocked past the safety timer
+# (e.g. a blocking TLS publish of flush_backlog while the pump runs) the relay is switched off by the timer and
+# only the time it was really on may be reported, not the time the loop was blocked.
+#
+# usage:
+#   python hostsim/pumpcheck.py
+
+import sys
+
+import sim
+
+PULSE_MS = 1000
+BLOCKED_MS = 5000
+TOLERANCE_MS = 20
+
+def irrigate(blocked_ms):
+    # (reported run time, time the relay was really on) of one pulse, the loop blocked for blocked_ms meanwhile
+    import uasyncio as asyncio
+    import utime
+    import vclock
+    import machine
+    import pump
+
+    relay = machine.Pin(20, machine.Pin.OUT)
+    on = [0, None]     # total us on, on since
+
+    def watch(value):
+        if value:
+            on[1] = vclock.now_us()
+        elif on[1] is not None:
+            on[0] += vclock.now_us() - on[1]
+            on[1] = None
+
+    machine.watch_pin(20, watch)
+
+    async def blocker():
+        await asyncio.sleep_ms(0)
+        utime.sleep_ms(blocked_ms)     # blocks the event loop, like a TLS publish
+
+    async def main():
+        task = asyncio.create_task(pump.irrigate(relay, lambda: 0, PULSE_MS, max_on_ms=60000))
+        if blocked_ms:
+            await blocker()
+        return await task
+
+    return asyncio.run(main()), on[0] // 1000
+
+def main():
+    sim.install()
+    import pump
+    failed = 0
+    for blocked_ms in (0, BLOCKED_MS):
+        sim.reset()
+        run_ms, on_ms = irrigate(blocked_ms)
+        ok = abs(run_ms - on_ms) <= TOLERANCE_MS and run_ms <= PULSE_MS + pump.SAFETY_MARGIN_MS + TOLERANCE_MS
+        failed += not ok
+        print("loop blocked %d ms: reported %d ms, relay on %d ms %s"
+              % (blocked_ms, run_ms, on_ms, "ok" if ok else "FAILED"))
+    if failed:
+        sys.exit(1)
+    print("pump check passed")
+
+if __name__ == "__main__":
+    main()
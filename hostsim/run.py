@@ -0,0 +1,23 @@
+# Run a script of the repository on the host simulator
+#
+# usage:
+#   python hostsim/run.py batterystatus.py
+#   python hostsim/run.py lcd.py
+
+import runpy
+import sys
+
+import sim
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python hostsim/run.py <script.py> [args...]")
+        sys.exit(2)
+    sim.install()
+    sim.reset()
+    script = sys.argv[1]
+    sys.argv = sys.argv[1:]
+    runpy.run_path(script, run_name="__main__")
+
+if __name__ == "__main__":
+    main()
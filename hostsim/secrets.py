@@ -0,0 +1,9 @@
+# Fake credentials for the host simulator (the real secrets.py stays on the Pico)
+
+SSID = "SimAP"
+PASSWORD = "sim-password"
+
+MQTT_CLIENT = "picoW-sim"
+MQTT_SERVER = "broker.sim"
+MQTT_USERNAME = "sim"
+MQTT_PASSWORD = "sim"
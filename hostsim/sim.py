@@ -0,0 +1,109 @@
+# Host-side simulator for the Raspberry Pi Pico scripts
+# install() puts the stand-ins of this folder (machine, network, dht, ntptime, umqtt.simple, utime, ...)
+# in front of sys.path and routes time.sleep/ticks and gc.mem_free/gc.collect to the virtual clock and heap model,
+# so the scripts of the repository run unchanged on CPython without spending real time.
+# Importing a module of the repository costs virtual time like on the device: compiled from source
+# (COMPILE_US_PER_BYTE) or, with PRECOMPILED set, loaded from a .mpy built by tools/build_mpy.py
+# (MPY_US_PER_BYTE); the figures are a model to compare boot latency between runs.
+#
+# usage:
+#   import sim
+#   sim.install()
+#   sim.reset()
+#   import WaterPlantStation
+
+import os
+import sys
+import gc
+import time
+import importlib.machinery
+import importlib.util
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+COMPILE_US_PER_BYTE = 25    # RP2040 at 125MHz: lexer + parser + compiler, per byte of source
+MPY_US_PER_BYTE = 2         # loading the bytecode of a .mpy, per byte of source it was built from
+PRECOMPILED = False
+
+class _DeviceLoader(importlib.machinery.SourceFileLoader):
+    def exec_module(self, module):
+        import vclock
+        vclock.advance_us(os.path.getsize(self.path) * (MPY_US_PER_BYTE if PRECOMPILED else COMPILE_US_PER_BYTE))
+        super().exec_module(module)
+
+class _DeviceFinder:
+    # modules of the repository (top level of ROOT) are loaded with _DeviceLoader
+    _finder = importlib.machinery.FileFinder(ROOT, (_DeviceLoader, [".py"]))
+
+    @classmethod
+    def find_spec(cls, name, path=None, target=None):
+        if path is not None:
+            return None
+        return cls._finder.find_spec(name, target)
+
+    @classmethod
+    def invalidate_caches(cls):
+        cls._finder.invalidate_caches()
+
+def install():
+    for path in (ROOT, HERE):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+    # stdlib 'secrets' may already be imported: the station needs the fake credentials
+    sys.modules.pop("secrets", None)
+
+    import vclock
+    import heap
+
+    for name in ("sleep", "sleep_ms", "sleep_us", "ticks_ms", "ticks_us", "ticks_cpu", "ticks_add",
+                 "ticks_diff", "localtime", "mktime"):
+        setattr(time, name, getattr(vclock, name))
+    time.time = vclock.rtc_time
+    time.gmtime = vclock.localtime
+
+    gc.mem_free = heap.mem_free
+    gc.mem_alloc = heap.mem_alloc
+    gc.collect = heap.collect
+
+    # _thread is built into CPython (found before sys.path): the second core stand-in replaces it
+    spec = importlib.util.spec_from_file_location("_thread", os.path.join(HERE, "_thread.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules["_thread"] = module
+
+    if _DeviceFinder not in sys.meta_path:
+        sys.meta_path.insert(0, _DeviceFinder)
+
+def reset():
+    """Fresh simulation: clock from zero, empty broker, pins and energy counters cleared."""
+    import vclock
+    import energy
+    import heap
+    import machine
+    import network
+    import broker
+    import ntptime
+    import dht
+
+    vclock.reset()
+    energy.reset()
+    heap.reset()
+    machine.reset_state()
+    network.reset_state()
+    broker.reset()
+    ntptime.reset_state()
+    dht.reset_state()
+    sys.modules["_thread"].reset_state()
+
+def reboot():
+    """Forget every module of the repository, like machine.reset() does on the device (core 1 stops too)."""
+    import vclock
+    vclock.reboot()
+    sys.modules["_thread"].reset_state()
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == ROOT:
+            del sys.modules[name]
@@ -0,0 +1,186 @@
+# CPython stand-in for MicroPython 'uasyncio' running on the virtual clock
+# A small scheduler with the uasyncio subset used by the station: run, create_task, sleep, sleep_ms,
+# gather, wait_for_ms, Event and ThreadSafeFlag. When every task is sleeping the virtual clock jumps
+# to the next wake up time, so awaiting costs no real time.
+
+import heapq
+from collections import deque
+
+import vclock
+
+class CancelledError(BaseException):
+    pass
+
+class TimeoutError(Exception):
+    pass
+
+_ready = deque()
+_sleeping = []  # heap of (due_us, seq, task)
+_seq = 0
+_running = [None]
+
+class _Request:
+    def __init__(self, kind, arg):
+        self.kind = kind
+        self.arg = arg
+
+    def __await__(self):
+        return (yield self)
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.done_ = False
+        self.result = None
+        self.exc = None
+        self.waiters = []
+        self._cancel = False
+
+    def done(self):
+        return self.done_
+
+    def cancel(self):
+        if not self.done_:
+            self._cancel = True
+            _wake(self)
+
+    def __await__(self):
+        if not self.done_:
+            yield _Request("wait", self)
+        if self.exc is not None:
+            raise self.exc
+        return self.result
+
+def _wake(task):
+    if task not in _ready:
+        _ready.append(task)
+
+def _finish(task, result=None, exc=None):
+    task.done_ = True
+    task.result = result
+    task.exc = exc
+    for waiter in task.waiters:
+        _wake(waiter)
+    task.waiters = []
+
+def _step(task):
+    if task.done_:
+        return  # cancelled while sleeping
+    _running[0] = task
+    try:
+        if task._cancel:
+            task._cancel = False
+            request = task.coro.throw(CancelledError())
+        else:
+            request = task.coro.send(None)
+    except StopIteration as e:
+        _finish(task, e.value)
+        return
+    except CancelledError as e:
+        _finish(task, exc=e)
+        return
+    except Exception as e:
+        _finish(task, exc=e)
+        return
+    finally:
+        _running[0] = None
+
+    global _seq
+    if request is None or request.kind == "yield":
+        _wake(task)
+    elif request.kind == "sleep":
+        _seq += 1
+        heapq.heappush(_sleeping, (vclock.now_us() + request.arg, _seq, task))
+    elif request.kind == "wait":
+        if request.arg.done_:
+            _wake(task)
+        else:
+            request.arg.waiters.append(task)
+    elif request.kind == "park":
+        pass  # woken up by Event.set()/ThreadSafeFlag.set()
+
+def create_task(coro):
+    task = Task(coro)
+    _wake(task)
+    return task
+
+def sleep_ms(ms):
+    return _Request("sleep", max(0, int(ms * 1000)))
+
+def sleep(seconds):
+    return sleep_ms(seconds * 1000)
+
+def run(coro):
+    main = create_task(coro)
+    while not main.done_:
+        if _ready:
+            _step(_ready.popleft())
+        elif _sleeping:
+            due, _, task = heapq.heappop(_sleeping)
+            if due > vclock.now_us():
+                vclock.advance_us(due - vclock.now_us())
+            _wake(task)
+        else:
+            raise RuntimeError("deadlock: main task waiting with nothing scheduled")
+    # tasks left behind by the coroutine are dropped, like a new event loop on the device
+    _ready.clear()
+    del _sleeping[:]
+    if main.exc is not None:
+        raise main.exc
+    return main.result
+
+async def gather(*aws, return_exceptions=False):
+    tasks = [aw if isinstance(aw, Task) else create_task(aw) for aw in aws]
+    results = []
+    for task in tasks:
+        try:
+            results.append(await task)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+async def wait_for_ms(aw, timeout_ms):
+    task = aw if isinstance(aw, Task) else create_task(aw)
+    deadline = vclock.now_us() + timeout_ms * 1000
+    while not task.done_:
+        if vclock.now_us() >= deadline:
+            task.cancel()
+            raise TimeoutError()
+        await sleep_ms(min(10, (deadline - vclock.now_us()) / 1000))
+    return await task
+
+async def wait_for(aw, timeout):
+    return await wait_for_ms(aw, timeout * 1000)
+
+class Event:
+    def __init__(self):
+        self.state = False
+        self.waiting = []
+
+    def is_set(self):
+        return self.state
+
+    def set(self):
+        self.state = True
+        for task in self.waiting:
+            _wake(task)
+        self.waiting = []
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        while not self.state:
+            self.waiting.append(_current())
+            await _Request("park", None)
+        return True
+
+class ThreadSafeFlag(Event):
+    async def wait(self):
+        await Event.wait(self)
+        self.state = False
+
+def _current():
+    return _running[0]
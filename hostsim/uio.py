@@ -0,0 +1,3 @@
+# CPython stand-in for MicroPython 'uio'
+
+from io import *
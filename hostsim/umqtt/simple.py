@@ -0,0 +1,129 @@
+# CPython stand-in for umqtt.simple, talking to the in-process broker (broker.py)
+# Packet sizes follow MQTT 3.1.1 so byte counters are realistic; TLS adds a handshake (scaled by CPU clock)
+# and a fixed overhead per record. Every exchange costs virtual time and radio energy.
+
+import vclock
+import energy
+import machine
+import network
+import broker
+import heap
+
+RTT_MS = 40
+TLS_HANDSHAKE_MS = 1500         # at 125MHz (RSA/ECDHE on the Cortex-M0+)
+TLS_HANDSHAKE_BYTES = (900, 4200)   # (sent, received)
+TLS_RECORD_OVERHEAD = 29
+LINK_BYTES_PER_MS = 250         # ~2Mbit/s effective
+TLS_HEAP_BYTES = 42 * 1024      # mbedTLS context + record buffers
+
+class MQTTException(Exception):
+    pass
+
+def _remaining_length_size(n):
+    size = 1
+    while n > 127:
+        n >>= 7
+        size += 1
+    return size
+
+def _packet_size(payload_len):
+    return 1 + _remaining_length_size(payload_len) + payload_len
+
+def _to_bytes(s):
+    return s.encode() if isinstance(s, str) else bytes(s)
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=0, user=None, password=None, keepalive=0,
+                 ssl=None, ssl_params={}):
+        self.client_id = _to_bytes(client_id)
+        self.server = server
+        self.port = port or (8883 if ssl else 1883)
+        self.user = user
+        self.pswd = password
+        self.keepalive = keepalive
+        self.ssl = ssl
+        self.cb = None
+        self.lw_topic = None
+        self._inbox = []
+        self._connected = False
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def _transfer(self, sent, received, round_trips=0):
+        if self.ssl:
+            sent += TLS_RECORD_OVERHEAD if sent else 0
+            received += TLS_RECORD_OVERHEAD if received else 0
+        self.bytes_sent += sent
+        self.bytes_received += received
+        broker.stats["bytes_in"] += sent
+        broker.stats["bytes_out"] += received
+        energy.set_load("wifi_tx", energy.WIFI_TX_MA)
+        vclock.sleep_ms((sent + received) / LINK_BYTES_PER_MS)
+        energy.set_load("wifi_tx", 0)
+        vclock.sleep_ms(round_trips * RTT_MS)
+
+    def _check_link(self):
+        if not network.WLAN(network.STA_IF).isconnected():
+            raise OSError(113)  # EHOSTUNREACH
+
+    def _deliver(self, topic, payload):
+        self._inbox.append((topic, payload))
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        self.lw_topic = _to_bytes(topic)
+
+    def connect(self, clean_session=True, timeout=None):
+        self._check_link()
+        if self.ssl:
+            heap.reserve("tls", TLS_HEAP_BYTES)
+            vclock.sleep_ms(TLS_HANDSHAKE_MS * machine.cpu_scale())
+            self._transfer(TLS_HANDSHAKE_BYTES[0], TLS_HANDSHAKE_BYTES[1], round_trips=2)
+        size = 10 + 2 + len(self.client_id)
+        if self.user:
+            size += 2 + len(self.user) + 2 + len(self.pswd or "")
+        self._transfer(_packet_size(size), 4, round_trips=1)
+        broker.stats["connects"] += 1
+        self._connected = True
+        return False
+
+    def disconnect(self):
+        if self._connected:
+            self._transfer(2, 0)
+        broker.unsubscribe_all(self)
+        heap.release("tls")
+        self._connected = False
+
+    def ping(self):
+        self._transfer(2, 2, round_trips=1)
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        self._check_link()
+        topic, msg = _to_bytes(topic), _to_bytes(msg)
+        size = 2 + len(topic) + len(msg) + (2 if qos else 0)
+        self._transfer(_packet_size(size), 4 if qos else 0, round_trips=1 if qos else 0)
+        broker.publish(topic, msg, retain, sender=self)
+
+    def subscribe(self, topic, qos=0):
+        self._check_link()
+        topic = _to_bytes(topic)
+        self._transfer(_packet_size(2 + 2 + len(topic) + 1), 5, round_trips=1)
+        broker.subscribe(self, topic)
+
+    def wait_msg(self):
+        while not self._inbox:
+            vclock.sleep_ms(10)
+        return self._process()
+
+    def check_msg(self):
+        if self._inbox:
+            return self._process()
+        return None
+
+    def _process(self):
+        topic, payload = self._inbox.pop(0)
+        self._transfer(0, _packet_size(2 + len(topic) + len(payload)))
+        if self.cb:
+            self.cb(topic, payload)
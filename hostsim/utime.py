@@ -0,0 +1,9 @@
+# CPython stand-in for MicroPython 'utime', backed by the virtual clock
+
+from vclock import sleep, sleep_ms, sleep_us, ticks_ms, ticks_us, ticks_cpu, ticks_add, ticks_diff, localtime, mktime
+from vclock import rtc_time as time
+
+gmtime = localtime
+
+def time_ns():
+    return time() * 1000000000
@@ -0,0 +1,141 @@
+# Virtual clock shared by every hostsim stand-in
+# sleep() and every simulated hardware delay only move this clock forward: no real time is spent.
+# Listeners are called with the elapsed time on every step (used by the energy model),
+# timers (machine.Timer, scheduled events) fire when the clock reaches them.
+#
+# The RTC is modelled on top of the clock: it starts from 2021-01-01 (like the RP2040 after power up),
+# can be set by ntptime/machine.RTC and drifts by RTC_DRIFT_PPM.
+# ticks_ms()/ticks_us() count from the last board reset (reboot()), like the RP2040 timer.
+
+import heapq
+import threading
+import calendar
+import time
+
+_gmtime = time.gmtime   # sim.install() replaces time.gmtime with localtime() below
+
+TICKS_PERIOD = 1 << 30
+
+TRUE_EPOCH_START = 1767225600   # 2026-01-01T00:00:00Z, "real" time at simulation start
+RTC_RESET_EPOCH = 1609459200    # 2021-01-01T00:00:00Z, RTC value after power up
+RTC_DRIFT_PPM = 0
+
+_now_us = 0
+_boot_us = 0    # clock at the last board reset (ticks start from zero)
+_listeners = []
+_events = []    # heap of (due_us, seq, callback)
+_seq = 0
+
+_core1_ident = None     # thread of the simulated second core (see _thread.py) and its sleep function
+_core1_sleep_us = None
+
+_rtc_base = RTC_RESET_EPOCH
+_rtc_set_us = 0
+
+def reset():
+    """Restart the clock from zero (new simulation run)."""
+    global _now_us, _boot_us, _seq, _rtc_base, _rtc_set_us
+    _now_us, _boot_us, _seq = 0, 0, 0
+    _rtc_base, _rtc_set_us = RTC_RESET_EPOCH, 0
+    del _events[:]
+
+def now_us():
+    return _now_us
+
+def reboot():
+    """Board reset: ticks start again from zero (the RTC keeps running)."""
+    global _boot_us
+    _boot_us = _now_us
+
+def add_listener(callback):
+    """callback(elapsed_us) is called every time the clock moves."""
+    _listeners.append(callback)
+
+def _move_to(target_us):
+    global _now_us
+    elapsed = target_us - _now_us
+    if elapsed > 0:
+        for callback in _listeners:
+            callback(elapsed)
+        _now_us = target_us
+
+def call_at(due_us, callback):
+    """Schedule callback() at virtual time due_us; returns a handle for cancel()."""
+    global _seq
+    _seq += 1
+    event = [due_us, _seq, callback]
+    heapq.heappush(_events, event)
+    return event
+
+def cancel(event):
+    event[2] = None
+
+def set_core1(ident, sleep_us):
+    global _core1_ident, _core1_sleep_us
+    _core1_ident, _core1_sleep_us = ident, sleep_us
+
+def _on_core1():
+    return _core1_ident is not None and threading.get_ident() == _core1_ident
+
+def advance_us(us):
+    if _on_core1():
+        return  # code on core 1 takes no virtual time
+    target = _now_us + int(us)
+    while _events and _events[0][0] <= target:
+        due, _, callback = heapq.heappop(_events)
+        _move_to(max(due, _now_us))
+        if callback is not None:
+            callback()
+    _move_to(target)
+
+# --- time / utime API ---
+
+def sleep(seconds):
+    sleep_us(seconds * 1000000)
+
+def sleep_ms(ms):
+    sleep_us(ms * 1000)
+
+def sleep_us(us):
+    if _on_core1():
+        _core1_sleep_us(us)
+    else:
+        advance_us(us)
+
+def ticks_ms():
+    return ((_now_us - _boot_us) // 1000) & (TICKS_PERIOD - 1)
+
+def ticks_us():
+    return (_now_us - _boot_us) & (TICKS_PERIOD - 1)
+
+def ticks_cpu():
+    return ticks_us()
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & (TICKS_PERIOD - 1)
+
+def ticks_diff(end, start):
+    diff = (end - start) & (TICKS_PERIOD - 1)
+    if diff >= TICKS_PERIOD // 2:
+        diff -= TICKS_PERIOD
+    return diff
+
+def true_time():
+    """Real UTC time (what a NTP server answers)."""
+    return TRUE_EPOCH_START + _now_us // 1000000
+
+def rtc_time():
+    elapsed = (_now_us - _rtc_set_us) / 1000000
+    return int(_rtc_base + elapsed * (1 + RTC_DRIFT_PPM / 1000000))
+
+def set_rtc(epoch):
+    global _rtc_base, _rtc_set_us
+    _rtc_base, _rtc_set_us = epoch, _now_us
+
+def localtime(secs=None):
+    if secs is None:
+        secs = rtc_time()
+    return tuple(_gmtime(secs))[:8]
+
+def mktime(t):
+    return calendar.timegm(tuple(t[:6]))
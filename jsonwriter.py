@@ -0,0 +1,142 @@
+# JSON writer into a preallocated buffer (readings and heartbeats published by the station)
+# json.dumps() of a dict allocates the dict, every formatted number and a string that grows (and is copied) while
+# it is built; with the TLS buffers taking most of the heap these short-lived blocks fragment it. Here numbers
+# and times are written digit by digit into one bytearray that is reused for every message: the only objects
+# created per message are the ones the caller passes in (e.g. a float reading).
+#
+# Values are written in order; commas and nesting are handled by the writer. Floats are written with a fixed
+# number of decimals (the sensors have a known resolution anyway). Strings are written as they are (ASCII,
+# '"' and '\' escaped). A message longer than SIZE raises IndexError.
+#
+# usage:
+#   jsonwriter.begin()
+#   jsonwriter.key("temperature"); jsonwriter.fixed(temp, 1)
+#   jsonwriter.key("zones"); jsonwriter.open_array()
+#   jsonwriter.open_object(); jsonwriter.key("zone"); jsonwriter.integer(2); jsonwriter.close_object()
+#   jsonwriter.close_array()
+#   client.publish(topic, jsonwriter.end())     # memoryview, valid until the next begin()
+
+SIZE = 768
+
+_TIME_SEPARATORS = b"--T::"
+
+_buffer = bytearray(SIZE)
+_pos = 0
+_first = True       # no comma before the next item
+_after_key = False  # next value belongs to the key just written
+
+def _put(byte):
+    global _pos
+    _buffer[_pos] = byte
+    _pos += 1
+
+def _item():
+    # separator before a key (object) or a value (array)
+    global _first, _after_key
+    if _after_key:
+        _after_key = False
+    elif _first:
+        _first = False
+    else:
+        _put(0x2C)  # ,
+
+def _digits(n, width=1):
+    # n >= 0, left padded with zeros to width
+    start = _pos
+    while n or _pos - start < width:
+        _put(0x30 + n % 10)
+        n //= 10
+    i, j = start, _pos - 1
+    while i < j:
+        _buffer[i], _buffer[j] = _buffer[j], _buffer[i]
+        i += 1
+        j -= 1
+
+def begin():
+    global _pos, _first, _after_key
+    _pos = 0
+    _first = True
+    _after_key = False
+    _put(0x7B)  # {
+
+def end():
+    """Close the message; returns a memoryview of the buffer (valid until the next begin())."""
+    _put(0x7D)  # }
+    return memoryview(_buffer)[:_pos]
+
+def key(name):
+    global _after_key
+    _item()
+    _quoted(name)
+    _put(0x3A)  # :
+    _after_key = True
+
+def open_object():
+    global _first
+    _item()
+    _put(0x7B)
+    _first = True
+
+def close_object():
+    global _first
+    _put(0x7D)
+    _first = False
+
+def open_array():
+    global _first
+    _item()
+    _put(0x5B)
+    _first = True
+
+def close_array():
+    global _first
+    _put(0x5D)
+    _first = False
+
+def integer(n):
+    _item()
+    if n < 0:
+        _put(0x2D)  # -
+        n = -n
+    _digits(n)
+
+def fixed(value, decimals):
+    """Number with a fixed number of decimals (rounded)."""
+    _item()
+    scale = 10 ** decimals
+    n = round(value * scale)
+    if n < 0:
+        _put(0x2D)
+        n = -n
+    _digits(n // scale)
+    if decimals:
+        _put(0x2E)  # .
+        _digits(n % scale, decimals)
+
+def boolean(value):
+    _item()
+    for byte in (b"true" if value else b"false"):
+        _put(byte)
+
+def string(text):
+    _item()
+    _quoted(text)
+
+def _quoted(text):
+    _put(0x22)  # "
+    for char in text:
+        code = ord(char)
+        if code == 0x22 or code == 0x5C:
+            _put(0x5C)
+        _put(code if 0x20 <= code < 0x80 else 0x3F)  # '?' outside printable ASCII
+    _put(0x22)
+
+def timestamp(t):
+    """Time tuple (utime.localtime) as "YYYY-MM-DDTHH:MM:SS"."""
+    _item()
+    _put(0x22)
+    _digits(t[0], 4)
+    for i in range(5):
+        _put(_TIME_SEPARATORS[i])
+        _digits(t[i + 1], 2)
+    _put(0x22)
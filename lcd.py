@@ -1,13 +1,19 @@
 import time
 import machine
 
-# Define LCD pin configuration
-LCD_RS = machine.Pin(3,machine.Pin.OUT)
-LCD_EN = machine.Pin(1,machine.Pin.OUT)
-LCD_D4 = machine.Pin(4,machine.Pin.OUT)
-LCD_D5 = machine.Pin(5,machine.Pin.OUT)
-LCD_D6 = machine.Pin(6,machine.Pin.OUT)
-LCD_D7 = machine.Pin(7,machine.Pin.OUT)
+# HD44780 16x2 LCD in 4-bit mode
+# The driver talks to the display through a transport, selected with setup() (no pins are claimed at import):
+#   - GpioTransport:    RS, EN and D4..D7 on 6 GPIOs; the 4 data bits and the enable pulse are written with
+#                       single SIO register writes (GPIO_OUT_SET/CLR) when machine.mem32 is available
+#   - PCF8574Transport: I2C backpack on 2 pins (SDA/SCL); every nibble with its EN strobe is 2 bytes of one
+#                       writeto() burst and a whole string is sent in a single I2C transaction
+# For partial updates of the screen use lcdfb.py (framebuffer, only changed characters are sent).
+#
+# usage:
+#   lcd.setup(lcd.PCF8574Transport(machine.I2C(0, sda=machine.Pin(8), scl=machine.Pin(9), freq=400000)))
+#   lcd.setup(lcd.GpioTransport(rs=3, en=1, data=(4, 5, 6, 7)))   # old wiring (clashes with the station pins)
+#   lcd.lcd_init()
+#   lcd.lcd_text(1, "hello")
 
 # LCD constants
 LCD_WIDTH = 16  # Maximum characters per line
@@ -18,71 +24,158 @@ LCD_LINE_2 = 0xC0  # LCD RAM address for the second line
 LCD_CLEAR = 0x01  # Clear the display
 LCD_HOME = 0x02   # Return to home position
 
+# Timing (microseconds / milliseconds), see configure()
+PULSE_US = 1            # enable pulse width (GPIO transport)
+EXEC_US = 50            # execution time of a data write or command (37us typ.)
+CLEAR_US = 2000         # execution time of clear/home (1.52ms typ.)
+POWER_ON_MS = 50        # wait after power up before the init sequence
+INIT_FIRST_US = 4100    # init: after the first 0x3 nibble (still 8-bit mode, every nibble is an instruction)
+INIT_SECOND_US = 100    # init: after the second one
+
+# SIO registers of the RP2040 (grouped pin writes)
+SIO_BASE = 0xd0000000
+GPIO_OUT_SET = SIO_BASE + 0x014
+GPIO_OUT_CLR = SIO_BASE + 0x018
+
+try:
+    from machine import mem32
+except ImportError:
+    mem32 = None
+
+_transport = None
+
+class GpioTransport:
+    """Display wired to 6 GPIOs (4-bit mode, RW tied to ground)."""
+
+    def __init__(self, rs=3, en=1, data=(4, 5, 6, 7)):
+        self.rs = machine.Pin(rs, machine.Pin.OUT)
+        self.en = machine.Pin(en, machine.Pin.OUT)
+        self.data = [machine.Pin(pin, machine.Pin.OUT) for pin in data]
+        self.en_mask = 1 << en
+        self.data_mask = 0
+        for pin in data:
+            self.data_mask |= 1 << pin
+        # nibble value -> GPIO bits to set
+        self.nibble_bits = [sum(1 << data[i] for i in range(4) if n & (1 << i)) for n in range(16)]
+
+    def _nibble(self, nibble):
+        if mem32 is not None:
+            bits = self.nibble_bits[nibble]
+            mem32[GPIO_OUT_CLR] = (self.data_mask & ~bits) | self.en_mask
+            mem32[GPIO_OUT_SET] = bits
+            mem32[GPIO_OUT_SET] = self.en_mask
+            time.sleep_us(PULSE_US)
+            mem32[GPIO_OUT_CLR] = self.en_mask
+            return
+        for i in range(4):
+            self.data[i].value((nibble >> i) & 1)
+        self.en.value(1)
+        time.sleep_us(PULSE_US)
+        self.en.value(0)
+
+    def nibble(self, value, delay_us):
+        """Send a single command nibble and wait delay_us (init sequence, display still in 8-bit mode)."""
+        self.rs.value(0)
+        self._nibble(value)
+        time.sleep_us(delay_us)
+
+    def write(self, data, rs):
+        """Send bytes (iterable of ints) as commands (rs=0) or characters (rs=1)."""
+        self.rs.value(rs)
+        for byte in data:
+            self._nibble(byte >> 4)
+            self._nibble(byte & 0x0F)
+            time.sleep_us(EXEC_US)
+
+class PCF8574Transport:
+    """Display behind a PCF8574 I2C backpack (P0=RS, P1=RW, P2=EN, P3=backlight, P4..P7=D4..D7)."""
+
+    RS = 0x01
+    EN = 0x04
+    BACKLIGHT = 0x08
+
+    def __init__(self, i2c, address=0x27, backlight=True):
+        self.i2c = i2c
+        self.address = address
+        self.backlight = self.BACKLIGHT if backlight else 0
+        self._buffer = bytearray(4 * 2 * LCD_WIDTH)    # a full screen of characters in one transaction
+
+    def set_backlight(self, on):
+        self.backlight = self.BACKLIGHT if on else 0
+        self.i2c.writeto(self.address, bytes((self.backlight,)))
+
+    def nibble(self, value, delay_us):
+        """Send a single command nibble and wait delay_us (init sequence, display still in 8-bit mode)."""
+        data = ((value << 4) & 0xF0) | self.backlight
+        self.i2c.writeto(self.address, bytes((data | self.EN, data)))
+        time.sleep_us(delay_us)
+
+    def write(self, data, rs):
+        """Send bytes as commands (rs=0) or characters (rs=1): one writeto() for the whole sequence."""
+        size = 4 * len(data)
+        if size > len(self._buffer):
+            self._buffer = bytearray(size)
+        buf = self._buffer
+        control = self.backlight | (self.RS if rs else 0)
+        i = 0
+        for byte in data:
+            high = (byte & 0xF0) | control
+            low = ((byte << 4) & 0xF0) | control
+            # every nibble: EN high, then EN low (data latched on the falling edge)
+            buf[i] = high | self.EN
+            buf[i + 1] = high
+            buf[i + 2] = low | self.EN
+            buf[i + 3] = low
+            i += 4
+        # at 100-400kHz one I2C byte takes longer than EXEC_US: no wait needed between characters
+        self.i2c.writeto(self.address, memoryview(buf)[:size])
+
+def setup(transport):
+    """Select the transport used by the lcd_* functions."""
+    global _transport
+    _transport = transport
+
+def configure(pulse_us=None, exec_us=None, clear_us=None, power_on_ms=None):
+    """Change the timing (slow or 3.3V displays may need longer EXEC_US)."""
+    global PULSE_US, EXEC_US, CLEAR_US, POWER_ON_MS
+    if pulse_us is not None:
+        PULSE_US = pulse_us
+    if exec_us is not None:
+        EXEC_US = exec_us
+    if clear_us is not None:
+        CLEAR_US = clear_us
+    if power_on_ms is not None:
+        POWER_ON_MS = power_on_ms
+
 # Function to initialize the LCD
+# reset by instruction: until 0x2 is received the display may be in 8-bit mode (power up) or in 4-bit mode
+# (warm reboot), so the first nibbles are sent one by one with the waits of the datasheet
 def lcd_init():
-    lcd_command(0x33)  # Initialize
-    lcd_command(0x32)  # Set to 4-bit mode
-    lcd_command(0x06)  # Cursor move direction
+    if _transport is None:
+        raise RuntimeError("lcd.setup() not called")
+    time.sleep_ms(POWER_ON_MS)
+    _transport.nibble(0x3, INIT_FIRST_US)   # Initialize (8-bit mode)
+    _transport.nibble(0x3, INIT_SECOND_US)
+    _transport.nibble(0x3, EXEC_US)
+    _transport.nibble(0x2, EXEC_US)         # Set to 4-bit mode
+    lcd_command(0x28)  # 2 lines, 5x8 character matrix (function set comes first in 4-bit mode)
     lcd_command(0x0C)  # Display on, cursor off, blink off
-    lcd_command(0x28)  # 2 lines, 5x8 character matrix
+    lcd_command(0x06)  # Cursor move direction
     lcd_command(LCD_CLEAR)  # Clear the screen
-    time.sleep_ms(2)  # Delay to allow for LCD initialization
 
 # Function to send a command to the LCD
 def lcd_command(cmd):
-    LCD_RS.value(0)  # Set RS to command mode
-    get_nibble(cmd)
+    _transport.write((cmd,), 0)
+    if cmd == LCD_CLEAR or cmd == LCD_HOME:
+        time.sleep_us(CLEAR_US)
 
 # Function to send data to the LCD
 def lcd_data(data):
-    LCD_RS.value(1)  # Set RS to data mode
-    get_nibble(data)
-
-def get_nibble(data):
-
-    LCD_EN.value(0)
-    LCD_D4.value(0)
-    LCD_D5.value(0)
-    LCD_D6.value(0)
-    LCD_D7.value(0)
-
-      # High nibble
-    if data & 0x10:
-        LCD_D4.value(1)
-    if data & 0x20:
-        LCD_D5.value(1)
-    if data & 0x40:
-        LCD_D6.value(1)
-    if data & 0x80:
-        LCD_D7.value(1)
-
-    # Toggle Enable
-    LCD_EN.value(1)
-    time.sleep_us(1)
-    LCD_EN.value(0)
-    time.sleep_us(100)
-
-    # Low nibble
-    LCD_D4.value(0)
-    LCD_D5.value(0)
-    LCD_D6.value(0)
-    LCD_D7.value(0)
-
-    # High nibble
-    if data & 0x01:
-        LCD_D4.value(1)
-    if data & 0x02:
-        LCD_D5.value(1)
-    if data & 0x04:
-        LCD_D6.value(1)
-    if data & 0x08:
-        LCD_D7.value(1)
-
-    # Toggle Enable
-    LCD_EN.value(1)
-    time.sleep_us(1)
-    LCD_EN.value(0)
-    time.sleep_us(100)    
+    _transport.write((data,), 1)
+
+# Function to send several characters (bytes) in one transfer
+def lcd_write(data):
+    _transport.write(data, 1)
 
 # Function to clear the LCD screen
 def lcd_clear():
@@ -99,6 +192,4 @@ def lcd_text(line, text):
     elif line == 2:
         lcd_command(LCD_LINE_2)
 
-    for char in text:
-        lcd_data(ord(char))
-
+    lcd_write(text.encode())
@@ -0,0 +1,90 @@
+# Framebuffer for the 16x2 LCD (on top of lcd.py)
+# Text is written into a RAM buffer; refresh() compares it with a shadow copy of the display memory and
+# sends only the characters that changed, moving the cursor only when the next changed cell is not the one
+# the display would write next anyway (the address auto-increments after every character).
+# Redrawing a status screen where one value changed costs a few bytes instead of 34 (2 addresses + 32 chars);
+# every run of changed characters is a single transfer (one I2C transaction with the PCF8574 transport).
+#
+# usage:
+#   lcd.setup(lcd.PCF8574Transport(i2c))
+#   lcdfb.init()
+#   lcdfb.line(1, "Soil %3d%%" % moisture)
+#   lcdfb.line(2, "%.1fC %2d%% %.2fV" % (temp, hum, battery))
+#   lcdfb.refresh()         # e.g. once per second
+
+import lcd
+
+WIDTH = lcd.LCD_WIDTH
+LINES = 2
+LINE_ADDRESS = (lcd.LCD_LINE_1, lcd.LCD_LINE_2)
+
+_buffer = bytearray(b" " * (WIDTH * LINES))    # wanted content
+_shadow = bytearray(b" " * (WIDTH * LINES))    # content of the display
+_cursor = -1                                    # cell the display writes next (-1: unknown)
+_sent = 0
+
+def init():
+    """Initialize the display (cleared) and the buffers."""
+    global _cursor
+    lcd.lcd_init()
+    for i in range(WIDTH * LINES):
+        _buffer[i] = 0x20
+        _shadow[i] = 0x20
+    _cursor = 0
+
+def write(line, col, text):
+    """Write text at line (1..LINES), col (0..WIDTH-1); text past the end of the line is cut."""
+    pos = (line - 1) * WIDTH + col
+    end = line * WIDTH
+    for char in text:
+        if pos >= end:
+            break
+        code = ord(char)
+        _buffer[pos] = code if 0x20 <= code < 0x80 else 0x3F  # '?' outside the ASCII set of the ROM
+        pos += 1
+
+def line(line, text):
+    """Replace a whole line (padded with spaces)."""
+    write(line, 0, text)
+    for i in range((line - 1) * WIDTH + min(len(text), WIDTH), line * WIDTH):
+        _buffer[i] = 0x20
+
+def clear():
+    for i in range(WIDTH * LINES):
+        _buffer[i] = 0x20
+
+def refresh():
+    """Send the changed cells to the display; returns the number of bytes sent."""
+    global _cursor, _sent
+    sent = 0
+    i = 0
+    end = WIDTH * LINES
+    while i < end:
+        if _buffer[i] == _shadow[i]:
+            i += 1
+            continue
+        # run of changed cells on the same line: one address (if needed) + one transfer
+        start = i
+        line_end = (i // WIDTH + 1) * WIDTH
+        while i < line_end and _buffer[i] != _shadow[i]:
+            _shadow[i] = _buffer[i]
+            i += 1
+        if start != _cursor:
+            lcd.lcd_command(LINE_ADDRESS[start // WIDTH] + start % WIDTH)
+            sent += 1
+        lcd.lcd_write(memoryview(_buffer)[start:i])
+        sent += i - start
+        # the address does not continue from the end of line 1 into line 2
+        _cursor = i if i % WIDTH else -1
+    _sent += sent
+    return sent
+
+def invalidate():
+    """Forget the shadow copy (e.g. after something else wrote to the display): next refresh redraws all."""
+    global _cursor
+    for i in range(WIDTH * LINES):
+        _shadow[i] = 0x00
+    _cursor = -1
+
+def bytes_sent():
+    return _sent
@@ -0,0 +1,128 @@
+# Buffered rotating log for Raspberry Pi Pico
+# Records (level + ISO timestamp, UTC) are kept in RAM during the wake cycle and written to flash with a single
+# flush() before sleeping. The log is split in size-capped segments: when log.txt is full it is renamed to
+# log.txt.1 (log.txt.1 -> log.txt.2 ...) and the oldest one is deleted, so the log never fills the filesystem.
+# A failed write is reported on the console and the records are dropped: logging never stops the station.
+#
+# usage:
+#   logger.info("published")
+#   logger.error("Error: " + str(e))
+#   logger.flush()               # once per cycle, before sleep
+#   lines = logger.tail(20)      # last lines (flash + not yet flushed), e.g. to publish them over MQTT
+
+import os
+import utime
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL = INFO    # records below this level are ignored
+NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+LOG_FILE = "log.txt"
+SEGMENT_SIZE = 4096     # bytes per segment
+SEGMENTS = 3            # log.txt + log.txt.1 + log.txt.2 -> at most ~12KB on flash
+MAX_BUFFERED = 32       # records kept in RAM between two flushes (oldest dropped)
+TAIL_MAX = 50           # max lines returned by tail()
+
+_buffer = []
+_dropped = 0
+
+def _timestamp():
+    t = utime.localtime()
+    return "%04d-%02d-%02dT%02d:%02d:%02dZ" % t[:6]
+
+def log(level, message):
+    global _dropped
+    if level < LEVEL:
+        return
+    if len(_buffer) >= MAX_BUFFERED:
+        _buffer.pop(0)
+        _dropped += 1
+    _buffer.append("%s %s %s" % (_timestamp(), NAMES.get(level, str(level)), message))
+
+def debug(message):
+    log(DEBUG, message)
+
+def info(message):
+    log(INFO, message)
+
+def warning(message):
+    log(WARNING, message)
+
+def error(message):
+    log(ERROR, message)
+
+def _segment(i):
+    return LOG_FILE if i == 0 else "%s.%d" % (LOG_FILE, i)
+
+def _size(path):
+    try:
+        return os.stat(path)[6]
+    except OSError:
+        return 0
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def rotate():
+    """Shift segments by one (log.txt -> log.txt.1 ...) dropping the oldest."""
+    _remove(_segment(SEGMENTS - 1))
+    for i in range(SEGMENTS - 2, -1, -1):
+        try:
+            os.rename(_segment(i), _segment(i + 1))
+        except OSError:
+            pass
+
+def _write(data):
+    if _size(LOG_FILE) + len(data) > SEGMENT_SIZE:
+        rotate()
+    with open(LOG_FILE, "a") as f:
+        f.write(data)
+
+def flush():
+    """Append the buffered records to flash (one write per cycle); returns False if nothing was written."""
+    global _dropped
+    if not _buffer:
+        return False
+    if _dropped:
+        _buffer.insert(0, "%s WARNING %d log records dropped" % (_timestamp(), _dropped))
+    data = "\n".join(_buffer) + "\n"
+    del _buffer[:]
+    _dropped = 0
+    try:
+        _write(data)
+    except OSError as e:
+        # filesystem full: free the old segments and try once more
+        print("Error writing log:", e)
+        try:
+            for i in range(SEGMENTS - 1, 0, -1):
+                _remove(_segment(i))
+            rotate()
+            _write(data)
+        except OSError:
+            return False
+    return True
+
+def tail(lines=20):
+    """Last 'lines' log lines, oldest first (segments on flash, then records not flushed yet)."""
+    lines = min(lines, TAIL_MAX)
+    if lines <= 0:
+        return []
+    result = _buffer[-lines:]
+    for i in range(SEGMENTS):
+        if len(result) >= lines:
+            break
+        try:
+            with open(_segment(i), "r") as f:
+                stored = f.read().split("\n")
+        except OSError:
+            break
+        stored = [line for line in stored if line]
+        result = stored[-(lines - len(result)):] + result
+    return result
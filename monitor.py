@@ -0,0 +1,258 @@
+# Continuous monitoring on the second core of the RP2040 (optional, MONITOR_MODE of the station)
+# While core 0 waits at low clock between wake cycles (power.wait()), core 1 (_thread) samples the soil sensor
+# and the battery every period_ms into a lock-protected ring of raw ADC values, and raises events that end the
+# wait of core 0:
+#   EVENT_DRY         soil drier than the limit (armed again when it is wetter than the limit + hysteresis)
+#   EVENT_BATTERY     battery below the low level (armed again above it + hysteresis)
+#   EVENT_PUMP_FAULT  the relay was on for fault_ms without the moisture rising (empty tank, broken pump, ...)
+# Core 0 keeps WiFi/MQTT: the radio is powered only by the wake cycle that follows an event (or the interval).
+#
+# Core 1 works on raw ADC values only (ints, preallocated arrays: no allocation on the heap shared by the cores).
+# The soil sensor is powered only for the sample; both cores switch it through sensor_power()/ownership flags,
+# so one core never switches it off while the other is using it. Every ADC access of core 0 must hold adc_lock
+# (one ADC, its channel is selected per read). Core 1 never sleeps holding a lock.
+#
+# usage:
+#   monitor.setup(soil_adc, battery_adc, soil_power_pin, relay_pin)
+#   monitor.start(1000, dry_raw, battery_raw)     # again with new thresholds: only updates them
+#   with monitor.adc_lock:
+#       value = adc.read_u16()
+#   power.wait(interval_ms, monitor.events)
+#   if monitor.take_events() & monitor.EVENT_DRY: ...
+#   monitor.stop()
+
+import utime
+from array import array
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+EVENT_DRY = 0x01
+EVENT_BATTERY = 0x02
+EVENT_PUMP_FAULT = 0x04
+
+CAPACITY = 256          # samples kept in the ring (~4 minutes at 1 s)
+BURST = 4               # ADC reads averaged per sample (power of 2)
+SETTLE_MS = 20          # soil sensor power-up before a sample
+HYSTERESIS_RAW = 500    # ~2% moisture / ~50mV battery
+PUMP_GAP_MS = 60000     # relay off for longer than this: next on time is a new irrigation
+
+class _NoLock:
+    # without _thread there is a single core: nothing to lock
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def acquire(self):
+        return True
+
+    def release(self):
+        pass
+
+adc_lock = _thread.allocate_lock() if _thread else _NoLock()
+_ring_lock = _thread.allocate_lock() if _thread else _NoLock()
+
+_ticks = array("i", bytes(4 * CAPACITY))
+_soil_raw = array("H", bytes(2 * CAPACITY))
+_battery_raw = array("H", bytes(2 * CAPACITY))
+_head = 0
+_count = 0
+
+_soil = None
+_battery = None
+_soil_power = None
+_relay = None
+_core0_power = 0        # soil sensor power wanted by core 0 (wake cycle)
+_core1_power = 0        # by core 1 (sample in progress)
+
+_running = False
+_stopped = True
+_period_ms = 1000
+_dry_raw = 65535
+_low_battery_raw = 0
+_fault_ms = 0
+_rise_raw = 0
+
+_events = 0
+_dry_armed = True
+_battery_armed = True
+_pump_start_raw = -1
+_pump_on_ms = 0
+_pump_off_ms = 0
+_pump_checked = False
+_last_ticks = 0
+_window_min = 65535     # soil raw range since the last summary()
+_window_max = 0
+_window_samples = 0
+_counts = [0, 0, 0]     # dry, battery, pump fault events
+
+def available():
+    return _thread is not None
+
+def setup(soil, battery, soil_power, relay):
+    """ADCs, soil sensor power pin and pump relay pin shared with the wake cycle."""
+    global _soil, _battery, _soil_power, _relay
+    _soil, _battery, _soil_power, _relay = soil, battery, soil_power, relay
+
+def sensor_power(on):
+    """Soil sensor power for core 0 (stays on while core 1 takes a sample)."""
+    global _core0_power
+    with adc_lock:
+        _core0_power = 1 if on else 0
+        _soil_power.value(_core0_power | _core1_power)
+
+def _read(adc):
+    total = 0
+    for _ in range(BURST):
+        total += adc.read_u16()
+    return total // BURST
+
+def _check_pump(soil, pump_on, elapsed_ms):
+    global _events, _pump_start_raw, _pump_on_ms, _pump_off_ms, _pump_checked
+    if not pump_on:
+        if _pump_start_raw >= 0:
+            _pump_off_ms += elapsed_ms
+            if _pump_off_ms > PUMP_GAP_MS:
+                _pump_start_raw = -1
+        return
+    _pump_off_ms = 0
+    if _pump_start_raw < 0:
+        _pump_start_raw, _pump_on_ms, _pump_checked = soil, 0, False
+        return
+    _pump_on_ms += elapsed_ms
+    if _pump_checked:
+        return
+    if _pump_start_raw - soil >= _rise_raw:      # wetter -> lower raw value
+        _pump_checked = True
+    elif _fault_ms and _pump_on_ms >= _fault_ms:
+        _pump_checked = True
+        _events |= EVENT_PUMP_FAULT
+        _counts[2] += 1
+
+def _store(now, soil, battery, pump_on):
+    global _head, _count, _events, _dry_armed, _battery_armed, _last_ticks
+    global _window_min, _window_max, _window_samples
+    _ticks[_head] = now
+    _soil_raw[_head] = soil
+    _battery_raw[_head] = battery
+    _head = (_head + 1) % CAPACITY
+    if _count < CAPACITY:
+        _count += 1
+    _window_samples += 1
+    if soil < _window_min:
+        _window_min = soil
+    if soil > _window_max:
+        _window_max = soil
+
+    if soil > _dry_raw:
+        if _dry_armed:
+            _dry_armed = False
+            _events |= EVENT_DRY
+            _counts[0] += 1
+    elif soil < _dry_raw - HYSTERESIS_RAW:
+        _dry_armed = True
+    if battery < _low_battery_raw:
+        if _battery_armed:
+            _battery_armed = False
+            _events |= EVENT_BATTERY
+            _counts[1] += 1
+    elif battery > _low_battery_raw + HYSTERESIS_RAW:
+        _battery_armed = True
+    _check_pump(soil, pump_on, utime.ticks_diff(now, _last_ticks))
+    _last_ticks = now
+
+def _sample():
+    global _core1_power
+    adc_lock.acquire()
+    _core1_power = 1
+    _soil_power.value(1)
+    adc_lock.release()
+    utime.sleep_ms(SETTLE_MS)
+
+    adc_lock.acquire()
+    soil = _read(_soil)
+    battery = _read(_battery)
+    pump_on = _relay.value()
+    _core1_power = 0
+    _soil_power.value(_core0_power)
+    adc_lock.release()
+
+    now = utime.ticks_ms()
+    _ring_lock.acquire()
+    _store(now, soil, battery, pump_on)
+    _ring_lock.release()
+
+def _loop():
+    # core 1
+    global _stopped
+    while _running:
+        _sample()
+        utime.sleep_ms(_period_ms)
+    _stopped = True
+
+def start(period_ms, dry_raw, low_battery_raw, fault_ms=0, rise_raw=0):
+    """Start sampling on core 1 (or only update the settings if it is running).
+    dry_raw/low_battery_raw: thresholds as raw ADC values (soil: higher is drier);
+    fault_ms/rise_raw: pump fault if the relay is on for fault_ms without a rise_raw change (0: no check)."""
+    global _running, _stopped, _period_ms, _dry_raw, _low_battery_raw, _fault_ms, _rise_raw, _last_ticks
+    if _thread is None:
+        raise RuntimeError("no _thread support: second core not available")
+    _ring_lock.acquire()
+    _period_ms, _dry_raw, _low_battery_raw, _fault_ms, _rise_raw = (max(0, period_ms - SETTLE_MS), dry_raw,
+                                                                    low_battery_raw, fault_ms, rise_raw)
+    _ring_lock.release()
+    if _running:
+        return
+    while not _stopped:     # previous loop still finishing its last sample
+        utime.sleep_ms(SETTLE_MS)
+    _last_ticks = utime.ticks_ms()
+    _running = True
+    _stopped = False
+    _thread.start_new_thread(_loop, ())
+
+def stop():
+    """Ask core 1 to stop after the current sample (returns at once)."""
+    global _running
+    _running = False
+
+def running():
+    return _running
+
+def events():
+    """Pending events (bit mask of EVENT_*), not cleared."""
+    return _events
+
+def take_events():
+    """Pending events, cleared."""
+    global _events
+    _ring_lock.acquire()
+    pending = _events
+    _events = 0
+    _ring_lock.release()
+    return pending
+
+def last():
+    """(ticks_ms, soil raw, battery raw) of the latest sample, None if there is none."""
+    with _ring_lock:
+        if not _count:
+            return None
+        i = (_head - 1) % CAPACITY
+        return _ticks[i], _soil_raw[i], _battery_raw[i]
+
+def summary():
+    """Samples and soil raw range since the previous summary() (the window starts again)."""
+    global _window_min, _window_max, _window_samples
+    with _ring_lock:
+        result = {"samples": _window_samples, "soil_min_raw": _window_min, "soil_max_raw": _window_max}
+        _window_min, _window_max, _window_samples = 65535, 0, 0
+    return result
+
+def report():
+    result = summary()
+    result["running"] = _running
+    result["dry_events"], result["battery_events"], result["pump_faults"] = _counts
+    return result
@@ -1,7 +1,9 @@
 import time 
 import utime
+import machine
 import network
 import ntptime
+import timezone
 
 SSID = "Your SSID"
 PASSWORD = "Your PASSWORD"
@@ -26,20 +28,8 @@ def set_time():
         print("Failed to set time from NTP server:", e)
 
 
-    current_time=utime.localtime()
-    offset = 1 * 3600  # UTC+1 in seconds
-        
-    dst_active = (
-        (current_time[1] > 3 and current_time[1] < 10) or
-        (current_time[1] == 3 and current_time[2] >= 28) or
-        (current_time[1] == 10 and current_time[2] < 28)
-    )
-
-    if dst_active:
-        offset += 3600  # Additional +1 for DST
-    
-    now=time.time()
-    cet=time.localtime(now+offset)
+    # local time (exact DST transitions, same rules as WaterPlantStation) -> timezone.py
+    cet=timezone.localtime(utime.time())
     machine.RTC().datetime((cet[0], cet[1], cet[2], cet[6] + 1, cet[3], cet[4], cet[5], 0))
     print("Local time after synchronization：%s" %str(time.localtime()))    
     
@@ -0,0 +1,61 @@
+# Compact binary payload for the sensor readings (alternative to the JSON published on picoW/sensor)
+# One reading is a fixed 30 byte little-endian struct (the JSON message is ~300 bytes), packed into a
+# preallocated buffer: no dict, no strings, no float formatting per publish.
+# Published on picoW/sensor/bin, decoded on the server side by tools/decode_payload.py.
+#
+# version 1 ("<BBIhHhHBIHIBI"):
+#   version (B), flags (B, ringbuffer.FLAG_*), time of misuration (I, UTC epoch),
+#   temperature (h, C x10), humidity (H, % x10), soil moisture (h, % x10), battery (H, mV),
+#   moisture limit (B, %), last irrigation (I, UTC epoch, 0 -> never), irrigation run time (H, s x10),
+#   misuration interval (I, s), pump active for (B, s), next interval (I, s)
+# version 2 (multi-zone station, see zones.py): version 1 fields (with version 2), then
+#   number of zone slots (B), per zone 2..n by number: soil moisture (h, % x10, -32768: zone not used, e.g.
+#   disabled by a pin clash), moisture limit (B, %)
+#   (irrigated zones: ringbuffer.FLAG_ZONE_IRRIGATED bits of flags)
+#
+# usage:
+#   client.publish("picoW/sensor/bin", payload.encode(epoch, temp, hum, moisture, battery_level, flags, ...))
+#   client.publish("picoW/sensor/bin", payload.encode(..., zones=((moisture2, limit2), (None, 0), (moisture4, limit4))))
+
+import struct
+
+VERSION = 1
+FORMAT = "<BBIhHhHBIHIBI"
+SIZE = struct.calcsize(FORMAT)
+
+ZONES_VERSION = 2
+ZONE_FORMAT = "<hB"
+ZONE_SIZE = struct.calcsize(ZONE_FORMAT)
+MAX_EXTRA_ZONES = 3
+NO_ZONE = -32768
+
+_buffer = bytearray(SIZE + 1 + MAX_EXTRA_ZONES * ZONE_SIZE)
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+def encode(epoch, temp, hum, moisture, battery_level, flags, next_interval,
+           moisture_limit, last_irrigation, run_ms, misuration_interval, pump_for, zones=()):
+    """Pack one reading into the shared buffer and return it (valid until the next encode()).
+    zones: (moisture, limit) of the zones 2..n by number (moisture None: zone not used) -> version 2 payload."""
+    zones = zones[:MAX_EXTRA_ZONES]
+    struct.pack_into(FORMAT, _buffer, 0, ZONES_VERSION if zones else VERSION, flags, epoch,
+                     _clamp(round(temp * 10), -32768, 32767),
+                     _clamp(round(hum * 10), 0, 65535),
+                     _clamp(round(moisture * 10), -32768, 32767),
+                     _clamp(round(battery_level * 1000), 0, 65535),
+                     _clamp(moisture_limit, 0, 255),
+                     last_irrigation,
+                     _clamp(run_ms // 100, 0, 65535),
+                     misuration_interval,
+                     _clamp(pump_for, 0, 255),
+                     next_interval)
+    if not zones:
+        return memoryview(_buffer)[:SIZE]
+    _buffer[SIZE] = len(zones)
+    offset = SIZE + 1
+    for moisture, limit in zones:
+        value = NO_ZONE if moisture is None else _clamp(round(moisture * 10), NO_ZONE + 1, 32767)
+        struct.pack_into(ZONE_FORMAT, _buffer, offset, value, _clamp(limit, 0, 255))
+        offset += ZONE_SIZE
+    return memoryview(_buffer)[:offset]
@@ -0,0 +1,124 @@
+# Low-power sleep between wake cycles for Raspberry Pi Pico W (replaces the custom deepsleep()/delay())
+# Selectable backends, with the modelled current of the whole board while sleeping (radio off):
+#   - "idle":       core clocked down to IDLE_FREQ, sleep() in chunks (what the old custom deepsleep did)
+#   - "lightsleep": machine.lightsleep() in chunks: clocks stopped, wake from the hardware timer, RAM kept
+#   - "deepsleep":  machine.deepsleep(): timer wake followed by a reset, the station boots again and reloads
+#                   its state from flash (ring buffer, settings, scheduler...): lowest RAM retention risk,
+#                   but pays the boot time on every wake
+# The built-in sleeps were reported to sometimes not wake up (see deepsleep.py): "idle" stays the default,
+# the bench (hostsim/bench.py --set SLEEP_MODE=...) compares the backends.
+#
+# Unused GPIOs are parked as pulled-down inputs during sleep; pins registered with set_pins() (relay, sensor
+# power, ADC...) are never reconfigured, so the relay cannot glitch on wake.
+# The sleep length is kept accurate: chunks run against a ticks_ms deadline (wake overhead is absorbed) and the
+# crystal drift measured by timesync.py is compensated.
+#
+# usage:
+#   power.set_pins([0, 2, 3, 4, 22, 26, 28])
+#   power.set_backend("lightsleep")
+#   power.sleep(interval * 1000)
+#   power.wait(interval * 1000, monitor.events)     # idle, ends early when core 1 raises an event
+
+import machine
+from machine import Pin
+import utime
+import timesync
+
+BACKENDS = ("idle", "lightsleep", "deepsleep")
+
+# modelled board current while sleeping (mA at 3.7V, radio off, sensors off)
+MODELLED_MA = {
+    "idle": 10.1,       # 1.5mA + 0.18mA/MHz at 48MHz
+    "lightsleep": 1.3,
+    "deepsleep": 1.3,   # same hardware state as lightsleep on the RP2040, plus a boot on wake
+}
+
+IDLE_FREQ = 48000000
+RUN_FREQ = 125000000
+MAX_CHUNK_MS = 60000            # wake up at least once a minute (idle) / keep the timer far from overflow
+GPIO_COUNT = 29
+RESERVED_PINS = (14, 15, 23, 24, 25, 29)  # UART, Pico W wireless interface (WL_ON/D/CS/CLK)
+
+_backend = "idle"
+_used_pins = ()
+_last_error_ms = 0
+
+def set_backend(name):
+    """Select one of BACKENDS; raises ValueError for unknown backends."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError("unknown sleep backend: %s" % name)
+    _backend = name
+
+def backend():
+    return _backend
+
+def current_ma(name=None):
+    """Modelled sleep current of a backend (default: the selected one)."""
+    return MODELLED_MA[name or _backend]
+
+def set_pins(pins):
+    """GPIOs used by the application: they keep their configuration during sleep."""
+    global _used_pins
+    _used_pins = tuple(pins)
+
+def park():
+    # floating inputs leak current: pull the unused ones down
+    for i in range(GPIO_COUNT):
+        if i not in _used_pins and i not in RESERVED_PINS:
+            Pin(i, Pin.IN, Pin.PULL_DOWN)
+
+def corrected_ms(ms):
+    """Sleep length in local clock ms for 'ms' real ms (positive drift: the crystal runs fast)."""
+    if not timesync.drift_measured():
+        return ms
+    return int(ms * (1 + timesync.drift_ppm() / 1000000))
+
+def _chunks(ms, sleep_chunk):
+    # sleep in chunks until the deadline: the overhead of every wake is absorbed by the next chunk
+    start = utime.ticks_ms()
+    while True:
+        left = ms - utime.ticks_diff(utime.ticks_ms(), start)
+        if left <= 0:
+            return -left
+        sleep_chunk(min(left, MAX_CHUNK_MS))
+
+def sleep(ms):
+    """Sleep for ms milliseconds with the selected backend ("deepsleep" does not return: the board resets)."""
+    global _last_error_ms
+    ms = corrected_ms(int(ms))
+    park()
+    if _backend == "deepsleep":
+        machine.deepsleep(ms)
+    elif _backend == "lightsleep":
+        _last_error_ms = _chunks(ms, machine.lightsleep)
+    else:
+        machine.freq(IDLE_FREQ)
+        try:
+            _last_error_ms = _chunks(ms, utime.sleep_ms)
+        finally:
+            machine.freq(RUN_FREQ)
+    return _last_error_ms
+
+def wait(ms, wake, step_ms=100):
+    """Idle at IDLE_FREQ for ms milliseconds or until wake() returns true (the second core keeps running,
+    lightsleep/deepsleep would stop it); returns the ms waited."""
+    global _last_error_ms
+    ms = corrected_ms(int(ms))
+    park()
+    start = utime.ticks_ms()
+    machine.freq(IDLE_FREQ)
+    try:
+        while not wake():
+            left = ms - utime.ticks_diff(utime.ticks_ms(), start)
+            if left <= 0:
+                break
+            utime.sleep_ms(min(left, step_ms))
+    finally:
+        machine.freq(RUN_FREQ)
+    waited = utime.ticks_diff(utime.ticks_ms(), start)
+    _last_error_ms = max(0, waited - ms)
+    return waited
+
+def report():
+    return {"backend": _backend, "sleep_ma": current_ma(), "last_sleep_error_ms": _last_error_ms}
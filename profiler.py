@@ -0,0 +1,194 @@
+# Wake-cycle profiler for Raspberry Pi Pico
+# Measures how long every phase of a wake cycle takes (utime.ticks_ms), free heap at the start and at the end
+# of the cycle and how many retries were needed (e.g. polls while waiting for wifi association).
+# The lowest free heap of the cycle is sampled at the end of every phase (e.g. right after the TLS handshake of
+# connectMQTT) and kept with the lowest value ever seen, so memory regressions show up in the diagnostics.
+#
+# Rolling statistics per phase (last, min, max, EWMA in ms) are kept in RAM and in a small binary record on flash,
+# so they survive reset() and can be published on a diagnostics topic every N cycles. The record is written
+# every SAVE_EVERY cycles, after a report and when the next sleep resets the board (end_cycle(True)), not on
+# every wake: an unexpected reset loses at most the statistics of the cycles since the last write.
+# Boot latency: "boot" is the time from reset to the first wake cycle (imports, init), "first_publish" the time
+# from reset to the first publish, when it happens in that first cycle (ticks_ms counts from reset).
+#
+# usage:
+#   profiler.begin_cycle()
+#   profiler.start("connectWifi") ... profiler.stop("connectWifi")
+#   profiler.retry("wifi")
+#   profiler.since_boot("first_publish")
+#   profiler.end_cycle()                # end_cycle(True) if the RAM is lost before the next cycle (deep sleep)
+
+import utime
+import gc
+import struct
+
+PROFILE_FILE = "profile.bin"
+
+# phases of WaterPlantStation.main(); "cycle" is the whole awake time
+PHASES = ("connectWifi", "set_time", "connectMQTT", "subscribe", "sensors",
+          "battery", "pump", "publish", "cycle", "boot", "first_publish")
+RETRIES = ("wifi", "ntp")
+
+EWMA_SHIFT = 3  # EWMA weight 1/8, integer math only
+SAVE_EVERY = 16 # cycles between two writes of the record
+NO_VALUE = 0xFFFFFFFF
+
+# cycles, last reported cycle, heap free before, heap free after, lowest heap free (last cycle, ever), heap size
+# + (last, min, max, ewma) for every phase + (last, total) for every retry counter
+HEADER_FIELDS = 7
+RECORD_FORMAT = "<%dI" % HEADER_FIELDS + "4I" * len(PHASES) + "2I" * len(RETRIES)
+
+_cycles = 0
+_last_report = 0
+_heap_before = 0
+_heap_after = 0
+_heap_min = 0       # lowest free heap of the current/last cycle
+_heap_lowest = 0    # lowest free heap ever (0: none yet)
+_heap_size = 0
+_stats = {}     # phase -> [last, min, max, ewma]
+_retries = {}   # name -> [last, total]
+_saved = 0      # cycles at the last write (or load) of the record
+_reported = False   # a report was made since the last write
+
+_started = {}   # phase -> ticks_ms at start (current cycle)
+_elapsed = {}   # phase -> ms spent in current cycle (phases may run more than once)
+_cycle_retries = {}
+_wakes = 0      # cycles since reset
+
+def _reset_stats():
+    global _cycles, _last_report, _heap_before, _heap_after, _heap_min, _heap_lowest, _heap_size
+    _cycles, _last_report, _heap_before, _heap_after = 0, 0, 0, 0
+    _heap_min, _heap_lowest, _heap_size = 0, 0, 0
+    for phase in PHASES:
+        _stats[phase] = [0, NO_VALUE, 0, 0]
+    for name in RETRIES:
+        _retries[name] = [0, 0]
+
+def load():
+    """Load rolling statistics from flash, start from zero if missing/invalid."""
+    global _cycles, _last_report, _heap_before, _heap_after, _heap_min, _heap_lowest, _heap_size, _saved, _reported
+    _reset_stats()
+    _saved, _reported = 0, False
+    try:
+        with open(PROFILE_FILE, "rb") as f:
+            values = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+
+    _cycles, _last_report, _heap_before, _heap_after, _heap_min, _heap_lowest, _heap_size = values[:HEADER_FIELDS]
+    _saved = _cycles
+    i = HEADER_FIELDS
+    for phase in PHASES:
+        _stats[phase] = list(values[i:i + 4])
+        i += 4
+    for name in RETRIES:
+        _retries[name] = list(values[i:i + 2])
+        i += 2
+
+def save():
+    global _saved, _reported
+    values = [_cycles, _last_report, _heap_before, _heap_after, _heap_min, _heap_lowest, _heap_size]
+    for phase in PHASES:
+        values.extend(_stats[phase])
+    for name in RETRIES:
+        values.extend(_retries[name])
+    with open(PROFILE_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, *values))
+    _saved, _reported = _cycles, False
+
+def begin_cycle():
+    global _heap_before, _heap_min, _heap_size, _wakes
+    _started.clear()
+    _elapsed.clear()
+    _cycle_retries.clear()
+    _heap_before = gc.mem_free()
+    _heap_min = _heap_before
+    _heap_size = _heap_before + gc.mem_alloc()
+    _wakes += 1
+    since_boot("boot")
+    start("cycle")
+
+def start(phase):
+    _started[phase] = utime.ticks_ms()
+
+def stop(phase):
+    started = _started.pop(phase, None)
+    if started is not None:
+        _elapsed[phase] = _elapsed.get(phase, 0) + utime.ticks_diff(utime.ticks_ms(), started)
+    heap_sample()
+
+def heap_sample():
+    """Sample the free heap (lowest of the cycle); called at the end of every phase."""
+    global _heap_min
+    free = gc.mem_free()
+    if free < _heap_min:
+        _heap_min = free
+
+def since_boot(phase):
+    """Record the time since reset as phase, once and only during the first cycle after reset."""
+    if _wakes == 1 and phase not in _elapsed:
+        _elapsed[phase] = utime.ticks_ms()
+
+def retry(name):
+    _cycle_retries[name] = _cycle_retries.get(name, 0) + 1
+
+def end_cycle(persist=False):
+    """Close the current cycle and update rolling statistics; stored on flash every SAVE_EVERY cycles, after a
+    report or with persist (the RAM is lost before the next cycle)."""
+    global _cycles, _heap_after, _heap_lowest
+    stop("cycle")
+    _heap_after = gc.mem_free()
+    if not _heap_lowest or _heap_min < _heap_lowest:
+        _heap_lowest = _heap_min
+    _cycles += 1
+
+    for phase, ms in _elapsed.items():
+        stats = _stats.get(phase)
+        if stats is None:
+            continue
+        last, low, high, ewma = stats
+        if low == NO_VALUE:
+            ewma = ms
+        else:
+            ewma += (ms - ewma) >> EWMA_SHIFT
+        stats[0] = ms
+        stats[1] = min(low, ms)
+        stats[2] = max(high, ms)
+        stats[3] = ewma
+
+    for name in RETRIES:
+        count = _cycle_retries.get(name, 0)
+        _retries[name][0] = count
+        _retries[name][1] += count
+
+    if persist or _reported or _cycles - _saved >= SAVE_EVERY:
+        save()
+
+def last_cycle():
+    """Milliseconds spent in every phase during the current/last cycle."""
+    return dict(_elapsed)
+
+def report_due(every):
+    """True if at least 'every' cycles passed since the last published report."""
+    return _cycles - _last_report >= every
+
+def report():
+    """Return statistics as a dict (ready for json.dumps) and mark them as reported."""
+    global _last_report, _reported
+    _last_report = _cycles
+    _reported = True
+    phases = {}
+    for phase in PHASES:
+        last, low, high, ewma = _stats[phase]
+        if low != NO_VALUE:
+            phases[phase] = {"last": last, "min": low, "max": high, "ewma": ewma}
+    return {
+        "cycles": _cycles,
+        "heap_free_before": _heap_before,
+        "heap_free_after": _heap_after,
+        "heap_min_free": _heap_min,
+        "heap_min_free_ever": _heap_lowest,
+        "heap_peak_alloc": _heap_size - _heap_min,
+        "phases_ms": phases,
+        "retries": {name: {"last": v[0], "total": v[1]} for name, v in _retries.items()}
+    }
@@ -0,0 +1,107 @@
+# Non-blocking pump controller for the watering station (uasyncio task + machine.Timer safety stop)
+# Irrigation is split in pulses with soak pauses in between, so the water has time to reach the soil sensor:
+#   pulse -> soak -> pulse -> soak ... (pulses of duration/pulses ms)
+# Moisture is checked during pulses and after every soak: irrigation stops as soon as it reaches the target.
+# Every pulse arms a one-shot machine.Timer that switches the relay off by itself, so the pump never runs
+# longer than the pulse (and the total never exceeds max_on_ms) even if the task is late or the cycle crashes.
+# While the pump runs the other tasks of the wake cycle (MQTT, uploads) keep running.
+#
+# usage:
+#   run_ms = await pump.irrigate(relay, read_moisture, 5000, pulses=2, soak_ms=20000, target=40, max_on_ms=30000)
+#   run_ms = pump.run_time_ms()     # actual time the relay was on during the last irrigation
+
+import utime
+import uasyncio as asyncio
+from machine import Timer
+
+CHECK_MS = 500          # moisture check period while a pulse is running
+SAFETY_MARGIN_MS = 200  # the safety timer fires this late after the planned end of a pulse
+
+_relay = None
+_timer = None
+_on_since = None
+_run_ms = 0
+_running = False
+
+def _relay_on():
+    global _on_since
+    _on_since = utime.ticks_ms()
+    _relay.value(1)
+
+def _relay_off():
+    # no-op on the run time if the safety timer already switched the relay off (and counted it)
+    global _on_since, _run_ms
+    _relay.value(0)
+    if _on_since is not None:
+        _run_ms += utime.ticks_diff(utime.ticks_ms(), _on_since)
+        _on_since = None
+
+def _safety_stop(timer):
+    # timer callback: switch the relay off and count the run time now, the task notices it at its next check
+    # (a blocked event loop must not count as pump time)
+    _relay_off()
+
+def running():
+    return _running
+
+def run_time_ms():
+    """Time the relay was on during the last (or current) irrigation."""
+    if _on_since is not None:
+        return _run_ms + utime.ticks_diff(utime.ticks_ms(), _on_since)
+    return _run_ms
+
+def stop():
+    """Switch the pump off now (also from another task)."""
+    global _running
+    if _relay is not None:
+        _relay_off()
+    if _timer is not None:
+        _timer.deinit()
+    _running = False
+
+async def _pulse(pulse_ms, read_moisture, target):
+    _relay_on()
+    _timer.init(mode=Timer.ONE_SHOT, period=pulse_ms + SAFETY_MARGIN_MS, callback=_safety_stop)
+    started = utime.ticks_ms()
+    try:
+        while _running and _relay.value():
+            left = pulse_ms - utime.ticks_diff(utime.ticks_ms(), started)
+            if left <= 0:
+                break
+            await asyncio.sleep_ms(min(left, CHECK_MS))
+            if target is not None and read_moisture() >= target:
+                return True
+    finally:
+        _relay_off()
+        _timer.deinit()
+    return False
+
+async def irrigate(relay, read_moisture, duration_ms, pulses=1, soak_ms=0, target=None, max_on_ms=60000):
+    """Run the pump for duration_ms split in 'pulses', stop early when read_moisture() >= target.
+
+    Returns the actual on time in ms (never more than max_on_ms).
+    """
+    global _relay, _timer, _run_ms, _running
+    _relay = relay
+    if _timer is None:
+        _timer = Timer()
+    _run_ms = 0
+    _running = True
+
+    duration_ms = min(duration_ms, max_on_ms)
+    pulses = max(1, pulses)
+    pulse_ms = duration_ms // pulses
+    try:
+        for i in range(pulses):
+            pulse_ms = min(pulse_ms, max_on_ms - _run_ms)
+            if not _running or pulse_ms <= 0:
+                break
+            if await _pulse(pulse_ms, read_moisture, target):
+                break
+            if i < pulses - 1 and soak_ms:
+                await asyncio.sleep_ms(soak_ms)
+                if target is not None and read_moisture() >= target:
+                    break
+    finally:
+        stop()
+    return _run_ms
@@ -0,0 +1,110 @@
+# Offline measurement ring buffer for Raspberry Pi Pico (stored on flash)
+# Every wake cycle appends one reading; the radio is brought up only every N cycles (or on alarm)
+# and the whole backlog is replayed oldest first in a single MQTT session.
+#
+# The file has a fixed size and is written in place, so it never grows and survives reset():
+#   header  -> magic, capacity, head (next slot to write), count (readings waiting for upload)
+#   records -> 'capacity' slots of RECORD_FORMAT
+# The header is rewritten after the record: a power cut in between loses only the last reading.
+# When the buffer is full the oldest reading is overwritten.
+
+import struct
+
+RING_FILE = "readings.bin"
+CAPACITY = 48  # two days of hourly readings
+
+MAGIC = b"RBF3"   # bumped when RECORD_FORMAT changes: older buffers are recreated
+HEADER_FORMAT = "<4sHHH"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# epoch (UTC seconds), temperature x10, humidity x10, soil moisture x10, battery mV, flags,
+# interval chosen for the next sleep (seconds), soil moisture x10 of the zones 2..4 (NO_READING if not used)
+RECORD_FORMAT = "<IhhhHBH3h"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+FLAG_IRRIGATED = 0x01
+FLAG_TIME_STALE = 0x02  # RTC not synced (NTP unreachable) when the reading was taken
+FLAG_ZONE_IRRIGATED = 0x04  # zone 2 irrigated, zone 3 -> 0x08, zone 4 -> 0x10 (see zone_flag())
+FLAG_CLIMATE_STALE = 0x20  # DHT22 not answering: temperature/humidity are the last good values
+
+ZONE_SLOTS = 3
+NO_READING = -32768
+
+_capacity = CAPACITY
+_head = 0
+_count = 0
+
+def _header():
+    return struct.pack(HEADER_FORMAT, MAGIC, _capacity, _head, _count)
+
+def open_buffer(capacity=CAPACITY):
+    """Load ring buffer state from flash, create an empty buffer if missing/invalid."""
+    global _capacity, _head, _count
+    try:
+        with open(RING_FILE, "rb") as f:
+            magic, cap, head, count = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+        if magic == MAGIC and cap == capacity and head < cap and count <= cap:
+            _capacity, _head, _count = cap, head, count
+            return
+    except (OSError, ValueError):
+        pass
+
+    # missing, corrupted or resized buffer -> start from scratch
+    _capacity, _head, _count = capacity, 0, 0
+    with open(RING_FILE, "wb") as f:
+        f.write(_header())
+        f.write(bytes(RECORD_SIZE * capacity))
+
+def pending():
+    """Number of readings waiting for upload."""
+    return _count
+
+def zone_flag(number):
+    """Irrigated flag of zone number (2..4)."""
+    return FLAG_ZONE_IRRIGATED << (number - 2)
+
+def append(epoch, temp, hum, moisture, battery_level, flags=0, interval=0, zones=()):
+    """Store one reading (zones: soil moisture of the zones 2..4 by number, None if not used, see zones.slots());
+    overwrite the oldest one if the buffer is full."""
+    global _head, _count
+    slots = [NO_READING if m is None else round(m * 10) for m in zones[:ZONE_SLOTS]]
+    slots += [NO_READING] * (ZONE_SLOTS - len(slots))
+    record = struct.pack(RECORD_FORMAT, epoch, round(temp * 10), round(hum * 10),
+                         round(moisture * 10), round(battery_level * 1000), flags, min(interval, 65535), *slots)
+
+    with open(RING_FILE, "r+b") as f:
+        f.seek(HEADER_SIZE + _head * RECORD_SIZE)
+        f.write(record)
+
+        _head = (_head + 1) % _capacity
+        if _count < _capacity:
+            _count += 1
+
+        f.seek(0)
+        f.write(_header())
+
+def records():
+    """Yield buffered readings oldest first as (epoch, temp, hum, moisture, battery_level, flags, interval, zones).
+    zones: moisture of the zones 2.. by number up to the last one used (None: not used), () for a single zone."""
+    index = (_head - _count) % _capacity
+    with open(RING_FILE, "rb") as f:
+        for _ in range(_count):
+            f.seek(HEADER_SIZE + index * RECORD_SIZE)
+            record = struct.unpack(RECORD_FORMAT, f.read(RECORD_SIZE))
+            epoch, temp, hum, moisture, battery, flags, interval = record[:7]
+            zones = _zones(record[7:])
+            yield epoch, temp / 10, hum / 10, moisture / 10, battery / 1000, flags, interval, zones
+            index = (index + 1) % _capacity
+
+def _zones(slots):
+    used = len(slots)
+    while used and slots[used - 1] == NO_READING:
+        used -= 1
+    return tuple(None if m == NO_READING else m / 10 for m in slots[:used])
+
+def clear():
+    """Mark every buffered reading as uploaded."""
+    global _count
+    _count = 0
+    with open(RING_FILE, "r+b") as f:
+        f.write(_header())
@@ -0,0 +1,63 @@
+# Burst ADC sampling with robust filtering (soil moisture and battery channels)
+# Takes a fast burst of read_u16() samples into a preallocated array('H') (no list, no floats) and returns
+# median, trimmed mean (interquartile mean by default) and spread (interquartile range), all integer math.
+# A burst of 16 samples spaced 100us apart keeps the CPU awake for ~2ms instead of seconds of sleep() calls.
+#
+# usage:
+#   median, mean, spread = sampling.read(ADC(Pin(28)), samples=16, spacing_us=100)
+
+from array import array
+import utime
+
+DEFAULT_SAMPLES = 16
+DEFAULT_SPACING_US = 100
+
+_buffers = {}   # samples -> preallocated array('H'), reused on every call
+
+def _buffer(samples):
+    buf = _buffers.get(samples)
+    if buf is None:
+        buf = array('H', bytes(2 * samples))
+        _buffers[samples] = buf
+    return buf
+
+def burst(adc, samples=DEFAULT_SAMPLES, spacing_us=DEFAULT_SPACING_US):
+    """Fill and return the preallocated buffer with 'samples' raw readings."""
+    buf = _buffer(samples)
+    for i in range(samples):
+        buf[i] = adc.read_u16()
+        if spacing_us:
+            utime.sleep_us(spacing_us)
+    return buf
+
+def _sort(buf):
+    # insertion sort in place: buffers are small and nearly sorted (noise around one value)
+    for i in range(1, len(buf)):
+        value = buf[i]
+        j = i - 1
+        while j >= 0 and buf[j] > value:
+            buf[j + 1] = buf[j]
+            j -= 1
+        buf[j + 1] = value
+
+def filtered(buf, trim=None):
+    """Sort buf in place and return (median, trimmed mean, spread) as integers.
+
+    trim samples are dropped at both ends for the mean (default: a quarter), spread is the interquartile range.
+    """
+    n = len(buf)
+    _sort(buf)
+    if trim is None:
+        trim = n // 4
+    trim = min(trim, (n - 1) // 2)
+    median = buf[n // 2] if n & 1 else (buf[n // 2 - 1] + buf[n // 2]) // 2
+    total = 0
+    for i in range(trim, n - trim):
+        total += buf[i]
+    mean = total // (n - 2 * trim)
+    spread = buf[(3 * n) // 4] - buf[n // 4] if n > 1 else 0
+    return median, mean, spread
+
+def read(adc, samples=DEFAULT_SAMPLES, spacing_us=DEFAULT_SPACING_US, trim=None):
+    """Burst-sample an ADC channel and return (median, trimmed mean, spread) of the raw values."""
+    return filtered(burst(adc, samples, spacing_us), trim)
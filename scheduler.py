@@ -0,0 +1,117 @@
+# Adaptive measurement interval for the watering station
+# Keeps the last moisture readings on flash, estimates the drying rate (least squares slope, %/hour)
+# and predicts when MOISTURE_LIMIT will be crossed. The next sleep is a fraction of that time,
+# bounded by min/max and stretched as the battery state of charge (battery.py) drops:
+#   - soil drying fast / close to the limit -> short interval
+#   - soil soaked or not drying             -> max interval
+#   - not enough history (boot, after irrigation) -> default interval
+#
+# usage:
+#   scheduler.load()
+#   scheduler.add_reading(epoch, moisture, irrigated)
+#   interval = scheduler.next_interval(limit, soc, default, minimum, maximum, soc_low)
+#   scheduler.save()        # once per cycle (writes only if a reading was added)
+
+import struct
+
+SCHEDULE_FILE = "schedule.bin"
+
+HISTORY = 8             # readings used for the drying rate
+MIN_READINGS = 3        # readings needed before trusting the estimate
+SAFETY = 0.5            # wake after this fraction of the predicted time to the limit
+MAX_STRETCH = 3.0       # interval multiplier with an empty battery
+STRETCH_BELOW_SOC = 60  # state of charge (%) where the stretch starts
+
+# count, then HISTORY x (epoch, moisture x10)
+RECORD_FORMAT = "<B" + "Ih" * HISTORY
+
+_history = []   # (epoch, moisture) oldest first
+_rate = None    # %/hour, positive when drying
+_interval = 0
+_dirty = False
+
+def load():
+    global _history, _dirty
+    _history, _dirty = [], False
+    try:
+        with open(SCHEDULE_FILE, "rb") as f:
+            values = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+    for i in range(min(values[0], HISTORY)):
+        _history.append((values[1 + 2 * i], values[2 + 2 * i] / 10))
+
+def save():
+    global _dirty
+    if not _dirty:
+        return
+    values = [len(_history)]
+    for epoch, moisture in _history:
+        values.append(epoch)
+        values.append(round(moisture * 10))
+    for _ in range(HISTORY - len(_history)):
+        values.append(0)
+        values.append(0)
+    with open(SCHEDULE_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, *values))
+    _dirty = False
+
+def add_reading(epoch, moisture, irrigated=False):
+    """Add a reading to the history; irrigation restarts it (the soil trend changed)."""
+    global _history, _dirty
+    if irrigated:
+        _history = []
+    _history.append((epoch, moisture))
+    if len(_history) > HISTORY:
+        _history.pop(0)
+    _dirty = True
+
+def drying_rate():
+    """Moisture lost per hour (least squares slope), None without enough history."""
+    n = len(_history)
+    if n < MIN_READINGS:
+        return None
+    t0 = _history[0][0]
+    mean_t = sum(epoch - t0 for epoch, _ in _history) / n
+    mean_m = sum(moisture for _, moisture in _history) / n
+    num = 0
+    den = 0
+    for epoch, moisture in _history:
+        dt = epoch - t0 - mean_t
+        num += dt * (moisture - mean_m)
+        den += dt * dt
+    if den == 0:
+        return None
+    return -num / den * 3600
+
+def battery_stretch(soc, soc_low):
+    """1 above STRETCH_BELOW_SOC, up to MAX_STRETCH at (or below) soc_low (state of charge, %)."""
+    if soc >= STRETCH_BELOW_SOC:
+        return 1.0
+    if soc <= soc_low:
+        return MAX_STRETCH
+    return 1 + (MAX_STRETCH - 1) * (STRETCH_BELOW_SOC - soc) / (STRETCH_BELOW_SOC - soc_low)
+
+def next_interval(limit, soc, default, minimum, maximum, soc_low):
+    """Choose the next sleep length in seconds."""
+    global _rate, _interval
+    _rate = drying_rate()
+    moisture = _history[-1][1] if _history else None
+
+    if _rate is None or moisture is None:
+        interval = default
+    elif moisture <= limit:
+        interval = minimum
+    elif _rate <= 0:
+        interval = maximum
+    else:
+        hours_to_limit = (moisture - limit) / _rate
+        interval = hours_to_limit * 3600 * SAFETY
+
+    interval *= battery_stretch(soc, soc_low)
+    _interval = int(min(maximum, max(minimum, interval)))
+    return _interval
+
+def interval():
+    """Last interval chosen by next_interval()."""
+    return _interval
@@ -0,0 +1,180 @@
+# Settings store for Raspberry Pi Pico: schema with defaults, CRC protected binary record, atomic updates
+# - every setting has a type, a default and a valid range (numbers) or a tuple of allowed values (strings):
+#   set() validates values received via MQTT
+# - values are kept in RAM and marked dirty only when they actually change; commit() writes them at most
+#   once per cycle (less flash wear)
+# - the record is written to a temporary file and then renamed over the old one, so a power cut during
+#   a write leaves the previous settings intact; a bad CRC falls back to defaults
+# - settings.txt (JSON, older firmware) is migrated on first boot (json is imported only for it)
+#
+# record: magic (4s), number of entries (H), entries, crc32 of everything before it (I)
+# entry:  name length (B), name, type (1 char), value -> unknown names are skipped, so the schema can grow
+#
+# usage:
+#   settingsstore.load(SCHEMA)
+#   settingsstore.values["MOISTURE_LIMIT"]
+#   settingsstore.set("MOISTURE_LIMIT", 20)
+#   settingsstore.commit()
+
+import struct
+import binascii
+import os
+
+SETTINGS_FILE = "settings.bin"
+LEGACY_FILE = "settings.txt"
+
+MAGIC = b"STG1"
+
+# type -> struct format of the value ('s' strings are stored with a 1 byte length)
+FORMATS = {"i": "<i", "f": "<f", "?": "<?"}
+
+values = {}     # current settings (read only for callers, use set() to change them)
+_schema = {}    # name -> (type, default, low, high)
+_dirty = False
+
+def atomic_write(path, data):
+    """Write data to path through a temporary file + rename (old content survives a power cut)."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # filesystems that cannot rename over an existing file
+        os.remove(path)
+        os.rename(tmp, path)
+
+def _encode():
+    body = bytearray(MAGIC)
+    body += struct.pack("<H", len(_schema))
+    for name, (kind, default, low, high) in _schema.items():
+        value = values[name]
+        body += struct.pack("<B", len(name)) + name.encode() + kind.encode()
+        if kind == "s":
+            data = value.encode()
+            body += struct.pack("<B", len(data)) + data
+        else:
+            body += struct.pack(FORMATS[kind], value)
+    body += struct.pack("<I", binascii.crc32(body) & 0xFFFFFFFF)
+    return body
+
+def _decode(data):
+    """Return {name: value} from a record, raise ValueError if it is corrupted."""
+    if len(data) < 10 or data[:4] != MAGIC:
+        raise ValueError("bad settings record")
+    crc = struct.unpack("<I", data[-4:])[0]
+    if binascii.crc32(data[:-4]) & 0xFFFFFFFF != crc:
+        raise ValueError("settings crc mismatch")
+
+    decoded = {}
+    count = struct.unpack("<H", data[4:6])[0]
+    pos = 6
+    for _ in range(count):
+        size = data[pos]
+        name = bytes(data[pos + 1:pos + 1 + size]).decode()
+        kind = chr(data[pos + 1 + size])
+        pos += 2 + size
+        if kind == "s":
+            size = data[pos]
+            value = bytes(data[pos + 1:pos + 1 + size]).decode()
+            pos += 1 + size
+        else:
+            fmt = FORMATS[kind]
+            value = struct.unpack(fmt, data[pos:pos + struct.calcsize(fmt)])[0]
+            pos += struct.calcsize(fmt)
+        decoded[name] = value
+    return decoded
+
+def parse_bool(value):
+    """bool from a setting/command value: "1", "true", "on", "yes" (any case) are True, "false", "0", "" False."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "on", "yes")
+    return bool(value)
+
+def _convert(name, value):
+    kind, default, low, high = _schema[name]
+    if kind == "i":
+        value = int(value)
+    elif kind == "f":
+        value = round(float(value), 4)  # stored as float32
+    elif kind == "?":
+        value = parse_bool(value)
+    else:
+        value = str(value)
+        if len(value.encode()) > 255:
+            raise ValueError("%s: too long" % name)
+        if low is not None and value not in low:
+            raise ValueError("%s: %s not in %s" % (name, value, low))
+        return value
+    if low is not None and value < low:
+        raise ValueError("%s: %s below %s" % (name, value, low))
+    if high is not None and value > high:
+        raise ValueError("%s: %s above %s" % (name, value, high))
+    return value
+
+def load(schema):
+    """Setup the schema [(name, type, default, low, high)...] and load stored values over the defaults."""
+    global _dirty
+    _schema.clear()
+    values.clear()
+    for name, kind, default, low, high in schema:
+        _schema[name] = (kind, default, low, high)
+        values[name] = default
+    _dirty = False
+
+    try:
+        with open(SETTINGS_FILE, "rb") as f:
+            stored = _decode(f.read())
+    except OSError:
+        _migrate()
+        return
+    except (ValueError, KeyError, IndexError) as e:
+        print("settings corrupted, using defaults:", e)
+        _dirty = True
+        return
+
+    for name, value in stored.items():
+        if name in _schema:
+            try:
+                values[name] = _convert(name, value)
+            except ValueError:
+                _dirty = True
+
+def _migrate():
+    # first boot with this firmware: import settings.txt if present, write the binary record anyway
+    global _dirty
+    _dirty = True
+    import json
+    try:
+        with open(LEGACY_FILE, "r") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError):
+        return
+    for name, value in legacy.items():
+        if name in _schema:
+            try:
+                values[name] = _convert(name, value)
+            except (ValueError, TypeError):
+                pass
+
+def set(name, value):
+    """Validate and change a setting; returns True if the value changed. Raises ValueError if invalid."""
+    global _dirty
+    value = _convert(name, value)
+    if values[name] == value:
+        return False
+    values[name] = value
+    _dirty = True
+    return True
+
+def dirty():
+    return _dirty
+
+def commit():
+    """Write settings to flash if something changed since the last commit."""
+    global _dirty
+    if not _dirty:
+        return False
+    atomic_write(SETTINGS_FILE, _encode())
+    _dirty = False
+    return True
@@ -0,0 +1,106 @@
+# Drift-aware NTP time sync for Raspberry Pi Pico
+# Instead of a NTP request on every wake cycle, the time of the last sync is stored on flash and the RTC drift
+# is estimated from successive syncs (RTC time just before the sync vs NTP time).
+# A new sync is needed only when the estimated RTC error exceeds the error budget (or the clock is not valid).
+#
+# If the NTP server does not answer, the RTC keeps being used and the time is flagged as stale,
+# instead of raising an error (and rebooting the station).
+# ntptime is imported only when a sync is needed.
+
+import struct
+import utime
+
+TIMESYNC_FILE = "timesync.bin"
+
+NTP_HOST = "pool.ntp.org"
+NTP_TIMEOUT = 1             # seconds
+
+DEFAULT_DRIFT_PPM = 50      # assumed drift until two syncs are available (RP2040 RTC from 12MHz crystal)
+SYNC_RESOLUTION = 1         # ntptime sets the RTC with 1 second resolution
+MIN_DRIFT_INTERVAL = 3600   # shorter intervals give a too noisy drift estimate
+MAX_SYNC_AGE = 86400        # sync at least once a day anyway
+DRIFT_WEIGHT = 4            # new drift estimates are averaged with weight 1/4
+
+# last sync (epoch), drift (ppm x1000), number of syncs
+RECORD_FORMAT = "<IiH"
+
+_last_sync = 0
+_drift_ppb = DEFAULT_DRIFT_PPM * 1000
+_syncs = 0
+_stale = False
+
+# RTC starts from 2021-01-01 after a power loss: readings need a NTP synced clock
+def clock_valid():
+    return utime.localtime()[0] >= 2024
+
+def load():
+    """Load last sync time and drift estimate from flash."""
+    global _last_sync, _drift_ppb, _syncs
+    try:
+        with open(TIMESYNC_FILE, "rb") as f:
+            _last_sync, _drift_ppb, _syncs = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        _last_sync, _drift_ppb, _syncs = 0, DEFAULT_DRIFT_PPM * 1000, 0
+
+def save():
+    with open(TIMESYNC_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, _last_sync, _drift_ppb, _syncs))
+
+def drift_ppm():
+    return _drift_ppb / 1000
+
+def drift_measured():
+    """True once the drift comes from two syncs (not the DEFAULT_DRIFT_PPM guess)."""
+    return _syncs >= 2
+
+def estimated_error(now=None):
+    """Estimated RTC error in seconds since the last sync (None if the clock was never synced)."""
+    if not _syncs or not clock_valid():
+        return None
+    if now is None:
+        now = utime.time()
+    elapsed = max(0, now - _last_sync)
+    return abs(_drift_ppb) * elapsed // 1000000000 + SYNC_RESOLUTION
+
+def sync_needed(budget):
+    """True if the estimated RTC error exceeds 'budget' seconds."""
+    error = estimated_error()
+    if error is None:
+        return True
+    return error > budget or utime.time() - _last_sync > MAX_SYNC_AGE
+
+def sync():
+    """Set the RTC from NTP and update the drift estimate; on failure keep the RTC and flag time as stale."""
+    global _last_sync, _drift_ppb, _syncs, _stale
+    valid = clock_valid() and _syncs > 0
+    before = utime.time()
+
+    import ntptime
+    ntptime.host = NTP_HOST
+    ntptime.timeout = NTP_TIMEOUT
+    try:
+        ntptime.settime()  # Sets UTC
+    except Exception as e:
+        print("NTP sync failed, using RTC:", e)
+        _stale = True
+        return False
+
+    now = utime.time()
+    elapsed = now - _last_sync
+    if valid and elapsed >= MIN_DRIFT_INTERVAL:
+        # positive drift: RTC runs fast
+        measured = (before - now) * 1000000000 // elapsed
+        if _syncs < 2:
+            _drift_ppb = measured
+        else:
+            _drift_ppb += (measured - _drift_ppb) // DRIFT_WEIGHT
+
+    _last_sync = now
+    _syncs += 1
+    _stale = False
+    save()
+    return True
+
+def is_stale():
+    """True if the RTC is used without a valid/recent sync (last sync failed or never synced)."""
+    return _stale or not clock_valid()
@@ -0,0 +1,90 @@
+# Timezone support with precomputed DST transitions (shared by WaterPlantStation and myntptime)
+# The UTC epochs of the DST start/end of the current year are computed once and cached:
+# converting utime.time() to local time is then a single comparison, also exactly at the transition boundaries.
+#
+# A zone is (standard offset, DST offset, DST start rule, DST end rule), offsets in seconds.
+# A rule is (month, week, weekday, time): week 1..4 is the n-th weekday of the month, -1 the last one,
+# weekday 0 = Monday ... 6 = Sunday, time is seconds after 00:00 UTC of that day.
+# Zones with DST start after DST end (southern hemisphere) are supported.
+
+import utime
+
+ZONES = {
+    "UTC": (0, 0, None, None),
+    # EU: last Sunday of March 01:00 UTC -> last Sunday of October 01:00 UTC
+    "WET": (0, 3600, (3, -1, 6, 3600), (10, -1, 6, 3600)),
+    "CET": (3600, 3600, (3, -1, 6, 3600), (10, -1, 6, 3600)),
+    "EET": (7200, 3600, (3, -1, 6, 3600), (10, -1, 6, 3600)),
+    # US: second Sunday of March 02:00 local -> first Sunday of November 02:00 local
+    "US_EASTERN": (-18000, 3600, (3, 2, 6, 25200), (11, 1, 6, 21600)),
+    "US_PACIFIC": (-28800, 3600, (3, 2, 6, 36000), (11, 1, 6, 32400)),
+    # Australia (NSW/VIC): first Sunday of October 02:00 AEST -> first Sunday of April 03:00 AEDT
+    "AUS_EASTERN": (36000, 3600, (10, 1, 6, -28800), (4, 1, 6, -28800)),
+}
+
+ZONE = "CET"
+
+_zone = ZONES[ZONE]
+_year_start = 0     # cached transitions are valid for [_year_start, _year_end)
+_year_end = 0
+_dst_start = 0
+_dst_end = 0
+
+def set_zone(name):
+    """Select a zone of ZONES (e.g. "CET"); raises ValueError for unknown zones."""
+    global ZONE, _zone, _year_end
+    if name not in ZONES:
+        raise ValueError("unknown timezone: %s" % name)
+    ZONE = name
+    _zone = ZONES[name]
+    _year_end = 0  # recompute transitions on next call
+
+def _rule_epoch(year, rule):
+    """UTC epoch of a DST transition rule in the given year."""
+    month, week, weekday, seconds = rule
+    first = utime.mktime((year, month, 1, 0, 0, 0, 0, 0))
+    if week > 0:
+        first_weekday = utime.localtime(first)[6]
+        day = 1 + (weekday - first_weekday) % 7 + 7 * (week - 1)
+    else:
+        if month == 12:
+            next_month = utime.mktime((year + 1, 1, 1, 0, 0, 0, 0, 0))
+        else:
+            next_month = utime.mktime((year, month + 1, 1, 0, 0, 0, 0, 0))
+        last = utime.localtime(next_month - 86400)
+        day = last[2] - (last[6] - weekday) % 7
+    return first + (day - 1) * 86400 + seconds
+
+def _compute(now):
+    global _year_start, _year_end, _dst_start, _dst_end
+    year = utime.localtime(now)[0]
+    _year_start = utime.mktime((year, 1, 1, 0, 0, 0, 0, 0))
+    _year_end = utime.mktime((year + 1, 1, 1, 0, 0, 0, 0, 0))
+    if _zone[2] is None:
+        _dst_start = _dst_end = 0
+    else:
+        _dst_start = _rule_epoch(year, _zone[2])
+        _dst_end = _rule_epoch(year, _zone[3])
+
+def is_dst(now=None):
+    if now is None:
+        now = utime.time()
+    if not _year_start <= now < _year_end:
+        _compute(now)
+    if _dst_start <= _dst_end:
+        return _dst_start <= now < _dst_end
+    return now >= _dst_start or now < _dst_end  # southern hemisphere
+
+def utc_offset(now=None):
+    """Offset of local time from UTC in seconds."""
+    if now is None:
+        now = utime.time()
+    if is_dst(now):
+        return _zone[0] + _zone[1]
+    return _zone[0]
+
+def localtime(now=None):
+    """Local time tuple (like utime.localtime) for the given UTC epoch (default: now)."""
+    if now is None:
+        now = utime.time()
+    return utime.localtime(now + utc_offset(now))
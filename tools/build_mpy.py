@@ -0,0 +1,92 @@
+# Precompiled build (CPython) of WaterPlantStation for the Pico W
+# Compiles the station and every module of the repository it imports (also the imports inside functions)
+# into .mpy files with mpy-cross, so the board loads bytecode instead of compiling the sources after every reset
+# (faster boot and no compiler heap peak). main.py is a two-line stub that calls WaterPlantStation.run().
+# secrets.py is copied as source: credentials can be edited on the board without a new build.
+#
+# Needs mpy-cross with the same bytecode version as the firmware (pip install mpy-cross, or the binary built
+# from the MicroPython sources). Remove the old .py copies of the modules from the board: a .py file is found
+# before the .mpy of the same name.
+#
+# usage:
+#   python tools/build_mpy.py                 (build/ : *.mpy, main.py, secrets.py)
+#   python tools/build_mpy.py --out dist --mpy-cross ~/micropython/mpy-cross/build/mpy-cross
+#   mpremote cp -r build/* :
+
+import argparse
+import ast
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY = "WaterPlantStation"
+SOURCE_ONLY = ("secrets",)
+MAIN_STUB = "import %s\n%s.run()\n" % (ENTRY, ENTRY)
+
+def imported_names(path):
+    """Top level module names imported anywhere in a source file."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return names
+
+def modules(entry=ENTRY):
+    """Modules of the repository needed by entry (entry included), in import order of discovery."""
+    found = []
+    pending = [entry]
+    while pending:
+        name = pending.pop(0)
+        if name in found or not os.path.exists(os.path.join(ROOT, name + ".py")):
+            continue
+        found.append(name)
+        pending.extend(sorted(imported_names(os.path.join(ROOT, name + ".py"))))
+    return found
+
+def mpy_cross_command(path):
+    if path:
+        return [path]
+    if shutil.which("mpy-cross"):
+        return ["mpy-cross"]
+    if importlib.util.find_spec("mpy_cross") is None:    # pip install mpy-cross
+        raise SystemExit("mpy-cross not found: pip install mpy-cross or pass --mpy-cross <path>")
+    return [sys.executable, "-m", "mpy_cross"]
+
+def build(out, command, optimize):
+    os.makedirs(out, exist_ok=True)
+    total_py = total_mpy = 0
+    for name in modules():
+        source = os.path.join(ROOT, name + ".py")
+        if name in SOURCE_ONLY:
+            shutil.copy(source, out)
+            continue
+        target = os.path.join(out, name + ".mpy")
+        subprocess.run(command + ["-O%d" % optimize, "-s", name + ".py", "-o", target, source], check=True)
+        total_py += os.path.getsize(source)
+        total_mpy += os.path.getsize(target)
+        print("%-20s %6d -> %6d bytes" % (name, os.path.getsize(source), os.path.getsize(target)))
+    with open(os.path.join(out, "main.py"), "w") as f:
+        f.write(MAIN_STUB)
+    print("total %d -> %d bytes in %s" % (total_py, total_mpy, out))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the station as precompiled .mpy modules")
+    parser.add_argument("--out", default=os.path.join(ROOT, "build"))
+    parser.add_argument("--mpy-cross", help="path of the mpy-cross binary")
+    parser.add_argument("-O", dest="optimize", type=int, default=1, help="mpy-cross optimisation level (0..3)")
+    parser.add_argument("--list", action="store_true", help="only print the modules that would be built")
+    args = parser.parse_args()
+    if args.list:
+        print("\n".join(modules()))
+        return
+    build(args.out, mpy_cross_command(args.mpy_cross), args.optimize)
+
+if __name__ == "__main__":
+    main()
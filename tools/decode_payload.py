@@ -0,0 +1,156 @@
+# Reference decoder (CPython) for the binary readings published by WaterPlantStation on picoW/sensor/bin
+# The format is described in payload.py. decode() returns the same keys as the JSON message on picoW/sensor
+# (times as ISO strings in UTC), so a dashboard can handle both topics with the same code.
+#
+# usage:
+#   python tools/decode_payload.py 0102...        (hex payload, prints JSON)
+#   python tools/decode_payload.py --self-test    (round trip check against payload.py)
+
+import datetime
+import json
+import struct
+import sys
+
+FORMATS = {1: "<BBIhHhHBIHIBI", 2: "<BBIhHhHBIHIBI"}   # version 2: + zone count (B) and count * ZONE_FORMAT
+ZONE_FORMAT = "<hB"
+NO_ZONE = -32768            # zone slot not used (zone disabled or beyond ZONE_COUNT)
+
+FLAG_IRRIGATED = 0x01
+FLAG_TIME_STALE = 0x02
+FLAG_ZONE_IRRIGATED = 0x04  # zone 2, zone 3 -> 0x08, zone 4 -> 0x10
+FLAG_CLIMATE_STALE = 0x20   # temperature/humidity are the last good values (DHT22 not answering)
+
+def iso(epoch):
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def decode(data):
+    """Decode one binary reading into a dict, raise ValueError for unknown versions or bad lengths."""
+    if not data:
+        raise ValueError("empty payload")
+    fmt = FORMATS.get(data[0])
+    if fmt is None:
+        raise ValueError("unsupported payload version %d" % data[0])
+    size = struct.calcsize(fmt)
+    zone_size = struct.calcsize(ZONE_FORMAT)
+    if data[0] == 2:
+        size += 1 + (data[size] * zone_size if len(data) > size else 0)
+    if len(data) != size:
+        raise ValueError("payload version %d must be %d bytes, got %d" % (data[0], size, len(data)))
+
+    (version, flags, epoch, temp, hum, moisture, battery_mv, limit, last_irrigation, run_ds,
+     interval, pump_for, next_interval) = struct.unpack_from(fmt, data)
+    reading = {
+        "version": version,
+        "temperature": temp / 10,
+        "humidity": hum / 10,
+        "soil_moisture": moisture / 10,
+        "soil_moisture_limit": limit,
+        "irrigation_time": iso(last_irrigation) if last_irrigation else 0,
+        "irrigation_run_ms": run_ds * 100,
+        "timeOfmisuration": iso(epoch),
+        "misuration_interval": interval,
+        "activate_pump_for": pump_for,
+        "battery_level": battery_mv / 1000,
+        "time_stale": bool(flags & FLAG_TIME_STALE),
+        "climate_stale": bool(flags & FLAG_CLIMATE_STALE),
+        "irrigated": bool(flags & FLAG_IRRIGATED),
+        "next_interval": next_interval,
+    }
+    if version == 2:
+        offset = struct.calcsize(fmt) + 1
+        reading["zones"] = []
+        for i in range(data[offset - 1]):
+            zone_moisture, zone_limit = struct.unpack_from(ZONE_FORMAT, data, offset)
+            offset += zone_size
+            if zone_moisture == NO_ZONE:
+                continue
+            reading["zones"].append({"zone": i + 2, "soil_moisture": zone_moisture / 10,
+                                     "soil_moisture_limit": zone_limit,
+                                     "irrigated": bool(flags & (FLAG_ZONE_IRRIGATED << i))})
+    return reading
+
+def self_test(cases=2000):
+    """Encode random readings with payload.py and check that they decode to the same values."""
+    import os
+    import random
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    import payload
+
+    assert FORMATS[payload.VERSION] == payload.FORMAT, "decoder out of date with payload.py"
+    assert ZONE_FORMAT == payload.ZONE_FORMAT and NO_ZONE == payload.NO_ZONE, "decoder out of date with payload.py"
+    rng = random.Random(1)
+    for _ in range(cases):
+        reading = {
+            "epoch": rng.randrange(1704067200, 2000000000),
+            "temp": round(rng.uniform(-40, 80), 1),
+            "hum": round(rng.uniform(0, 100), 1),
+            "moisture": round(rng.uniform(0, 100), 1),
+            "battery_level": round(rng.uniform(2.5, 4.3), 3),
+            "flags": rng.randrange(64),
+            "next_interval": rng.randrange(60, 86401),
+            "moisture_limit": rng.randrange(101),
+            "last_irrigation": rng.choice((0, rng.randrange(1704067200, 2000000000))),
+            "run_ms": rng.randrange(0, 300001, 100),
+            "misuration_interval": rng.randrange(60, 86401),
+            "pump_for": rng.randrange(1, 121),
+            "zones": tuple((rng.choice((None, round(rng.uniform(0, 100), 1))), rng.randrange(101))
+                           for _ in range(rng.randrange(4))),
+        }
+        decoded = decode(bytes(payload.encode(**reading)))
+        assert decoded["timeOfmisuration"] == iso(reading["epoch"])
+        assert abs(decoded["temperature"] - reading["temp"]) < 0.051
+        assert abs(decoded["humidity"] - reading["hum"]) < 0.051
+        assert abs(decoded["soil_moisture"] - reading["moisture"]) < 0.051
+        assert abs(decoded["battery_level"] - reading["battery_level"]) < 0.0006
+        assert decoded["time_stale"] == bool(reading["flags"] & FLAG_TIME_STALE)
+        assert decoded["climate_stale"] == bool(reading["flags"] & FLAG_CLIMATE_STALE)
+        assert decoded["irrigated"] == bool(reading["flags"] & FLAG_IRRIGATED)
+        assert decoded["irrigation_time"] == (iso(reading["last_irrigation"]) if reading["last_irrigation"] else 0)
+        assert decoded["irrigation_run_ms"] == reading["run_ms"]
+        assert decoded["soil_moisture_limit"] == reading["moisture_limit"]
+        assert decoded["misuration_interval"] == reading["misuration_interval"]
+        assert decoded["activate_pump_for"] == reading["pump_for"]
+        assert decoded["next_interval"] == reading["next_interval"]
+        assert decoded["version"] == (2 if reading["zones"] else 1)
+        used = [(n, zone) for n, zone in enumerate(reading["zones"], 2) if zone[0] is not None]
+        assert [zone["zone"] for zone in decoded.get("zones", ())] == [n for n, zone in used]
+        for zone, (n, (zone_moisture, zone_limit)) in zip(decoded.get("zones", ()), used):
+            assert abs(zone["soil_moisture"] - zone_moisture) < 0.051 and zone["soil_moisture_limit"] == zone_limit
+            assert zone["irrigated"] == bool(reading["flags"] & (FLAG_ZONE_IRRIGATED << (n - 2)))
+
+    # zone 3 disabled (pin clash): zone 4 keeps its number, limit and irrigated flag
+    decoded = decode(bytes(payload.encode(0, 20, 50, 30, 3.9, FLAG_ZONE_IRRIGATED << 2, 0, 15, 0, 0, 3600, 5,
+                                          zones=((41.5, 25), (None, 0), (12.0, 77)))))
+    assert decoded["zones"] == [
+        {"zone": 2, "soil_moisture": 41.5, "soil_moisture_limit": 25, "irrigated": False},
+        {"zone": 4, "soil_moisture": 12.0, "soil_moisture_limit": 77, "irrigated": True},
+    ]
+
+    # out of range values are clamped, not wrapped
+    decoded = decode(bytes(payload.encode(0, 5000, 900, -5000, 99, 0, 0, 500, 0, 10 ** 9, 0, 999)))
+    assert decoded["temperature"] == 3276.7 and decoded["humidity"] == 900.0
+    assert decoded["soil_moisture"] == -3276.8 and decoded["battery_level"] == 65.535
+    assert decoded["irrigation_run_ms"] == 6553500
+    assert decoded["soil_moisture_limit"] == 255 and decoded["activate_pump_for"] == 255
+
+    for bad in (b"", b"\x03" + bytes(payload.SIZE - 1), b"\x02" + bytes(payload.SIZE - 1),
+                bytes(payload.encode(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0))[:-1],
+                bytes(payload.encode(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, zones=((1, 2),)))[:-1]):
+        try:
+            decode(bad)
+        except ValueError:
+            continue
+        raise AssertionError("accepted invalid payload %r" % bad)
+    print("self test passed: %d readings, %d bytes per payload" % (cases, payload.SIZE))
+
+def main():
+    if len(sys.argv) != 2:
+        print("usage: python tools/decode_payload.py <hex payload> | --self-test")
+        sys.exit(2)
+    if sys.argv[1] == "--self-test":
+        self_test()
+        return
+    print(json.dumps(decode(bytes.fromhex(sys.argv[1])), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# WiFi connection manager for Raspberry Pi Pico W
+# - the BSSID/channel of the access point are cached on flash: later connects skip the scan (connect(bssid=...));
+#   the file is written only when the AP or the lease changed, not on every connect
+# - the DHCP lease is cached too and reused as static config while younger than lease_s (skips DHCP),
+#   or a fixed static IP can be given
+# - every connect has a deadline: a failed attempt with the cached AP/lease drops the cache and retries with a
+#   full connect, the next attempts wait with exponential backoff; when the deadline is over connect() returns
+#   False (the caller keeps its data and goes back to sleep instead of rebooting)
+# - association time, attempts and channel are kept for the diagnostics
+# - network is imported on the first connect: wake cycles that stay offline never load the radio driver
+#
+# record: bssid (6s), channel (B), ip, netmask, gateway, dns (4B each), lease time (I, UTC epoch, 0 -> none)
+#
+# usage:
+#   wifi.load()
+#   if wifi.connect(SSID, PASSWORD, timeout_ms=15000, retries=2):   # or: await wifi.connect_async(...)
+#       ...
+#   wifi.disconnect()
+
+import struct
+import utime
+import uasyncio as asyncio
+
+WIFI_FILE = "wifi.bin"
+RECORD_FORMAT = "<6sB4s4s4s4sI"
+
+FAST_TIMEOUT_MS = 2000  # attempt with the cached AP/lease: give up early, then do a full connect
+POLL_MS = 50
+BACKOFF_MS = 500        # first pause between two attempts (doubled every time)
+
+_bssid = None
+_channel = 0
+_lease = None           # (ip, netmask, gateway, dns)
+_lease_time = 0
+_assoc_ms = 0
+_attempts = 0
+_cached = False         # last connect used the cached AP
+_radio = False          # radio switched on by connect (until disconnect)
+
+def _ip_bytes(text):
+    return bytes(int(part) for part in text.split("."))
+
+def _ip_text(data):
+    return ".".join(str(b) for b in data)
+
+def parse_ifconfig(text):
+    """"ip,netmask,gateway,dns" -> ifconfig tuple; raises ValueError if malformed."""
+    parts = tuple(part.strip() for part in text.split(","))
+    if len(parts) != 4:
+        raise ValueError("static ip must be ip,netmask,gateway,dns")
+    for part in parts:
+        if len(_ip_bytes(part)) != 4:
+            raise ValueError("bad address " + part)
+    return parts
+
+def load():
+    global _bssid, _channel, _lease, _lease_time
+    _bssid, _channel, _lease, _lease_time = None, 0, None, 0
+    try:
+        with open(WIFI_FILE, "rb") as f:
+            bssid, channel, ip, mask, gateway, dns, lease_time = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+    if channel:
+        _bssid, _channel = bssid, channel
+    if lease_time:
+        _lease = (_ip_text(ip), _ip_text(mask), _ip_text(gateway), _ip_text(dns))
+        _lease_time = lease_time
+
+def save():
+    lease = _lease or ("0.0.0.0",) * 4
+    with open(WIFI_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, _bssid or bytes(6), _channel, _ip_bytes(lease[0]), _ip_bytes(lease[1]),
+                            _ip_bytes(lease[2]), _ip_bytes(lease[3]), _lease_time if _lease else 0))
+
+def forget():
+    """Drop the cached AP and lease (e.g. the AP was replaced)."""
+    global _bssid, _channel, _lease
+    _bssid, _channel, _lease = None, 0, None
+    save()
+
+def _lease_valid(lease_s):
+    # RTC must be valid to know the age of the lease
+    now = utime.time()
+    return _lease is not None and lease_s > 0 and utime.localtime(now)[0] >= 2024 and 0 <= now - _lease_time < lease_s
+
+def _wlan():
+    import network
+    return network.WLAN(network.STA_IF)
+
+def _scan(wlan, ssid):
+    # strongest AP with our SSID -> (bssid, channel), None if not found
+    best = None
+    for found_ssid, bssid, channel, rssi, security, hidden in wlan.scan():
+        if found_ssid == ssid.encode() and (best is None or rssi > best[2]):
+            best = (bssid, channel, rssi)
+    return best
+
+def _start(wlan, ssid, password, ip_config, use_ap):
+    # one association attempt: ip_config None -> DHCP, use_ap -> connect to the cached BSSID without scanning
+    global _bssid, _channel
+    if ip_config is not None:
+        wlan.ifconfig(ip_config)
+    else:
+        try:
+            wlan.ifconfig("dhcp")
+        except (OSError, TypeError, ValueError):
+            pass  # firmware without ifconfig("dhcp"): DHCP is the default after power up
+    if not use_ap or _bssid is None:
+        found = _scan(wlan, ssid)
+        if found is not None:
+            _bssid, _channel = found[0], found[1]
+    if _bssid is not None:
+        wlan.connect(ssid, password, bssid=_bssid)
+    else:
+        wlan.connect(ssid, password)
+
+def _connecting(ssid, password, timeout_ms, retries, static, lease_s):
+    """Generator driving the connection: yields the ms to wait before polling again."""
+    global _assoc_ms, _attempts, _cached, _lease, _lease_time, _radio
+    wlan = _wlan()
+    wlan.active(True)
+    _radio = True
+    started = utime.ticks_ms()
+    _attempts = 0
+    _assoc_ms = 0
+    backoff = BACKOFF_MS
+    use_lease = static is None and _lease_valid(lease_s)
+    cached = _bssid is not None or use_lease
+    saved = (_bssid, _channel, _lease, _lease_time)
+    while _attempts <= retries:
+        _attempts += 1
+        _cached = cached
+        ip_config = static if static is not None else (_lease if cached and use_lease else None)
+        _start(wlan, ssid, password, ip_config, cached)
+        attempt_started = utime.ticks_ms()
+        limit = FAST_TIMEOUT_MS if cached else timeout_ms
+        while not wlan.isconnected():
+            if (wlan.status() < 0 or utime.ticks_diff(utime.ticks_ms(), attempt_started) > limit
+                    or utime.ticks_diff(utime.ticks_ms(), started) > timeout_ms):
+                break
+            yield POLL_MS
+        if wlan.isconnected():
+            _assoc_ms = utime.ticks_diff(utime.ticks_ms(), started)
+            if ip_config is None:
+                _lease = wlan.ifconfig()
+                _lease_time = utime.time()
+            if (_bssid, _channel, _lease, _lease_time) != saved:
+                save()      # new AP or DHCP lease: a reused cache is not written again
+            return
+        wlan.disconnect()
+        if cached:
+            # the cached AP/lease did not work: full connect (scan + DHCP) on the next attempt
+            cached = False
+            continue
+        if utime.ticks_diff(utime.ticks_ms(), started) + backoff > timeout_ms:
+            return
+        yield backoff
+        backoff *= 2
+
+def connect(ssid, password, timeout_ms=15000, retries=2, static=None, lease_s=0):
+    """Connect (blocking) within timeout_ms; returns False if the network is not reachable."""
+    for wait_ms in _connecting(ssid, password, timeout_ms, retries, static, lease_s):
+        utime.sleep_ms(wait_ms)
+    return _wlan().isconnected()
+
+async def connect_async(ssid, password, timeout_ms=15000, retries=2, static=None, lease_s=0):
+    """Same as connect(), other uasyncio tasks run while the radio associates."""
+    for wait_ms in _connecting(ssid, password, timeout_ms, retries, static, lease_s):
+        await asyncio.sleep_ms(wait_ms)
+    return _wlan().isconnected()
+
+def disconnect():
+    global _radio
+    wlan = _wlan()
+    if wlan.isconnected():
+        wlan.disconnect()
+    wlan.active(False)
+    _radio = False
+
+def radio_on():
+    """True between connect and disconnect (the radio draws current, e.g. battery readings sag)."""
+    return _radio
+
+def address():
+    return _wlan().ifconfig()[0]
+
+def association_ms():
+    return _assoc_ms
+
+def report():
+    return {"assoc_ms": _assoc_ms, "attempts": _attempts, "cached": _cached, "channel": _channel}
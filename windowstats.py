@@ -0,0 +1,109 @@
+# Windowed statistics of the readings (summary publishing of the station, STATS_WINDOW_S)
+# Every wake adds one sample of temperature, humidity, soil moisture and battery voltage to the current window;
+# count, min, max, mean and variance are updated incrementally (Welford: mean and sum of squared differences
+# M2), so the memory is the same for 1 or 1000 samples and no reading has to be kept. The station can wake
+# often to sample (no radio) and publish one summary per window instead of every reading.
+# The window state is kept on flash (stats.bin) across deep sleep. A window that could not be published
+# (network down) keeps growing until it is: start and end tell the span it covers. A window can also be made to
+# wait for a minimum number of samples (the station: UPLOAD_EVERY), so a wake interval as long as the window
+# does not open a radio session for a summary of one sample.
+#
+# record: window start epoch (I), last sample epoch (I), samples (H),
+#         per metric: mean, M2, min, max (4f)
+#
+# usage:
+#   windowstats.load()
+#   windowstats.add(epoch, (temp, hum, moisture, battery_level))   # in METRICS order
+#   if windowstats.due(3600 * 6, epoch, 4):     # 6 h and at least 4 samples
+#       for i in range(len(windowstats.METRICS)):
+#           low, high, mean, std = windowstats.stats(i)
+#       windowstats.reset()     # after the summary is published
+#   windowstats.save()          # once per cycle (writes only if something changed)
+
+import math
+import struct
+from array import array
+
+STATS_FILE = "stats.bin"
+METRICS = ("temperature", "humidity", "soil_moisture", "battery_level")
+RECORD_FORMAT = "<IIH%df" % (4 * len(METRICS))
+
+_MEAN, _M2, _MIN, _MAX = 0, 1, 2, 3     # offsets of a metric in _state
+
+_state = array("f", bytes(16 * len(METRICS)))
+_start = 0          # epoch of the first sample of the window (0: empty window)
+_end = 0
+_count = 0
+_dirty = False
+
+def load():
+    global _start, _end, _count, _dirty
+    _start, _end, _count, _dirty = 0, 0, 0, False
+    try:
+        with open(STATS_FILE, "rb") as f:
+            record = struct.unpack(RECORD_FORMAT, f.read())
+    except (OSError, ValueError):
+        return
+    _start, _end, _count = record[:3]
+    for i in range(len(_state)):
+        _state[i] = record[3 + i]
+
+def save():
+    global _dirty
+    if not _dirty:
+        return
+    with open(STATS_FILE, "wb") as f:
+        f.write(struct.pack(RECORD_FORMAT, _start, _end, _count, *_state))
+    _dirty = False
+
+def add(epoch, values):
+    """One sample of every metric (METRICS order) taken at epoch."""
+    global _start, _end, _count, _dirty
+    if not _count or epoch < _start:
+        # new window (or the clock was set back: the old start would make the window look longer)
+        reset()
+        _start = epoch
+    _count += 1
+    _end = epoch
+    for i in range(len(METRICS)):
+        base = 4 * i
+        value = values[i]
+        if _count == 1:
+            _state[base + _MEAN] = value
+            _state[base + _M2] = 0
+            _state[base + _MIN] = value
+            _state[base + _MAX] = value
+            continue
+        delta = value - _state[base + _MEAN]
+        _state[base + _MEAN] += delta / _count
+        _state[base + _M2] += delta * (value - _state[base + _MEAN])
+        if value < _state[base + _MIN]:
+            _state[base + _MIN] = value
+        if value > _state[base + _MAX]:
+            _state[base + _MAX] = value
+    _dirty = True
+
+def due(window_s, now, min_samples=1):
+    """True if the window holds min_samples samples (at least one) and spans window_s seconds up to now."""
+    return _count >= max(1, min_samples) and now - _start >= window_s
+
+def stats(i):
+    """(min, max, mean, standard deviation) of metric i of the window (sample deviation, 0 for one sample)."""
+    base = 4 * i
+    std = math.sqrt(max(0, _state[base + _M2]) / (_count - 1)) if _count > 1 else 0.0
+    return _state[base + _MIN], _state[base + _MAX], _state[base + _MEAN], std
+
+def count():
+    return _count
+
+def start():
+    return _start
+
+def end():
+    return _end
+
+def reset():
+    """Empty window (the summary was published)."""
+    global _start, _end, _count, _dirty
+    _start, _end, _count = 0, 0, 0
+    _dirty = True
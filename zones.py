@@ -0,0 +1,172 @@
+# Multi-zone irrigation for the watering station: several soil sensors and pumps served by one wake cycle
+# (one WiFi/MQTT session for every plant instead of one Pico per plant).
+# Zone 1 is the original wiring (PIN_MAP soil/soil_power/waterPump, MOISTURE_LIMIT, ACTIVE_PUMP_FOR).
+# Zones 2..MAX_ZONES are described by settings, ZONE_COUNT selects how many zones are used:
+#   ZONE<n>_MUX     channel (0..15) of an analog multiplexer (74HC4067, select lines on MUX_PINS) in front of
+#                   ADC1 (GPIO27), -1 -> sensor wired directly to ADC1 (a single zone)
+#   ZONE<n>_POWER   sensor power pin, -1 -> powered by soil_power together with zone 1
+#   ZONE<n>_RELAY   pump relay pin, -1 -> sensor only (no pump)
+#   ZONE<n>_LIMIT   moisture limit (%)
+#   ZONE<n>_PUMP_S  pump active time (s)
+# All sensors are powered together and share one warm-up; the pumps run one after the other (driest zone first,
+# zones requested with irrigate_now before the others) within PUMP_BUDGET_S seconds of pump time per wake.
+# Zones with a pin already used by the station or by another zone are disabled (setup() returns the reasons).
+#
+# usage:
+#   SETTINGS_SCHEMA = [...] + zones.schema()
+#   problems = zones.setup(SETTINGS, hw["soil"], hw["waterPump"], PIN_MAP.values())   # again when settings change
+#   zones.power(1)
+#   moistures = [zones.read(zone, read_soil)[0] for zone in zones.zones()]
+#   ringbuffer.append(..., zones.slots(moistures))         # zones 2..MAX_ZONES by number (None: not used)
+#   for i in zones.irrigation_order(moistures, forced_mask): ...
+
+import utime
+from machine import Pin, ADC
+
+MAX_ZONES = 4
+ADC_PIN = 27                # ADC1 (ADC0 is the zone 1 sensor, ADC2 the battery divider)
+MUX_PINS = (6, 7, 8, 9)     # S0..S3 of the multiplexer
+MUX_SETTLE_US = 10          # analog path settling after a change of address
+
+FIELDS = ("MUX", "POWER", "RELAY", "LIMIT", "PUMP_S")
+ZONE1_SETTINGS = {"LIMIT": "MOISTURE_LIMIT", "PUMP_S": "ACTIVE_PUMP_FOR"}
+
+_settings = {}
+_zones = []
+_pins = []
+_config = None
+_mux = None
+_mux_address = -1
+
+def schema():
+    """Settings entries for the zones (appended to the station schema)."""
+    entries = [
+        ("ZONE_COUNT", "i", 1, 1, MAX_ZONES),      # zones used by the station (1 -> original single zone)
+        ("PUMP_BUDGET_S", "i", 60, 1, 600),        # pump on time per wake for all the zones together
+    ]
+    for n in range(2, MAX_ZONES + 1):
+        entries += [
+            ("ZONE%d_MUX" % n, "i", -1, -1, 15),
+            ("ZONE%d_POWER" % n, "i", -1, -1, 28),
+            ("ZONE%d_RELAY" % n, "i", -1, -1, 28),
+            ("ZONE%d_LIMIT" % n, "i", 20, 0, 100),
+            ("ZONE%d_PUMP_S" % n, "i", 5, 1, 600),
+        ]
+    return entries
+
+def setting(number, field):
+    """Settings key of a zone field (e.g. 2, "limit" -> "ZONE2_LIMIT"); raises ValueError if unknown."""
+    field = field.upper()
+    if number == 1:
+        if field not in ZONE1_SETTINGS:
+            raise ValueError("zone 1 has no setting " + field)
+        return ZONE1_SETTINGS[field]
+    if not 2 <= number <= MAX_ZONES or field not in FIELDS:
+        raise ValueError("unknown zone setting %d/%s" % (number, field))
+    return "ZONE%d_%s" % (number, field)
+
+def _signature(settings):
+    keys = [setting(n, field) for n in range(2, settings["ZONE_COUNT"] + 1) for field in FIELDS[:3]]
+    return tuple(settings[key] for key in keys)
+
+def setup(settings, soil, relay, station_pins):
+    """Build the zone table from the settings (nothing is done if the pin settings did not change).
+    soil, relay: ADC and relay Pin of zone 1; returns the list of problems (disabled zones)."""
+    global _settings, _zones, _pins, _config, _mux, _mux_address
+    _settings = settings
+    config = _signature(settings)
+    if config == _config and _zones:
+        return []
+    _config = config
+
+    problems = []
+    used = set(station_pins)
+    addresses = []      # multiplexer channels in use, None: ADC1 used by a sensor wired directly
+    _zones = [{"number": 1, "adc": soil, "mux": -1, "power": None, "relay": relay}]
+    _pins = []
+    _mux = None
+    _mux_address = -1
+    for n in range(2, settings["ZONE_COUNT"] + 1):
+        mux, power_pin, relay_pin = (settings[setting(n, field)] for field in FIELDS[:3])
+        if addresses is None or (addresses and mux < 0) or mux in addresses:
+            problems.append("zone %d disabled: ADC1/multiplexer channel already used by another zone" % n)
+            continue
+        pins = [pin for pin in (power_pin, relay_pin) if pin >= 0]
+        if len(_zones) == 1:
+            pins.append(ADC_PIN)
+        if mux >= 0 and _mux is None:
+            pins += MUX_PINS
+        clash = [pin for pin in pins if pin in used or pins.count(pin) > 1]
+        if clash:
+            problems.append("zone %d disabled: pin %d already in use" % (n, clash[0]))
+            continue
+        used.update(pins)
+        _pins += pins
+        if mux < 0:
+            addresses = None
+        else:
+            addresses.append(mux)
+            if _mux is None:
+                _mux = [Pin(pin, Pin.OUT, value=0) for pin in MUX_PINS]
+        _zones.append({
+            "number": n,
+            "adc": ADC(Pin(ADC_PIN)),
+            "mux": mux,
+            "power": Pin(power_pin, Pin.OUT, value=0) if power_pin >= 0 else None,
+            "relay": Pin(relay_pin, Pin.OUT, value=0) if relay_pin >= 0 else None,
+        })
+    return problems
+
+def zones():
+    return _zones
+
+def slots(moistures):
+    """Moisture of the zones 2..MAX_ZONES by zone number (index n-2), None for a zone not used or disabled:
+    a disabled zone does not shift the ones after it. moistures: one value per zones() entry."""
+    result = [None] * (MAX_ZONES - 1)
+    for zone, moisture in zip(_zones[1:], moistures[1:]):
+        result[zone["number"] - 2] = moisture
+    return tuple(result)
+
+def pins():
+    """GPIOs used by the zones 2..n (kept as they are during sleep, see power.set_pins())."""
+    return _pins
+
+def power(on):
+    """Switch the sensor power of the zones with their own power pin."""
+    for zone in _zones[1:]:
+        if zone["power"] is not None:
+            zone["power"].value(on)
+
+def read(zone, read_soil):
+    """Read the soil sensor of a zone with read_soil(adc) (selects the multiplexer address first)."""
+    global _mux_address
+    if zone["mux"] >= 0 and zone["mux"] != _mux_address:
+        for i in range(4):
+            _mux[i].value((zone["mux"] >> i) & 1)
+        _mux_address = zone["mux"]
+        utime.sleep_us(MUX_SETTLE_US)
+    return read_soil(zone["adc"])
+
+def limit(zone):
+    return _settings[setting(zone["number"], "LIMIT")]
+
+def pump_ms(zone):
+    return _settings[setting(zone["number"], "PUMP_S")] * 1000
+
+def below_limit(moistures):
+    """True if any zone is drier than its limit."""
+    for zone, moisture in zip(_zones, moistures):
+        if moisture < limit(zone):
+            return True
+    return False
+
+def irrigation_order(moistures, forced_mask=0):
+    """Indexes of the zones to irrigate: forced ones (bit n-1 of forced_mask) first, then by deficit (driest first)."""
+    order = []
+    for i, (zone, moisture) in enumerate(zip(_zones, moistures)):
+        forced = forced_mask & (1 << (zone["number"] - 1))
+        if zone["relay"] is not None and (forced or moisture < limit(zone)):
+            order.append((0 if forced else 1, moisture - limit(zone), i))
+    order.sort()
+    return [i for forced, deficit, i in order]